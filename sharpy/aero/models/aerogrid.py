@@ -8,13 +8,17 @@
 # grid based on the input dictionaries.
 
 import ctypes as ct
+import hashlib
+import os
 
+import h5py as h5
 import numpy as np
 import scipy.interpolate
 
+import sharpy.aero.utils.mapping as mapping
 import sharpy.utils.algebra as algebra
 import sharpy.utils.cout_utils as cout
-from sharpy.utils.datastructures import AeroTimeStepInfo
+from sharpy.utils.datastructures import AeroTimeStepInfo, AeroTimeStepHistory, TimeStepInfoPool
 
 
 class Aerogrid(object):
@@ -24,6 +28,7 @@ class Aerogrid(object):
         self.aero_settings = None
 
         self.timestep_info = []
+        self.timestep_pool = TimeStepInfoPool(AeroTimeStepInfo)
         self.ini_info = None
 
         self.surface_distribution = None
@@ -31,8 +36,27 @@ class Aerogrid(object):
         self.aero_dimensions = None
         self.aero_dimensions_star = None
         self.airfoil_db = dict()
+        self.camber_cache = None
         self.struct2aero_mapping = None
         self.aero2struct_mapping = []
+        self.surface_entries = []
+
+        # strips of the last grid generation, see generate_zeta
+        self.strips = None
+        self.strips_pos = None
+        self.strips_psi = None
+        self.strips_orientation = None
+        self.n_regenerated_strips = 0
+
+        # linearised grid generation, see linearise_zeta
+        self.zeta_operator = None
+        self.zeta_operator_ref = None
+
+        # forces of the last flight condition sweep, see StaticUvlmSweep
+        self.polar = None
+
+        # half model, symmetric about the xz plane (AerogridLoader symmetry setting)
+        self.symmetry = False
 
         self.n_node = 0
         self.n_elem = 0
@@ -43,6 +67,7 @@ class Aerogrid(object):
         self.aero_dict = aero_dict
         self.beam = beam
         self.aero_settings = aero_settings
+        self.symmetry = aero_settings['symmetry'].value
 
         # number of total nodes (structural + aero&struc)
         self.n_node = len(aero_dict['aero_node'])
@@ -80,9 +105,13 @@ class Aerogrid(object):
                                                kind='quadratic',
                                                copy=False,
                                                assume_sorted=True))
+        self.camber_cache = CamberCache(self.airfoil_db,
+                                        self.aero_dict['airfoils'],
+                                        self.aero_settings['camber_cache_file'])
         self.add_timestep()
         self.generate_mapping()
         self.generate_zeta(self.beam, self.aero_settings, ts)
+        self.camber_cache.save()
 
     def output_info(self):
         cout.cout_wrap('The aerodynamic grid contains %u surfaces' % self.n_surf, 1)
@@ -111,7 +140,7 @@ class Aerogrid(object):
         # will be N+1)
         nodes_in_surface = []
         for i_surf in range(self.n_surf):
-            nodes_in_surface.append([])
+            nodes_in_surface.append(set())
         for i_elem in range(self.beam.num_elem):
             nodes = self.beam.elements[i_elem].global_connectivities
             i_surf = self.aero_dict['surface_distribution'][i_elem]
@@ -121,7 +150,7 @@ class Aerogrid(object):
                 if i_global_node in nodes_in_surface[i_surf]:
                     continue
                 else:
-                    nodes_in_surface[i_surf].append(i_global_node)
+                    nodes_in_surface[i_surf].add(i_global_node)
                 if self.aero_dict['aero_node'][i_global_node]:
                     self.aero_dimensions[i_surf, 1] += 1
 
@@ -132,64 +161,211 @@ class Aerogrid(object):
         for i_surf in range(self.n_surf):
             self.aero_dimensions_star[i_surf, 0] = self.aero_settings['mstar'].value
 
-    def add_timestep(self):
-        self.timestep_info.append(AeroTimeStepInfo(self.aero_dimensions,
-                                                   self.aero_dimensions_star))
-        if len(self.timestep_info) > 1:
-            self.timestep_info[-1] = self.timestep_info[-2].copy()
-
-        for i_surf in range(self.n_surf):
-            self.timestep_info[-1].forces[i_surf].fill(0.0)
-            self.timestep_info[-1].dynamic_forces[i_surf].fill(0.0)
+    def add_timestep(self, fields=None):
+        """
+        Adds a new timestep, copy of the last one (recycling a discarded one if possible).
+        The forces of the new timestep are set to zero.
+
+        :param fields: fields copied from the last timestep (see ``AeroTimeStepInfo.copy``),
+            all of them but the forces by default. The rest are set to zero.
+        """
+        if len(self.timestep_info) == 0:
+            self.timestep_info.append(AeroTimeStepInfo(self.aero_dimensions,
+                                                       self.aero_dimensions_star))
+            return
+
+        if fields is None:
+            fields = [name for name in AeroTimeStepInfo.copy_fields if name != 'forces']
+        previous = self.timestep_info[-1]
+        self.timestep_info.append(previous.copy(out=self.timestep_pool.get(*previous.constructor_args()),
+                                                fields=fields))
+
+    def set_history_policy(self, policy, length, file_name=None):
+        """
+        Bounds the number of timesteps kept in memory (see ``AeroTimeStepHistory``).
+
+        :param policy: ``'all'`` (unbounded list, default), ``'spill'`` or ``'discard'``
+        :param length: number of timesteps kept in memory
+        :param file_name: HDF5 file where the older timesteps are stored with ``'spill'``
+        """
+        if policy == 'all':
+            return
+        history = AeroTimeStepHistory(policy, length, file_name, release=self.release_timestep)
+        for ts_info in self.timestep_info:
+            history.append(ts_info)
+        self.timestep_info = history
+
+    def close_history(self):
+        try:
+            self.timestep_info.close()
+        except AttributeError:
+            pass
+
+    def release_timestep(self, ts_info):
+        """
+        Returns a timestep that is not referenced anymore to the pool, to be recycled
+        by ``add_timestep``.
+        """
+        ts_info.remove_ctypes_pointers()
+        self.timestep_pool.release(ts_info)
 
     def generate_zeta(self, beam, aero_settings, ts):
-        nodes_in_surface = []
+        """
+        Generates the bound grid of the timestep ``ts`` from the structural deformation.
+
+        Only the strips whose structural node has moved more than ``regeneration_pos_tolerance``
+        or whose CRV has changed more than ``regeneration_psi_tolerance`` since they were last
+        generated are regenerated. The rest are taken from the previous grid (stored in ``strips``,
+        before ``update_orientation``). With the default tolerances (0) only the strips whose
+        node has not changed at all are reused.
+        :return: number of regenerated strips
+        """
+        cab = beam.timestep_info[ts].cab()
+        pos = beam.timestep_info[ts].pos
+        psi = beam.timestep_info[ts].psi
+        pos_tolerance = aero_settings['regeneration_pos_tolerance'].value
+        psi_tolerance = aero_settings['regeneration_psi_tolerance'].value
+        orientation = np.array(aero_settings['freestream_dir'], dtype=float)
+
+        full_regeneration = (self.strips is None or
+                             not np.array_equal(self.strips_orientation, orientation))
+        if full_regeneration:
+            self.strips = [np.zeros((3, self.aero_dimensions[i_surf, 0] + 1, self.aero_dimensions[i_surf, 1] + 1))
+                           for i_surf in range(self.n_surf)]
+            self.strips_pos = np.zeros((len(self.struct2aero_mapping['i_node']), 3))
+            self.strips_psi = np.zeros((len(self.struct2aero_mapping['i_node']), 3))
+            self.strips_orientation = orientation
+
+        n_regenerated = 0
         for i_surf in range(self.n_surf):
-            nodes_in_surface.append([])
-        for i_elem in range(self.n_elem):
-            for i_local_node in self.beam.elements[i_elem].ordering:
-                i_global_node = self.beam.elements[i_elem].global_connectivities[i_local_node]
-                if not self.aero_dict['aero_node'][i_global_node]:
-                    continue
-                for i in range(len(self.struct2aero_mapping[i_global_node])):
-                    i_n = self.struct2aero_mapping[i_global_node][i]['i_n']
-                    i_surf = self.struct2aero_mapping[i_global_node][i]['i_surf']
-                    if i_n in nodes_in_surface[i_surf]:
-                        continue
-                    else:
-                        nodes_in_surface[i_surf].append(i_n)
-
-                    master_elem, master_elem_node = beam.master[i_elem, i_local_node, :]
-                    if master_elem < 0:
-                        master_elem = i_elem
-                        master_elem_node = i_local_node
-
-                    node_info = dict()
-                    node_info['i_node'] = i_global_node
-                    node_info['i_local_node'] = i_local_node
-                    node_info['chord'] = self.aero_dict['chord'][i_global_node]
-                    node_info['eaxis'] = self.aero_dict['elastic_axis'][i_global_node]
-                    node_info['twist'] = self.aero_dict['twist'][i_global_node]
-                    node_info['M'] = self.aero_dimensions[i_surf, 0]
-                    node_info['M_distribution'] = self.aero_dict['m_distribution'].decode('ascii')
-                    node_info['airfoil'] = self.aero_dict['airfoil_distribution'][i_global_node]
-                    node_info['beam_coord'] = beam.timestep_info[ts].pos[i_global_node, :]
-                    node_info['beam_psi'] = beam.timestep_info[ts].psi[master_elem, master_elem_node, :]
-                    node_info['for_delta'] = beam.frame_of_reference_delta[master_elem, master_elem_node, :]
-                    node_info['elem'] = beam.elements[master_elem]
-                    self.timestep_info[ts].zeta[i_surf][:, :, i_n] = (
-                        generate_strip(node_info,
-                                       self.airfoil_db,
-                                       aero_settings['aligned_grid'],
-                                       orientation_in=aero_settings['freestream_dir']))
+            i_entries = self.surface_entries[i_surf]
+            if len(i_entries) == 0:
+                continue
+            i_node = self.struct2aero_mapping['i_node'][i_entries]
+            master_elem = self.struct2aero_mapping['master_elem'][i_entries]
+            master_elem_node = self.struct2aero_mapping['master_elem_node'][i_entries]
+            node_pos = pos[i_node, :]
+            node_psi = psi[master_elem, master_elem_node, :]
+
+            if full_regeneration:
+                dirty = np.ones((len(i_entries),), dtype=bool)
+            else:
+                dirty = ((np.linalg.norm(node_pos - self.strips_pos[i_entries, :], axis=1) > pos_tolerance) |
+                         (np.linalg.norm(node_psi - self.strips_psi[i_entries, :], axis=1) > psi_tolerance))
+
+            if np.any(dirty):
+                i_entries = i_entries[dirty]
+                i_node = i_node[dirty]
+                strips_info = dict()
+                strips_info['chord'] = self.aero_dict['chord'][i_node]
+                strips_info['eaxis'] = self.aero_dict['elastic_axis'][i_node]
+                strips_info['twist'] = self.aero_dict['twist'][i_node]
+                strips_info['M'] = self.aero_dimensions[i_surf, 0]
+                strips_info['M_distribution'] = self.aero_dict['m_distribution'].decode('ascii')
+                strips_info['airfoil'] = self.aero_dict['airfoil_distribution'][i_node]
+                strips_info['beam_coord'] = node_pos[dirty, :]
+                strips_info['cab'] = cab[master_elem[dirty], master_elem_node[dirty], :, :]
+                self.strips[i_surf][:, :, self.struct2aero_mapping['i_n'][i_entries]] = (
+                    generate_strips(strips_info,
+                                    self.airfoil_db,
+                                    aero_settings['aligned_grid'],
+                                    orientation_in=orientation,
+                                    camber_cache=self.camber_cache))
+                self.strips_pos[i_entries, :] = node_pos[dirty, :]
+                self.strips_psi[i_entries, :] = node_psi[dirty, :]
+                n_regenerated += np.sum(dirty)
+
+            self.timestep_info[ts].zeta[i_surf][:] = self.strips[i_surf]
+
+        self.n_regenerated_strips = n_regenerated
+        return n_regenerated
+
+    def linearise_zeta(self, beam, ts):
+        """
+        Builds the linearised structure to aero grid displacement operator around the
+        structural state of the timestep ``ts`` and the last grid generated by ``generate_zeta``
+        (which has to correspond to that state). See ``mapping.struct2aero_displacement_operator``.
+        """
+        pos = beam.timestep_info[ts].pos
+        psi = beam.timestep_info[ts].psi
+        cab = beam.timestep_info[ts].cab()
+
+        # chord lines of the strips before the sweep correction, as in generate_strips
+        i_node = self.struct2aero_mapping['i_node']
+        chord_lines_b_frame = np.zeros((len(i_node), 3))
+        chord_lines_b_frame[:, 1] = self.aero_dict['chord'][i_node]
+        for i_surf in range(self.n_surf):
+            i_entries = self.surface_entries[i_surf]
+            m = self.aero_dimensions[i_surf, 0]
+            m_distribution = self.aero_dict['m_distribution'].decode('ascii')
+            domain = chordwise_distribution(m, m_distribution)
+            for i_entry in i_entries:
+                airfoil = self.aero_dict['airfoil_distribution'][i_node[i_entry]]
+                if self.camber_cache is None:
+                    camber = self.airfoil_db[airfoil](domain)
+                else:
+                    camber = self.camber_cache.get(airfoil, m, m_distribution)
+                chord_lines_b_frame[i_entry, 2] = (camber[-1] - camber[0])*chord_lines_b_frame[i_entry, 1]
+        chord_lines = np.einsum('nij,nj->ni',
+                                cab[self.struct2aero_mapping['master_elem'],
+                                    self.struct2aero_mapping['master_elem_node'], :, :],
+                                chord_lines_b_frame)
+
+        self.zeta_operator = mapping.struct2aero_displacement_operator(self.struct2aero_mapping,
+                                                                       self.strips,
+                                                                       pos,
+                                                                       psi,
+                                                                       cab=cab,
+                                                                       orientation=self.strips_orientation,
+                                                                       chord_lines=chord_lines)
+        self.zeta_operator_ref = dict()
+        self.zeta_operator_ref['zeta'] = np.concatenate([strip.reshape((3, -1)) for strip in self.strips], axis=1)
+        self.zeta_operator_ref['dofs'] = self.structural_dofs(beam, ts)
+
+    def structural_dofs(self, beam, ts):
+        """
+        ``[num_node, 6]`` array of positions and CRVs (of the master element of every node as
+        given by ``struct2aero_mapping``) that ``zeta_operator`` acts on.
+        """
+        node_master = np.zeros((self.n_node, 2), dtype=int)
+        node_master[self.struct2aero_mapping['i_node'], 0] = self.struct2aero_mapping['master_elem']
+        node_master[self.struct2aero_mapping['i_node'], 1] = self.struct2aero_mapping['master_elem_node']
+        dofs = np.zeros((self.n_node, 6))
+        dofs[:, 0:3] = beam.timestep_info[ts].pos
+        dofs[:, 3:6] = beam.timestep_info[ts].psi[node_master[:, 0], node_master[:, 1], :]
+        return dofs
+
+    def generate_zeta_linear(self, beam, ts):
+        """
+        Cheap alternative to ``generate_zeta`` for small structural displacements: the bound grid
+        of the timestep ``ts`` is updated with the operator built by ``linearise_zeta`` (a sparse matvec).
+        The grid is generated in ``a`` frame, as in ``generate_zeta``.
+        """
+        if self.zeta_operator is None:
+            raise RuntimeError('linearise_zeta has to be called before generate_zeta_linear')
+        delta_dofs = self.structural_dofs(beam, ts) - self.zeta_operator_ref['dofs']
+        self.timestep_info[ts].buffers['zeta'][:] = (self.zeta_operator_ref['zeta'] +
+                                                     self.zeta_operator.dot(delta_dofs.reshape(-1)).reshape((3, -1)))
 
     def generate_mapping(self):
-        self.struct2aero_mapping = [[]]*self.n_node
+        """
+        Generates the structure to aero grid mappings as integer arrays:
+
+        * ``struct2aero_mapping``: CSR-like dictionary of arrays. The grid points (spanwise index ``i_n`` of
+          surface ``i_surf``) attached to the structural node ``i_node`` are the entries
+          ``struct2aero_mapping['indptr'][i_node]:struct2aero_mapping['indptr'][i_node + 1]`` of the arrays
+          ``'i_surf'`` and ``'i_n'``. ``'i_node'`` is the node of every entry, and ``'master_elem'`` and
+          ``'master_elem_node'`` its master element and local node.
+        * ``aero2struct_mapping``: list with an array per surface with the structural node of every
+          spanwise index.
+        """
         surf_n_counter = np.zeros((self.n_surf,), dtype=int)
         nodes_in_surface = []
         for i_surf in range(self.n_surf):
-            nodes_in_surface.append([])
+            nodes_in_surface.append(set())
 
+        # (node, surface, spanwise index) entries in order of appearance
+        entries = []
         for i_elem in range(self.n_elem):
             i_surf = self.aero_dict['surface_distribution'][i_elem]
             if i_surf == -1:
@@ -200,48 +376,198 @@ class Aerogrid(object):
 
                 if i_global_node in nodes_in_surface[i_surf]:
                     continue
-                else:
-                    nodes_in_surface[i_surf].append(i_global_node)
-                    surf_n_counter[i_surf] += 1
-                    try:
-                        self.struct2aero_mapping[i_global_node][0]
-                    except IndexError:
-                        self.struct2aero_mapping[i_global_node] = []
-
-                i_n = surf_n_counter[i_surf] - 1
-                self.struct2aero_mapping[i_global_node].append({'i_surf': i_surf,
-                                                                'i_n': i_n})
-
-        nodes_in_surface = []
-        for i_surf in range(self.n_surf):
-            nodes_in_surface.append([])
-
-        for i_surf in range(self.n_surf):
-            self.aero2struct_mapping.append([-1]*(surf_n_counter[i_surf]))
-
+                nodes_in_surface[i_surf].add(i_global_node)
+                entries.append([i_global_node, i_surf, surf_n_counter[i_surf]])
+                surf_n_counter[i_surf] += 1
+        entries = np.array(entries, dtype=int).reshape((-1, 3))
+
+        # master element and local node of every node: first appearance in
+        # the elements, in local ordering
+        node_elem = np.zeros((self.n_node, 2), dtype=int) - 1
         for i_elem in range(self.n_elem):
-            for i_global_node in self.beam.elements[i_elem].global_connectivities:
-                for i in range(len(self.struct2aero_mapping[i_global_node])):
-                    try:
-                        i_surf = self.struct2aero_mapping[i_global_node][i]['i_surf']
-                        i_n = self.struct2aero_mapping[i_global_node][i]['i_n']
-                        if i_global_node in nodes_in_surface[i_surf]:
-                            continue
-                        else:
-                            nodes_in_surface[i_surf].append(i_global_node)
-                    except KeyError:
-                        continue
-                    self.aero2struct_mapping[i_surf][i_n] = i_global_node
+            for i_local_node in self.beam.elements[i_elem].ordering:
+                i_global_node = self.beam.elements[i_elem].global_connectivities[i_local_node]
+                if node_elem[i_global_node, 0] == -1:
+                    node_elem[i_global_node, :] = [i_elem, i_local_node]
+        node_master = self.beam.master[node_elem[:, 0], node_elem[:, 1], :].astype(dtype=int)
+        is_master = node_master[:, 0] < 0
+        node_master[is_master, :] = node_elem[is_master, :]
+
+        # sorted by node (the order of appearance is kept for every node)
+        order = np.argsort(entries[:, 0], kind='stable')
+        entries = entries[order, :]
+        self.struct2aero_mapping = dict()
+        self.struct2aero_mapping['indptr'] = np.zeros((self.n_node + 1,), dtype=int)
+        self.struct2aero_mapping['indptr'][1:] = np.cumsum(np.bincount(entries[:, 0], minlength=self.n_node))
+        self.struct2aero_mapping['i_node'] = entries[:, 0]
+        self.struct2aero_mapping['i_surf'] = entries[:, 1]
+        self.struct2aero_mapping['i_n'] = entries[:, 2]
+        self.struct2aero_mapping['master_elem'] = node_master[entries[:, 0], 0]
+        self.struct2aero_mapping['master_elem_node'] = node_master[entries[:, 0], 1]
+
+        # entries of every surface
+        self.strips = None
+        self.zeta_operator = None
+        self.surface_entries = []
+        self.aero2struct_mapping = []
+        for i_surf in range(self.n_surf):
+            i_entries = np.where(entries[:, 1] == i_surf)[0]
+            self.surface_entries.append(i_entries)
+            self.aero2struct_mapping.append(np.zeros((surf_n_counter[i_surf],), dtype=int) - 1)
+            self.aero2struct_mapping[i_surf][entries[i_entries, 2]] = entries[i_entries, 0]
+
+    def resize_wake(self, m_star, ts=-1):
+        """
+        Changes the number of chordwise wake panels (``mstar``) of the timestep ``ts`` and of the
+        ones added after it. See ``AeroTimeStepInfo.resize_wake``.
+        """
+        self.aero_dimensions_star[:, 0] = m_star
+        self.timestep_info[ts].resize_wake(m_star)
 
     def update_orientation(self, quat, ts=-1):
         rot = algebra.quat2rot(quat)
         self.timestep_info[ts].update_orientation(rot)
 
 
+def chordwise_distribution(M, M_distribution):
+    """
+    Non-dimensional chordwise coordinates of the ``M + 1`` vertices of a strip
+    """
+    if M_distribution == 'uniform':
+        return np.linspace(0.0, 1.0, M + 1)
+    elif M_distribution == '1-cos':
+        domain = np.linspace(0, 1.0, M + 1)
+        return 0.5*(1.0 - np.cos(domain*np.pi))
+    else:
+        raise NotImplemented('M_distribution is ' + M_distribution +
+                             ' and it is not yet supported')
+
+
+class CamberCache(object):
+    """
+    Camber lines of the airfoils evaluated at the chordwise vertices of the grid,
+    for every combination of airfoil, ``M`` and ``M_distribution`` used. They are computed
+    once and reused by all the strips, grid regenerations and timesteps.
+
+    If ``file_name`` is given, the camber lines are also stored in that HDF5 file and
+    reused between runs. The entries of the file are identified by a hash of the airfoil
+    coordinates, so a modified airfoil is never read from it.
+
+    :param airfoil_db: dictionary of airfoil camber interpolators (``Aerogrid.airfoil_db``)
+    :param airfoils: airfoil coordinates (``aero_dict['airfoils']``)
+    :param file_name: HDF5 file for the persistent cache, ``None`` or ``''`` for none
+    """
+    def __init__(self, airfoil_db, airfoils, file_name=None):
+        self.airfoil_db = airfoil_db
+        self.airfoils = airfoils
+        self.file_name = file_name
+        self.table = dict()
+        self.airfoil_hash = dict()
+        self.modified = False
+
+        if self.file_name and os.path.isfile(self.file_name):
+            with h5.File(self.file_name, 'r') as file_handle:
+                self.stored = {name: file_handle[name][()] for name in file_handle}
+        else:
+            self.stored = dict()
+
+    def key(self, airfoil, M, M_distribution):
+        try:
+            airfoil_hash = self.airfoil_hash[airfoil]
+        except KeyError:
+            coords = np.ascontiguousarray(self.airfoils[str(airfoil)], dtype=float)
+            airfoil_hash = hashlib.sha1(coords.tobytes()).hexdigest()
+            self.airfoil_hash[airfoil] = airfoil_hash
+        return '%s_%u_%s' % (airfoil_hash, M, M_distribution)
+
+    def get(self, airfoil, M, M_distribution):
+        try:
+            return self.table[(airfoil, M, M_distribution)]
+        except KeyError:
+            pass
+
+        key = self.key(airfoil, M, M_distribution)
+        try:
+            camber = self.stored[key]
+        except KeyError:
+            camber = self.airfoil_db[airfoil](chordwise_distribution(M, M_distribution))
+            self.stored[key] = camber
+            self.modified = True
+        self.table[(airfoil, M, M_distribution)] = camber
+        return camber
+
+    def save(self):
+        """
+        Writes the new camber lines to the persistent cache, if there is one
+        """
+        if not (self.file_name and self.modified):
+            return
+        with h5.File(self.file_name, 'a') as file_handle:
+            for name, camber in self.stored.items():
+                if name not in file_handle:
+                    file_handle.create_dataset(name, data=camber)
+        self.modified = False
+
+
+def generate_strips(strips_info, airfoil_db, aligned_grid, orientation_in=np.array([1, 0, 0]), camber_cache=None):
+    """
+    Batched version of ``generate_strip``: returns all the strips of a surface
+    in "a" frame of reference at once.
+
+    The camber line of every airfoil is evaluated only once, and the rotations
+    of all the strips are applied in a single product.
+    :param strips_info: same as ``node_info`` in ``generate_strip``, but ``chord``,
+        ``eaxis``, ``twist`` and ``airfoil`` are ``[n_strips]`` arrays, ``beam_coord``
+        is ``[n_strips, 3]`` and ``cab`` ``[n_strips, 3, 3]``
+    :param airfoil_db:
+    :param aligned_grid:
+    :param orientation_in:
+    :param camber_cache: ``CamberCache`` with the camber lines of the airfoils in ``airfoil_db``.
+        If ``None``, they are evaluated with ``airfoil_db``.
+    :return: ``[3, M + 1, n_strips]`` array of coordinates
+    """
+    n_strips = len(strips_info['chord'])
+    chord = strips_info['chord']
+    domain = chordwise_distribution(strips_info['M'], strips_info['M_distribution'])
+
+    # airfoil coordinates in the x-z plane of the b FoR, with the elastic
+    # axis correction and chord scaling
+    strip_coordinates_b_frame = np.zeros((n_strips, 3, strips_info['M'] + 1), dtype=ct.c_double)
+    strip_coordinates_b_frame[:, 1, :] = (domain[None, :] - strips_info['eaxis'][:, None])*chord[:, None]
+    for airfoil in np.unique(strips_info['airfoil']):
+        i_strips = strips_info['airfoil'] == airfoil
+        if camber_cache is None:
+            camber = airfoil_db[airfoil](domain)
+        else:
+            camber = camber_cache.get(airfoil, strips_info['M'], strips_info['M_distribution'])
+        strip_coordinates_b_frame[i_strips, 2, :] = camber[None, :]*chord[i_strips, None]
+
+    # twist transformation (rotation around x_b axis)
+    twist = np.where(np.abs(strips_info['twist']) > 1e-6, strips_info['twist'], 0.0)
+    Ctwist = algebra.rotation3d_x_vec(twist)
+
+    # sweep angle correction
+    # angle between orientation_in and chord line
+    Cab = strips_info['cab']
+    chord_line_b_frame = strip_coordinates_b_frame[:, :, -1] - strip_coordinates_b_frame[:, :, 0]
+    chord_line_a_frame = np.einsum('nij,nj->ni', Cab, chord_line_b_frame)
+    sweep_angle = algebra.angle_between_vectors_sign_vec(orientation_in, chord_line_a_frame, np.array([0, 0, 1]))
+    Csweep = algebra.rotation3d_z_vec(-sweep_angle)
+
+    # transformation from beam to aero, and node coords
+    rot = np.matmul(Cab, np.matmul(Csweep, Ctwist))
+    strip_coordinates_a_frame = np.einsum('nij,njm->imn', rot, strip_coordinates_b_frame)
+    strip_coordinates_a_frame += strips_info['beam_coord'].T[:, None, :]
+    return strip_coordinates_a_frame
+
+
 def generate_strip(node_info, airfoil_db, aligned_grid, orientation_in=np.array([1, 0, 0])):
     """
     Returns a strip in "a" frame of reference, it has to be then rotated to
     simulate angles of attack, etc
+
+    ``Aerogrid.generate_zeta`` uses the batched version ``generate_strips``, this is
+    kept as the reference implementation.
     :param node_info:
     :param airfoil_db:
     :param aligned_grid:
@@ -279,7 +605,10 @@ def generate_strip(node_info, airfoil_db, aligned_grid, orientation_in=np.array(
         Ctwist = np.eye(3)
 
     # Cab transformation
-    Cab = algebra.crv2rot(node_info['beam_psi'])
+    try:
+        Cab = node_info['cab']
+    except KeyError:
+        Cab = algebra.crv2rot(node_info['beam_psi'])
 
     # sweep angle correction
     # angle between orientation_in and chord line
@@ -0,0 +1,143 @@
+"""
+Block matrices with low-rank compressed blocks.
+
+The off-diagonal blocks of matrices coming from the interaction between well separated sets of
+points (such as the AIC between two lifting surfaces) are numerically low rank. They are
+approximated with the adaptive cross approximation (``aca``), which only needs some of their rows
+and columns, and stored as ``U.V``.
+"""
+import numpy as np
+import scipy.linalg
+import scipy.sparse.linalg
+
+
+def aca(row, column, shape, tolerance, max_rank=None):
+    """
+    Adaptive cross approximation (with partial pivoting) of a ``[m, n]`` matrix ``A ~ U.V``.
+
+    :param row: function returning the row ``i`` of the matrix (``[n]``)
+    :param column: function returning the column ``j`` of the matrix (``[m]``)
+    :param shape: ``(m, n)``
+    :param tolerance: relative error (in Frobenius norm) of the approximation
+    :param max_rank: maximum rank of the approximation, ``min(m, n)`` by default
+    :return: ``U`` (``[m, k]``) and ``V`` (``[k, n]``)
+    """
+    m, n = shape
+    if max_rank is None:
+        max_rank = min(m, n)
+    u = []
+    v = []
+    unused_rows = np.ones((m,), dtype=bool)
+    i_row = 0
+    norm_sq = 0.0
+    while len(u) < max_rank and np.any(unused_rows):
+        residual_row = row(i_row) - sum(u_l[i_row]*v_l for u_l, v_l in zip(u, v))
+        unused_rows[i_row] = False
+        j_column = np.argmax(np.abs(residual_row))
+        if residual_row[j_column] == 0.0:
+            # the row is already approximated, try with another one
+            i_row = np.flatnonzero(unused_rows)[0] if np.any(unused_rows) else i_row
+            continue
+
+        v_k = residual_row/residual_row[j_column]
+        u_k = column(j_column) - sum(v_l[j_column]*u_l for u_l, v_l in zip(u, v))
+        u_norm = np.linalg.norm(u_k)
+        v_norm = np.linalg.norm(v_k)
+        norm_sq += (u_norm*v_norm)**2 + 2.0*sum(np.dot(u_l, u_k)*np.dot(v_l, v_k) for u_l, v_l in zip(u, v))
+        u.append(u_k)
+        v.append(v_k)
+        if u_norm*v_norm <= tolerance*np.sqrt(abs(norm_sq)):
+            break
+
+        # next pivot row: largest entry of the last column among the unused rows
+        candidates = np.abs(u_k)
+        candidates[~unused_rows] = -1.0
+        i_row = np.argmax(candidates)
+
+    if not u:
+        return np.zeros((m, 0)), np.zeros((0, n))
+    return np.array(u).T, np.array(v)
+
+
+class BlockMatrix(object):
+    """
+    Square matrix split in blocks by the ``offsets`` of its rows (and columns), every one of them stored
+    either as a dense array or as a low-rank pair ``(U, V)``. Supports products (``dot``) and
+    solutions (``solve``, preconditioned GMRES).
+    """
+    def __init__(self, offsets):
+        self.offsets = np.array(offsets, dtype=int)
+        self.n_blocks = len(offsets) - 1
+        self.blocks = [[None]*self.n_blocks for i_block in range(self.n_blocks)]
+        self.diagonal_lu = None
+
+    @property
+    def shape(self):
+        return self.offsets[-1], self.offsets[-1]
+
+    def block_slice(self, i_block):
+        return slice(self.offsets[i_block], self.offsets[i_block + 1])
+
+    def block_shape(self, i_block, j_block):
+        return (self.offsets[i_block + 1] - self.offsets[i_block],
+                self.offsets[j_block + 1] - self.offsets[j_block])
+
+    def is_low_rank(self, i_block, j_block):
+        return isinstance(self.blocks[i_block][j_block], tuple)
+
+    @property
+    def n_entries(self):
+        """ Number of stored entries (the dense matrix has ``shape[0]**2``). """
+        n_entries = 0
+        for i_block in range(self.n_blocks):
+            for j_block in range(self.n_blocks):
+                if self.is_low_rank(i_block, j_block):
+                    n_entries += sum(factor.size for factor in self.blocks[i_block][j_block])
+                else:
+                    n_entries += self.blocks[i_block][j_block].size
+        return n_entries
+
+    def dot(self, x):
+        y = np.zeros((self.shape[0],) + x.shape[1:])
+        for i_block in range(self.n_blocks):
+            for j_block in range(self.n_blocks):
+                x_block = x[self.block_slice(j_block)]
+                if self.is_low_rank(i_block, j_block):
+                    u, v = self.blocks[i_block][j_block]
+                    y[self.block_slice(i_block)] += u.dot(v.dot(x_block))
+                else:
+                    y[self.block_slice(i_block)] += self.blocks[i_block][j_block].dot(x_block)
+        return y
+
+    def todense(self):
+        dense = np.zeros(self.shape)
+        for i_block in range(self.n_blocks):
+            for j_block in range(self.n_blocks):
+                block = self.blocks[i_block][j_block]
+                if self.is_low_rank(i_block, j_block):
+                    block = block[0].dot(block[1])
+                dense[self.block_slice(i_block), self.block_slice(j_block)] = block
+        return dense
+
+    def solve_diagonal(self, x):
+        """ Block Jacobi preconditioner: solution with the (dense) diagonal blocks. """
+        if self.diagonal_lu is None:
+            self.diagonal_lu = [scipy.linalg.lu_factor(self.blocks[i_block][i_block])
+                                for i_block in range(self.n_blocks)]
+        y = np.zeros_like(x)
+        for i_block in range(self.n_blocks):
+            y[self.block_slice(i_block)] = scipy.linalg.lu_solve(self.diagonal_lu[i_block],
+                                                                 x[self.block_slice(i_block)])
+        return y
+
+    def solve(self, rhs, tolerance, x0=None):
+        """
+        Solution of ``A.x = rhs`` by GMRES, preconditioned with the diagonal blocks.
+
+        :return: solution and ``info`` of ``scipy.sparse.linalg.gmres`` (> 0 if it did not converge)
+        """
+        operator = scipy.sparse.linalg.LinearOperator(self.shape, matvec=lambda x: self.dot(np.ravel(x)), dtype=float)
+        preconditioner = scipy.sparse.linalg.LinearOperator(self.shape,
+                                                            matvec=lambda x: self.solve_diagonal(np.ravel(x)),
+                                                            dtype=float)
+        return scipy.sparse.linalg.gmres(operator, rhs, x0=x0, rtol=tolerance, M=preconditioner)
@@ -1,7 +1,31 @@
 import numpy as np
+import scipy.sparse
+
 import sharpy.utils.algebra as algebra
 
 
+def node_rotations(pos_def, psi_def, master, master_elem, cag=np.eye(3), cab=None):
+    """
+    Rotation matrices ``Cbg`` of all the structural nodes (from their master element)
+    and the nodal positions in ``g`` frame, used by the force mappings.
+
+    :return: ``cbg`` ``[num_node, 3, 3]``, ``pos_g`` ``[num_node, 3]``
+    """
+    i_elem = master[:, 0]
+    i_local_node = master[:, 1]
+    node_master = master_elem[i_elem, i_local_node, :].astype(dtype=int)
+    is_master = node_master[:, 0] == -1
+    node_master[is_master, 0] = i_elem[is_master]
+    node_master[is_master, 1] = i_local_node[is_master]
+    if cab is None:
+        node_cab = algebra.crv2rot_vec(psi_def[node_master[:, 0], node_master[:, 1], :])
+    else:
+        node_cab = cab[node_master[:, 0], node_master[:, 1], :, :]
+    cbg = np.matmul(np.swapaxes(node_cab, 1, 2), cag)
+    pos_g = np.dot(pos_def, cag)
+    return cbg, pos_g
+
+
 def aero2struct_force_mapping(aero_forces,
                               struct2aero_mapping,
                               zeta,
@@ -9,32 +33,211 @@ def aero2struct_force_mapping(aero_forces,
                               psi_def,
                               master,
                               master_elem,
-                              cag=np.eye(3)):
+                              cag=np.eye(3),
+                              cab=None):
+    """
+    Maps the aerodynamic forces at the grid points to nodal forces and moments in the
+    ``b`` frame of every structural node.
+
+    ``struct2aero_mapping`` is the integer mapping generated by ``Aerogrid.generate_mapping``.
+    ``cab`` can be given as the ``[num_elem, num_node_elem, 3, 3]`` rotation table of
+    the structural timestep (``StructTimeStepInfo.cab()``); otherwise it is computed from ``psi_def``.
+    """
 
     n_node, _ = pos_def.shape
     struct_forces = np.zeros((n_node, 6))
 
-    for i_global_node in range(n_node):
-        for mapping in struct2aero_mapping[i_global_node]:
-            i_surf = mapping['i_surf']
-            i_n = mapping['i_n']
-            _, n_m, _ = aero_forces[i_surf].shape
-
-            i_elem, i_local_node = master[i_global_node, :]
-            i_master_elem, master_elem_local_node = master_elem[i_elem, i_local_node, :]
-            if i_master_elem == -1:
-                i_master_elem = i_elem
-                master_elem_local_node = i_local_node
+    cbg, pos_g = node_rotations(pos_def, psi_def, master, master_elem, cag, cab)
 
-            crv = psi_def[i_master_elem, master_elem_local_node, :]
-            cab = algebra.crv2rot(crv)
-            cbg = np.dot(cab.T, cag)
+    # all the grid points of every surface at once
+    for i_surf in range(len(aero_forces)):
+        i_entries = np.where(struct2aero_mapping['i_surf'] == i_surf)[0]
+        if len(i_entries) == 0:
+            continue
+        i_n = struct2aero_mapping['i_n'][i_entries]
+        i_node = struct2aero_mapping['i_node'][i_entries]
 
-            for i_m in range(n_m):
-                chi_g = zeta[i_surf][:, i_m, i_n] - np.dot(cag.T, pos_def[i_global_node, :])
+        node_forces = aero_forces[i_surf][:, :, i_n]
+        chi_g = zeta[i_surf][:, :, i_n] - pos_g[i_node, :].T[:, None, :]
 
-                struct_forces[i_global_node, 0:3] += np.dot(cbg, aero_forces[i_surf][0:3, i_m, i_n])
-                struct_forces[i_global_node, 3:6] += np.dot(cbg, aero_forces[i_surf][3:6, i_m, i_n])
-                struct_forces[i_global_node, 3:6] += np.dot(cbg, np.cross(chi_g, aero_forces[i_surf][0:3, i_m, i_n]))
+        strip_forces = np.sum(node_forces[0:3, :, :], axis=1)
+        strip_moments = (np.sum(node_forces[3:6, :, :], axis=1) +
+                         np.sum(np.cross(chi_g, node_forces[0:3, :, :], axis=0), axis=1))
+        np.add.at(struct_forces[:, 0:3], i_node, np.einsum('nij,jn->ni', cbg[i_node], strip_forces))
+        np.add.at(struct_forces[:, 3:6], i_node, np.einsum('nij,jn->ni', cbg[i_node], strip_moments))
 
     return struct_forces
+
+
+def aero2struct_force_operator(struct2aero_mapping,
+                               zeta,
+                               pos_def,
+                               psi_def,
+                               master,
+                               master_elem,
+                               cag=np.eye(3),
+                               cab=None):
+    """
+    Sparse operator equivalent to ``aero2struct_force_mapping`` for the current geometry.
+
+    It acts on the flattened forces buffer of the aero timestep
+    (``AeroTimeStepInfo.buffers['forces'].reshape(-1)``, ``[6, n_bound_vertices]``) and returns the
+    flattened ``[num_node, 6]`` structural forces:
+
+        ``struct_forces = (operator.dot(forces.reshape(-1))).reshape((num_node, 6))``
+
+    The arguments are the same as in ``aero2struct_force_mapping``. The operator only depends on the
+    geometry, so it can be reused for any forces while the grid and beam are not modified.
+
+    :return: ``scipy.sparse.csr_matrix`` of size ``[6*num_node, 6*n_bound_vertices]``
+    """
+    n_node, _ = pos_def.shape
+    cbg, pos_g = node_rotations(pos_def, psi_def, master, master_elem, cag, cab)
+
+    # offsets of the surfaces in the buffer
+    n_points = [zeta_surf.shape[1]*zeta_surf.shape[2] for zeta_surf in zeta]
+    offsets = np.concatenate(([0], np.cumsum(n_points))).astype(dtype=int)
+    n_total = offsets[-1]
+
+    rows = []
+    cols = []
+    values = []
+    i_dim = np.arange(3)
+    for i_surf in range(len(zeta)):
+        i_entries = np.where(struct2aero_mapping['i_surf'] == i_surf)[0]
+        if len(i_entries) == 0:
+            continue
+        m_points, n_span = zeta[i_surf].shape[1:3]
+        i_n = struct2aero_mapping['i_n'][i_entries]
+        i_node = struct2aero_mapping['i_node'][i_entries]
+
+        # every chordwise point of every strip, [n_strips, M + 1]
+        point = offsets[i_surf] + np.arange(m_points)[None, :]*n_span + i_n[:, None]
+        point_node = np.repeat(i_node[:, None], m_points, axis=1)
+        point, point_node = point.reshape(-1), point_node.reshape(-1)
+        chi_g = zeta[i_surf][:, :, i_n].transpose((2, 1, 0)).reshape((-1, 3)) - pos_g[point_node, :]
+
+        point_cbg = cbg[point_node, :, :]
+        point_cbg_chi = np.matmul(point_cbg, algebra.rot_skew_vec(chi_g))
+        for row_offset, col_offset, block in [(0, 0, point_cbg),         # forces
+                                              (3, 3, point_cbg),         # moments
+                                              (3, 0, point_cbg_chi)]:    # moments of the forces
+            rows.append((6*point_node[:, None, None] + row_offset + i_dim[None, :, None] +
+                         0*i_dim[None, None, :]).reshape(-1))
+            cols.append(((col_offset + i_dim[None, None, :])*n_total + point[:, None, None] +
+                         0*i_dim[None, :, None]).reshape(-1))
+            values.append(block.reshape(-1))
+
+    if rows:
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        values = np.concatenate(values)
+    return scipy.sparse.coo_matrix((values, (rows, cols)), shape=(6*n_node, 6*n_total)).tocsr()
+
+
+def struct2aero_displacement_operator(struct2aero_mapping,
+                                      zeta,
+                                      pos_def,
+                                      psi_def,
+                                      cab=None,
+                                      orientation=None,
+                                      chord_lines=None):
+    """
+    Linearised structure to aero grid displacement transfer around the current geometry.
+
+    Every strip is moved as a rigid body attached to its structural node, the same kinematics
+    that ``aero2struct_force_mapping`` assumes to transfer the moments of the panel forces. If
+    ``orientation`` and ``chord_lines`` are given, the variation of the sweep correction of
+    ``generate_strips`` is added (except for strips whose chord line is aligned with ``orientation``,
+    where the sweep angle is not differentiable); otherwise it is frozen at the linearisation point.
+
+    The operator acts on the flattened ``[num_node, 6]`` array of variations of the structural degrees
+    of freedom: ``delta_pos`` (``a`` frame) and ``delta_psi`` (CRV of the master element of the node, as
+    given by ``struct2aero_mapping['master_elem']``), and returns the variation of the bound grid in the
+    layout of the zeta buffer of the aero timestep (``AeroTimeStepInfo.buffers['zeta']``, ``[3, n_bound_vertices]``):
+
+        ``delta_zeta = (operator.dot(delta_dofs.reshape(-1))).reshape((3, -1))``
+
+    :param struct2aero_mapping: CSR-like mapping of ``Aerogrid``
+    :param zeta: list of ``[3, M + 1, N + 1]`` bound grids in ``a`` frame at the linearisation point
+    :param pos_def: ``[num_node, 3]`` nodal positions at the linearisation point
+    :param psi_def: ``[num_elem, num_node_elem, 3]`` CRVs at the linearisation point
+    :param cab: ``[num_elem, num_node_elem, 3, 3]`` rotation matrices of ``psi_def``, computed if ``None``
+    :param orientation: ``orientation_in`` of ``generate_strips``
+    :param chord_lines: ``[n_entries, 3]`` chord lines of the strips of every entry of ``struct2aero_mapping``
+        in ``a`` frame (before the sweep correction), as computed in ``generate_strips``
+    :return: ``scipy.sparse.csr_matrix`` of size ``[3*n_bound_vertices, 6*num_node]``
+    """
+    num_node, _ = pos_def.shape
+    n_points = [zeta_surf.shape[1]*zeta_surf.shape[2] for zeta_surf in zeta]
+    offsets = np.concatenate(([0], np.cumsum(n_points))).astype(dtype=int)
+    n_total = offsets[-1]
+
+    # rotation of the node for a unit variation of its CRV, in a frame
+    master_elem = struct2aero_mapping['master_elem']
+    master_elem_node = struct2aero_mapping['master_elem_node']
+    entry_psi = psi_def[master_elem, master_elem_node, :]
+    if cab is None:
+        entry_cab = algebra.crv2rot_vec(entry_psi)
+    else:
+        entry_cab = cab[master_elem, master_elem_node, :, :]
+    entry_cab_tan = np.matmul(entry_cab, algebra.crv2tan_vec(entry_psi))
+
+    if orientation is not None and chord_lines is not None:
+        # sweep angle = sign*atan2(|o x c|, o.c), with sign that of (o x c).z_a
+        # (algebra.angle_between_vectors_sign), and its variation for delta_c = delta_rot x c
+        normal = np.array([0., 0., 1.])
+        cross = np.cross(orientation, chord_lines)
+        y = np.linalg.norm(cross, axis=1)
+        x = np.dot(chord_lines, orientation)
+        sign = np.where(np.dot(cross, normal) < 0, -1.0, 1.0)
+        # the angle is not differentiable when the chord line is aligned with orientation
+        y_safe = np.where(y > 1e-12, y, 1.0)
+        grad_y = np.where((y > 1e-12)[:, None], np.cross(cross, orientation)/y_safe[:, None], 0.0)
+        grad_sweep = (sign[:, None]*(x[:, None]*grad_y - y[:, None]*orientation[None, :]) /
+                      (x*x + y*y)[:, None])
+        entry_sweep = -np.einsum('ni,nij->nj',
+                                 grad_sweep,
+                                 np.matmul(algebra.rot_skew_vec(chord_lines), entry_cab_tan))
+        # the correction rotates the strip around z_b
+        entry_z_b = entry_cab[:, :, 2]
+    else:
+        entry_sweep = None
+
+    rows = []
+    cols = []
+    values = []
+    i_dim = np.arange(3)
+    for i_surf in range(len(zeta)):
+        i_entries = np.where(struct2aero_mapping['i_surf'] == i_surf)[0]
+        if len(i_entries) == 0:
+            continue
+        m_points, n_span = zeta[i_surf].shape[1:3]
+        i_n = struct2aero_mapping['i_n'][i_entries]
+
+        point = offsets[i_surf] + np.arange(m_points)[None, :]*n_span + i_n[:, None]
+        point_entry = np.repeat(i_entries[:, None], m_points, axis=1)
+        point, point_entry = point.reshape(-1), point_entry.reshape(-1)
+        point_node = struct2aero_mapping['i_node'][point_entry]
+        chi_a = zeta[i_surf][:, :, i_n].transpose((2, 1, 0)).reshape((-1, 3)) - pos_def[point_node, :]
+
+        translation = np.zeros((len(point), 3, 3))
+        translation[:, :, :] = np.eye(3)
+        # delta_zeta = delta_rot x chi = -skew(chi) Cab T delta_psi
+        rotation = -np.matmul(algebra.rot_skew_vec(chi_a), entry_cab_tan[point_entry, :, :])
+        if entry_sweep is not None:
+            # delta_zeta = -delta_sweep z_b x chi
+            rotation -= (np.cross(entry_z_b[point_entry, :], chi_a)[:, :, None] *
+                         entry_sweep[point_entry, None, :])
+        for col_offset, block in [(0, translation), (3, rotation)]:
+            rows.append((i_dim[None, :, None]*n_total + point[:, None, None] +
+                         0*i_dim[None, None, :]).reshape(-1))
+            cols.append((6*point_node[:, None, None] + col_offset + i_dim[None, None, :] +
+                         0*i_dim[None, :, None]).reshape(-1))
+            values.append(block.reshape(-1))
+
+    if rows:
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        values = np.concatenate(values)
+    return scipy.sparse.coo_matrix((values, (rows, cols)), shape=(3*n_total, 6*num_node)).tocsr()
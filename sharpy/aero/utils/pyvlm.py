@@ -0,0 +1,923 @@
+"""
+Pure NumPy steady vortex lattice solver.
+
+Python backend of ``StaticUvlm``, equivalent to ``uvlmlib.vlm_solver``. It does not depend on
+the native UVLM library, and it is also used as the reference for the performance of the
+native one. The lattice is described as a set of straight vortex segments (and semi-infinite
+ones for the horseshoe wake), each one of them with the index of the bound circulation it
+carries, so that the same Biot-Savart kernel is used for the AIC, the induced velocities and
+the forces.
+
+The panels follow the ordering of the grid: the ring ``(i, j)`` goes around the vertices
+``(i, j) -> (i + 1, j) -> (i + 1, j + 1) -> (i, j + 1)``, and its normal is given by
+``(zeta[i + 1, j + 1] - zeta[i, j]) x (zeta[i, j + 1] - zeta[i + 1, j])``.
+"""
+import numpy as np
+import scipy.linalg
+import scipy.sparse
+import scipy.sparse.linalg
+
+import sharpy.aero.utils.lowrank as lowrank
+import sharpy.aero.utils.vortextree as vortextree
+import sharpy.utils.cout_utils as cout
+
+# segments (or points) closer than this do not induce velocities
+vortex_radius = 1e-6
+# default maximum number of (target, segment) pairs evaluated at once: small enough
+# for the temporary arrays of the kernels to stay in cache
+default_chunk_size = 2**15
+# reflection about the symmetry plane (xz plane of the G frame) of the half models
+symmetry_reflection = np.diag([1.0, -1.0, 1.0])
+
+
+def panel_normals(zeta):
+    """
+    Unit normals of the panels of a ``[3, M + 1, N + 1]`` grid.
+
+    :return: ``[3, M, N]`` array
+    """
+    diag1 = zeta[:, 1:, 1:] - zeta[:, :-1, :-1]
+    diag2 = zeta[:, :-1, 1:] - zeta[:, 1:, :-1]
+    normals = np.cross(diag1, diag2, axis=0)
+    return normals/np.linalg.norm(normals, axis=0)
+
+
+def panel_centres(zeta):
+    """
+    Collocation points (centres) of the panels of a ``[3, M + 1, N + 1]`` grid.
+
+    :return: ``[3, M, N]`` array
+    """
+    return 0.25*(zeta[:, :-1, :-1] + zeta[:, 1:, :-1] + zeta[:, 1:, 1:] + zeta[:, :-1, 1:])
+
+
+def segment_kernel(r1, r2):
+    """
+    Velocities induced by vortex segments of unit circulation, given the lists with the three components
+    of the vectors from their start (``r1``) and end (``r2``) points to the targets (arrays of any shape).
+
+    :return: list with the three components
+    """
+    r1_norm = np.sqrt(r1[0]*r1[0] + r1[1]*r1[1] + r1[2]*r1[2])
+    r2_norm = np.sqrt(r2[0]*r2[0] + r2[1]*r2[1] + r2[2]*r2[2])
+    r1_r2 = [r1[1]*r2[2] - r1[2]*r2[1],
+             r1[2]*r2[0] - r1[0]*r2[2],
+             r1[0]*r2[1] - r1[1]*r2[0]]
+    r1_r2_sq = r1_r2[0]*r1_r2[0] + r1_r2[1]*r1_r2[1] + r1_r2[2]*r1_r2[2]
+    singular = ((r1_norm < vortex_radius) | (r2_norm < vortex_radius) |
+                (r1_r2_sq < vortex_radius*vortex_radius))
+
+    # (|r1| + |r2|)/(|r1||r2|(|r1||r2| + r1.r2)), equivalent to r0.(r1/|r1| - r2/|r2|)/|r1 x r2|^2
+    norm_product = r1_norm*r2_norm
+    denominator = norm_product*(norm_product + r1[0]*r2[0] + r1[1]*r2[1] + r1[2]*r2[2])
+    denominator[singular] = 1.0
+    factor = (r1_norm + r2_norm)/(4.0*np.pi*denominator)
+    factor[singular] = 0.0
+    return [factor*r1_r2[i_dim] for i_dim in range(3)]
+
+
+def biot_savart_segments(targets, seg_a, seg_b):
+    """
+    Velocities induced by the straight vortex segments ``seg_a -> seg_b`` of unit circulation.
+
+    :param targets: ``[n_targets, 3]``
+    :param seg_a: ``[n_segments, 3]``
+    :param seg_b: ``[n_segments, 3]``
+    :return: list with the ``[n_targets, n_segments]`` arrays of the three components
+    """
+    r1 = [targets[:, i_dim, None] - seg_a[None, :, i_dim] for i_dim in range(3)]
+    r2 = [targets[:, i_dim, None] - seg_b[None, :, i_dim] for i_dim in range(3)]
+    return segment_kernel(r1, r2)
+
+
+def biot_savart_semi_infinite(targets, seg_a, direction):
+    """
+    Velocities induced by the semi-infinite vortex segments of unit circulation starting at
+    ``seg_a`` and going to infinity along the unit vector ``direction``.
+
+    :param targets: ``[n_targets, 3]``
+    :param seg_a: ``[n_segments, 3]``
+    :param direction: ``[3]``
+    :return: list with the ``[n_targets, n_segments]`` arrays of the three components
+    """
+    r1 = [targets[:, i_dim, None] - seg_a[None, :, i_dim] for i_dim in range(3)]
+    r1_norm = np.sqrt(r1[0]*r1[0] + r1[1]*r1[1] + r1[2]*r1[2])
+    d_r1 = [direction[1]*r1[2] - direction[2]*r1[1],
+            direction[2]*r1[0] - direction[0]*r1[2],
+            direction[0]*r1[1] - direction[1]*r1[0]]
+    d_r1_sq = d_r1[0]*d_r1[0] + d_r1[1]*d_r1[1] + d_r1[2]*d_r1[2]
+
+    singular = (r1_norm < vortex_radius) | (d_r1_sq < vortex_radius*vortex_radius)
+    r1_norm[singular] = 1.0
+    d_r1_sq[singular] = 1.0
+
+    factor = (1.0 + (direction[0]*r1[0] + direction[1]*r1[1] + direction[2]*r1[2])/r1_norm)
+    factor /= 4.0*np.pi*d_r1_sq
+    factor[singular] = 0.0
+    return [factor*d_r1[i_dim] for i_dim in range(3)]
+
+
+class Lattice(object):
+    """
+    Set of vortex segments carrying the circulations of the bound panels.
+
+    The circulation of the segments is a linear combination of the bound circulations
+    (``AeroTimeStepInfo.buffers['gamma']``), given by the sparse ``[n_segments, n_gamma]``
+    matrices ``finite_gamma`` and ``infinite_gamma``: ``finite_gamma.dot(gamma)``. The
+    segments shared by several rings are only stored once, with their net circulation.
+    """
+    def __init__(self, n_gamma):
+        self.n_gamma = n_gamma
+        self.finite_a = np.zeros((0, 3))
+        self.finite_b = np.zeros((0, 3))
+        self.finite_gamma = scipy.sparse.csr_matrix((0, n_gamma))
+        self.infinite_a = np.zeros((0, 3))
+        self.infinite_gamma = scipy.sparse.csr_matrix((0, n_gamma))
+        self.direction = np.array([1.0, 0.0, 0.0])
+
+    @property
+    def n_segments(self):
+        return self.finite_a.shape[0] + self.infinite_a.shape[0]
+
+    def add_finite(self, seg_a, seg_b, circulation):
+        self.finite_a = np.concatenate((self.finite_a, seg_a))
+        self.finite_b = np.concatenate((self.finite_b, seg_b))
+        self.finite_gamma = scipy.sparse.vstack((self.finite_gamma, circulation)).tocsr()
+
+    def add_infinite(self, seg_a, circulation):
+        self.infinite_a = np.concatenate((self.infinite_a, seg_a))
+        self.infinite_gamma = scipy.sparse.vstack((self.infinite_gamma, circulation)).tocsr()
+
+    def columns(self, start, end):
+        """
+        Lattice of the segments carrying the circulations ``start:end``, with only those (renumbered
+        from 0) as its circulations.
+        """
+        lattice = Lattice(end - start)
+        lattice.direction = self.direction
+        finite_gamma = self.finite_gamma[:, start:end].tocsr()
+        carrying = np.diff(finite_gamma.indptr) > 0
+        lattice.finite_a = self.finite_a[carrying, :]
+        lattice.finite_b = self.finite_b[carrying, :]
+        lattice.finite_gamma = finite_gamma[carrying, :]
+        infinite_gamma = self.infinite_gamma[:, start:end].tocsr()
+        carrying = np.diff(infinite_gamma.indptr) > 0
+        lattice.infinite_a = self.infinite_a[carrying, :]
+        lattice.infinite_gamma = infinite_gamma[carrying, :]
+        return lattice
+
+    def bounding_box(self):
+        """ Bounding box (``[2, 3]``, minimum and maximum) of the finite segments and the start of the infinite ones. """
+        points = np.concatenate((self.finite_a, self.finite_b, self.infinite_a))
+        return np.array([np.min(points, axis=0), np.max(points, axis=0)])
+
+    def chunks(self, n_targets, chunk_size):
+        n_chunk = max(1, chunk_size//max(1, self.n_segments))
+        for i_start in range(0, n_targets, n_chunk):
+            yield slice(i_start, min(i_start + n_chunk, n_targets))
+
+    def segment_velocities(self, targets):
+        """ Velocities induced at ``targets`` by every segment with unit circulation. """
+        finite = []
+        infinite = []
+        if self.finite_a.shape[0]:
+            finite = biot_savart_segments(targets, self.finite_a, self.finite_b)
+        if self.infinite_a.shape[0]:
+            infinite = biot_savart_semi_infinite(targets, self.infinite_a, self.direction)
+        return finite, infinite
+
+    def influence(self, targets, normals, chunk_size=default_chunk_size):
+        """
+        Aerodynamic influence coefficients: normal velocity at ``targets`` (``[n_targets, 3]``) along
+        ``normals`` (``[n_targets, 3]``) induced by a unit value of every bound circulation.
+
+        :return: ``[n_targets, n_gamma]`` array
+        """
+        aic = np.zeros((targets.shape[0], self.n_gamma))
+        for chunk in self.chunks(targets.shape[0], chunk_size):
+            finite, infinite = self.segment_velocities(targets[chunk, :])
+            for velocities, circulation in [(finite, self.finite_gamma), (infinite, self.infinite_gamma)]:
+                if not velocities:
+                    continue
+                normal_velocity = sum(velocities[i_dim]*normals[chunk, i_dim, None] for i_dim in range(3))
+                aic[chunk, :] += circulation.T.dot(normal_velocity.T).T
+        return aic
+
+    def induced_velocity(self, targets, gamma, chunk_size=default_chunk_size, theta=0.0,
+                         leaf_size=vortextree.default_leaf_size):
+        """
+        Velocities induced at ``targets`` (``[n_targets, 3]``) by the circulations ``gamma``
+        (``[n_gamma]``, or ``[n_gamma, n_cases]`` for several sets of circulations at once).
+
+        With ``theta > 0`` (and a single set of circulations), they are evaluated with a tree-code
+        (``TreeVelocity``) instead of adding the influence of every segment.
+
+        :return: ``[n_targets, 3]`` (or ``[n_targets, 3, n_cases]``) array
+        """
+        if theta > 0.0 and gamma.ndim == 1:
+            return TreeVelocity(self, targets, theta, leaf_size, chunk_size).velocity(gamma)
+
+        induced = np.zeros((targets.shape[0], 3) + gamma.shape[1:])
+        finite_circulation = self.finite_gamma.dot(gamma)
+        infinite_circulation = self.infinite_gamma.dot(gamma)
+        for chunk in self.chunks(targets.shape[0], chunk_size):
+            finite, infinite = self.segment_velocities(targets[chunk, :])
+            for velocities, circulation in [(finite, finite_circulation), (infinite, infinite_circulation)]:
+                for i_dim in range(len(velocities)):
+                    induced[chunk, i_dim] += velocities[i_dim].dot(circulation)
+        return induced
+
+
+class TreeVelocity(object):
+    """
+    Tree-code evaluation (``vortextree``) of the velocities induced by the finite segments of a ``Lattice``
+    at fixed ``targets``, for any bound circulation. The accuracy is set by ``theta`` (0 evaluates every
+    interaction exactly). The velocities of the near field pairs of the ``interactions`` are stored
+    (``near``), and the semi-infinite segments are always evaluated exactly.
+    """
+    def __init__(self, lattice, targets, theta, leaf_size=vortextree.default_leaf_size,
+                 chunk_size=default_chunk_size):
+        self.lattice = lattice
+        self.n_targets = targets.shape[0]
+        tree = vortextree.VortexTree(lattice.finite_a, lattice.finite_b, leaf_size)
+        self.interactions = tree.interactions(targets, theta)
+
+        near_targets = self.interactions.near_targets
+        near_segments = self.interactions.near_segments
+        self.near = np.zeros((3, self.interactions.n_near))
+        for i_start in range(0, self.interactions.n_near, chunk_size):
+            i_target = near_targets[i_start:i_start + chunk_size]
+            i_segment = near_segments[i_start:i_start + chunk_size]
+            velocities = segment_kernel([targets[i_target, i_dim] - lattice.finite_a[i_segment, i_dim] for i_dim in range(3)],
+                                        [targets[i_target, i_dim] - lattice.finite_b[i_segment, i_dim] for i_dim in range(3)])
+            for i_dim in range(3):
+                self.near[i_dim, i_start:i_start + chunk_size] = velocities[i_dim]
+
+        self.infinite = []
+        if lattice.infinite_a.shape[0]:
+            self.infinite = biot_savart_semi_infinite(targets, lattice.infinite_a, lattice.direction)
+
+    def near_influence(self, normals):
+        """ Sparse ``[n_targets, n_gamma]`` normal velocities of the near field interactions. """
+        near_targets = self.interactions.near_targets
+        normal_velocity = scipy.sparse.csr_matrix((np.sum(self.near*normals[near_targets, :].T, axis=0),
+                                                   (near_targets, self.interactions.near_segments)),
+                                                  shape=(self.n_targets, self.lattice.finite_a.shape[0]))
+        return normal_velocity.dot(self.lattice.finite_gamma).tocsr()
+
+    def velocity(self, gamma):
+        """ ``[n_targets, 3]`` velocities induced by the ``[n_gamma]`` bound circulation. """
+        circulation = self.lattice.finite_gamma.dot(gamma)
+        induced = self.interactions.far_velocity(circulation)
+        near_circulation = circulation[self.interactions.near_segments]
+        for i_dim in range(3):
+            induced[:, i_dim] += np.bincount(self.interactions.near_targets, self.near[i_dim]*near_circulation,
+                                             minlength=self.n_targets)
+        if self.infinite:
+            infinite_circulation = self.lattice.infinite_gamma.dot(gamma)
+            for i_dim in range(3):
+                induced[:, i_dim] += self.infinite[i_dim].dot(infinite_circulation)
+        return induced
+
+
+class AicFactorisation(object):
+    """
+    LU factorisation of the AIC of a geometry, kept between calls to ``vlm_solver`` (for example
+    along the iterations of ``StaticCoupled``) and reused while the grid stays close to it.
+
+    Settings (``StaticUvlm``):
+
+    * ``aic_reuse``: ``'none'``, ``'direct'`` (the old factorisation is used to solve the new system
+      without assembling its AIC) or ``'preconditioner'`` (the new AIC is assembled and the system
+      is solved by iterative refinement preconditioned with the old factorisation, up to a relative
+      residual of ``iterative_tol``).
+    * ``aic_reuse_tolerance``: maximum displacement of the bound and wake vertices from the factorised
+      geometry for the factorisation to be reused. It is refactorised otherwise.
+    """
+    max_refinement_iterations = 20
+
+    def __init__(self):
+        self.lu = None
+        self.zeta = None
+        self.zeta_star = None
+        self.n_factorisations = 0
+        self.n_reuses = 0
+
+    def displacement(self, ts_info):
+        if (self.lu is None or
+                self.zeta.shape != ts_info.buffers['zeta'].shape or
+                self.zeta_star.shape != ts_info.buffers['zeta_star'].shape):
+            return np.inf
+        return max(np.max(np.abs(ts_info.buffers['zeta'] - self.zeta)),
+                   np.max(np.abs(ts_info.buffers['zeta_star'] - self.zeta_star), initial=0.0))
+
+    def factorise(self, aic, ts_info):
+        self.lu = scipy.linalg.lu_factor(aic)
+        self.zeta = ts_info.buffers['zeta'].copy()
+        self.zeta_star = ts_info.buffers['zeta_star'].copy()
+        self.n_factorisations += 1
+
+    def solve(self, rhs):
+        return scipy.linalg.lu_solve(self.lu, rhs)
+
+    def refine(self, aic, rhs, tolerance):
+        """
+        Iterative refinement of the solution of ``aic.x = rhs`` with the factorisation as preconditioner.
+
+        :return: solution, or ``None`` if it does not converge
+        """
+        x = self.solve(rhs)
+        rhs_norm = np.linalg.norm(rhs)
+        for i_iter in range(self.max_refinement_iterations):
+            residual = rhs - aic.dot(x)
+            if np.linalg.norm(residual) <= tolerance*rhs_norm:
+                return x
+            x += self.solve(residual)
+        return None
+
+
+class BoundAicCache(object):
+    """
+    Bound on bound AIC of the last geometry, kept in the body frame of the grid and reused while the
+    bound grid only moves as a rigid body (the AIC does not change with a rigid motion of the lattice).
+
+    The current grid is aligned to the cached one with its best fit rotation and translation, and the AIC
+    is assembled again if the remaining deformation is over ``aic_rigid_tolerance`` (``StaticUvlm``).
+    """
+    def __init__(self):
+        self.zeta = None
+        self.aic = None
+        self.n_assemblies = 0
+        self.n_reuses = 0
+
+    @staticmethod
+    def body_points(zeta):
+        """ ``[n_vertices, 3]`` vertices of the ``[3, n_vertices]`` grid relative to their centroid. """
+        points = zeta.T
+        return points - np.mean(points, axis=0)
+
+    def deformation(self, zeta):
+        """ Maximum distance of the vertices of ``zeta`` to the cached ones after the best fit rigid motion. """
+        if self.zeta is None or self.zeta.shape[0] != zeta.shape[1]:
+            return np.inf
+        points = self.body_points(zeta)
+        # Kabsch algorithm: rotation minimising |rotation.points - cached|
+        u, _, vt = np.linalg.svd(np.dot(points.T, self.zeta))
+        correction = np.diag([1.0, 1.0, np.sign(np.linalg.det(np.dot(vt.T, u.T)))])
+        rotation = np.dot(vt.T, np.dot(correction, u.T))
+        return np.max(np.abs(np.dot(points, rotation.T) - self.zeta))
+
+    def influence(self, zeta, lattices, centres, normals, tolerance, chunk_size=default_chunk_size):
+        """
+        Bound on bound AIC (see ``Lattice.influence``) of the ``lattices`` of the ``[3, n_vertices]`` grid
+        ``zeta`` (the bound grid, and its image for half models), reused if the grid has only moved rigidly.
+        """
+        if self.deformation(zeta) <= tolerance:
+            self.n_reuses += 1
+            return self.aic
+        self.aic = sum(lattice.influence(centres, normals, chunk_size) for lattice in lattices)
+        self.zeta = self.body_points(zeta)
+        self.n_assemblies += 1
+        return self.aic
+
+
+def solve_circulation(ts_info, assemble_aic, rhs, options, factorisation=None):
+    """
+    Solves the bound circulation for the AIC returned by ``assemble_aic()``, reusing ``factorisation``
+    (``AicFactorisation``) as given by ``options['aic_reuse']``.
+    """
+    if factorisation is None or options['aic_reuse'] == 'none':
+        return np.linalg.solve(assemble_aic(), rhs)
+
+    reuse = factorisation.displacement(ts_info) <= options['aic_reuse_tolerance'].value
+    if reuse and options['aic_reuse'] == 'direct':
+        factorisation.n_reuses += 1
+        return factorisation.solve(rhs)
+
+    aic = assemble_aic()
+    if reuse:
+        gamma = factorisation.refine(aic, rhs, options['iterative_tol'].value)
+        if gamma is not None:
+            factorisation.n_reuses += 1
+            return gamma
+    factorisation.factorise(aic, ts_info)
+    return factorisation.solve(rhs)
+
+
+def krylov_circulation(centres, normals, lattices, rhs, options, gamma=None):
+    """
+    Matrix-free solution of the bound circulation: GMRES with the AIC product evaluated with
+    ``TreeVelocity`` (``tree_theta`` and ``tree_leaf_size`` options), preconditioned with the sparse
+    LU factorisation of the near field AIC, up to a relative residual of ``iterative_tol``.
+
+    :param gamma: initial guess
+    """
+    chunk_size = options['aic_chunk_size'].value
+    operators = [TreeVelocity(lattice, centres, options['tree_theta'].value, options['tree_leaf_size'].value,
+                              chunk_size)
+                 for lattice in lattices]
+
+    def matvec(x):
+        x = np.ravel(x)
+        return np.sum(sum(operator.velocity(x) for operator in operators)*normals, axis=1)
+
+    n_gamma = rhs.size
+    aic = scipy.sparse.linalg.LinearOperator((n_gamma, n_gamma), matvec=matvec, dtype=float)
+    near = scipy.sparse.linalg.splu(sum(operator.near_influence(normals) for operator in operators).tocsc())
+    preconditioner = scipy.sparse.linalg.LinearOperator((n_gamma, n_gamma), matvec=near.solve, dtype=float)
+    gamma, info = scipy.sparse.linalg.gmres(aic, rhs, x0=gamma, rtol=options['iterative_tol'].value,
+                                            M=preconditioner)
+    if info > 0:
+        cout.cout_wrap('The matrix-free VLM solution did not converge in %u iterations' % info, 3)
+    return gamma
+
+
+def box_distance(box_a, box_b):
+    gap = np.maximum(0.0, np.maximum(box_a[0, :] - box_b[1, :], box_b[0, :] - box_a[1, :]))
+    return np.linalg.norm(gap)
+
+
+def block_aic(ts_info, lattices, centres, normals, options):
+    """
+    AIC as a ``lowrank.BlockMatrix`` with a block for every pair of surfaces (in the layout of
+    ``buffers['gamma']``). The blocks of well separated surfaces (the smallest diameter of the bounding
+    boxes of the collocation points and of the vortex segments, wake included, below ``aic_admissibility``
+    times their distance) are compressed with ``lowrank.aca`` up to ``aic_lowrank_tolerance``. They are
+    kept dense if the compression does not reduce their size, as the diagonal ones.
+    """
+    chunk_size = options['aic_chunk_size'].value
+    offsets = gamma_offsets(ts_info)
+    aic = lowrank.BlockMatrix(offsets)
+    sources = [[lattice.columns(offsets[j_surf], offsets[j_surf + 1]) for lattice in lattices]
+               for j_surf in range(ts_info.n_surf)]
+    for i_surf in range(ts_info.n_surf):
+        targets = centres[aic.block_slice(i_surf), :]
+        target_normals = normals[aic.block_slice(i_surf), :]
+        target_box = np.array([np.min(targets, axis=0), np.max(targets, axis=0)])
+        for j_surf in range(ts_info.n_surf):
+            surf_sources = sources[j_surf]
+            shape = aic.block_shape(i_surf, j_surf)
+            if i_surf != j_surf:
+                source_box = np.array([np.min([lattice.bounding_box()[0, :] for lattice in surf_sources], axis=0),
+                                       np.max([lattice.bounding_box()[1, :] for lattice in surf_sources], axis=0)])
+                diameter = min(np.linalg.norm(np.diff(target_box, axis=0)), np.linalg.norm(np.diff(source_box, axis=0)))
+                if diameter <= options['aic_admissibility'].value*box_distance(target_box, source_box):
+                    def row(i_row):
+                        return sum(lattice.influence(targets[i_row:i_row + 1, :], target_normals[i_row:i_row + 1, :],
+                                                     chunk_size)
+                                   for lattice in surf_sources)[0, :]
+
+                    def column(j_column):
+                        return sum(lattice.columns(j_column, j_column + 1).influence(targets, target_normals, chunk_size)
+                                   for lattice in surf_sources)[:, 0]
+
+                    u, v = lowrank.aca(row, column, shape, options['aic_lowrank_tolerance'].value)
+                    if u.size + v.size < shape[0]*shape[1]:
+                        aic.blocks[i_surf][j_surf] = (u, v)
+                        continue
+
+            aic.blocks[i_surf][j_surf] = sum(lattice.influence(targets, target_normals, chunk_size)
+                                             for lattice in surf_sources)
+    return aic
+
+
+def grid_segments(zeta, ring_gamma):
+    """
+    Unique segments of the rings of a ``[3, M + 1, N + 1]`` grid: the ``M*(N + 1)`` chordwise ones
+    (``(i, j) -> (i + 1, j)``) followed by the ``(M + 1)*N`` spanwise ones (``(i, j) -> (i, j + 1)``).
+
+    :param zeta: grid
+    :param ring_gamma: sparse ``[M*N, n_gamma]`` matrix with the circulation of every ring
+    :return: ``seg_a``, ``seg_b``, sparse ``[n_segments, n_gamma]`` circulation of the segments,
+        ``[n_segments, 2]`` indices of the vertices (in the flattened ``[M + 1, N + 1]`` grid)
+    """
+    m, n = zeta.shape[1] - 1, zeta.shape[2] - 1
+    i_vertex = np.arange((m + 1)*(n + 1)).reshape((m + 1, n + 1))
+    i_chordwise = np.arange(m*(n + 1)).reshape((m, n + 1))
+    i_spanwise = m*(n + 1) + np.arange((m + 1)*n).reshape((m + 1, n))
+
+    # signed incidence of the rings (i, j) -> (i + 1, j) -> (i + 1, j + 1) -> (i, j + 1)
+    i_ring = np.arange(m*n).reshape((m, n))
+    rows = np.concatenate((i_chordwise[:, :-1].reshape(-1), i_spanwise[1:, :].reshape(-1),
+                           i_chordwise[:, 1:].reshape(-1), i_spanwise[:-1, :].reshape(-1)))
+    signs = np.repeat([1.0, 1.0, -1.0, -1.0], m*n)
+    incidence = scipy.sparse.csr_matrix((signs, (rows, np.tile(i_ring.reshape(-1), 4))),
+                                        shape=(m*(n + 1) + (m + 1)*n, m*n))
+    circulation = incidence.dot(ring_gamma).tocsr()
+
+    seg_a = np.concatenate((zeta[:, :-1, :].reshape((3, -1)), zeta[:, :, :-1].reshape((3, -1))), axis=1).T
+    seg_b = np.concatenate((zeta[:, 1:, :].reshape((3, -1)), zeta[:, :, 1:].reshape((3, -1))), axis=1).T
+    vertices = np.concatenate((np.stack((i_vertex[:-1, :].reshape(-1), i_vertex[1:, :].reshape(-1)), axis=1),
+                               np.stack((i_vertex[:, :-1].reshape(-1), i_vertex[:, 1:].reshape(-1)), axis=1)))
+    return seg_a, seg_b, circulation, vertices
+
+
+def gamma_offsets(ts_info):
+    """ Offsets of the circulations of every surface in ``buffers['gamma']``. """
+    return np.concatenate(([0], np.cumsum([gamma.size for gamma in ts_info.gamma]))).astype(dtype=int)
+
+
+def bound_lattice(ts_info, symmetry=False):
+    """
+    Lattice of the bound rings of all the surfaces.
+
+    It also stores the indices of the vertices of the segments in the bound grid buffers
+    (``vertices``) and which segments are loaded (``loaded``, all but the trailing edge ones and,
+    with ``symmetry``, the ones on the symmetry plane, cancelled by their image).
+    """
+    offsets = gamma_offsets(ts_info)
+    lattice = Lattice(offsets[-1])
+    vertices = []
+    loaded = []
+    vertex_offset = 0
+    for i_surf in range(ts_info.n_surf):
+        m, n = ts_info.gamma[i_surf].shape
+        ring_gamma = scipy.sparse.csr_matrix((np.ones((m*n,)),
+                                              (np.arange(m*n), np.arange(offsets[i_surf], offsets[i_surf + 1]))),
+                                             shape=(m*n, offsets[-1]))
+        seg_a, seg_b, circulation, surf_vertices = grid_segments(ts_info.zeta[i_surf], ring_gamma)
+        lattice.add_finite(seg_a, seg_b, circulation)
+        vertices.append(surf_vertices + vertex_offset)
+        surf_loaded = np.ones((seg_a.shape[0],), dtype=bool)
+        surf_loaded[-n:] = False
+        loaded.append(surf_loaded)
+        vertex_offset += (m + 1)*(n + 1)
+    lattice.vertices = np.concatenate(vertices)
+    lattice.loaded = np.concatenate(loaded)
+    if symmetry:
+        lattice.loaded &= ~((np.abs(lattice.finite_a[:, 1]) < vortex_radius) &
+                            (np.abs(lattice.finite_b[:, 1]) < vortex_radius))
+    return lattice
+
+
+def wake_lattice(ts_info, horseshoe, direction):
+    """
+    Lattice of the wake rings. In a steady wake the circulation of every wake ring is the one of
+    the bound panel at the trailing edge of its column. With ``horseshoe``, every column of the
+    wake is a semi-infinite horseshoe from the trailing edge along ``direction``.
+    """
+    offsets = gamma_offsets(ts_info)
+    lattice = Lattice(offsets[-1])
+    lattice.direction = direction/np.linalg.norm(direction)
+    for i_surf in range(ts_info.n_surf):
+        m, n = ts_info.gamma[i_surf].shape
+        i_gamma_te = offsets[i_surf] + (m - 1)*n + np.arange(n)
+        zeta_star = ts_info.zeta_star[i_surf]
+        if horseshoe:
+            te = zeta_star[:, 0, :].T
+            # trailing edge segments and the legs, with the net circulation at every vertex
+            lattice.add_finite(te[:-1, :], te[1:, :],
+                               scipy.sparse.csr_matrix((-np.ones((n,)), (np.arange(n), i_gamma_te)),
+                                                       shape=(n, offsets[-1])))
+            legs = scipy.sparse.csr_matrix((np.concatenate((np.ones((n,)), -np.ones((n,)))),
+                                            (np.concatenate((np.arange(n), np.arange(1, n + 1))),
+                                             np.concatenate((i_gamma_te, i_gamma_te)))),
+                                           shape=(n + 1, offsets[-1]))
+            lattice.add_infinite(te, legs)
+        else:
+            m_star = zeta_star.shape[1] - 1
+            ring_gamma = scipy.sparse.csr_matrix((np.ones((m_star*n,)),
+                                                  (np.arange(m_star*n), np.tile(i_gamma_te, m_star))),
+                                                 shape=(m_star*n, offsets[-1]))
+            seg_a, seg_b, circulation, _ = grid_segments(zeta_star, ring_gamma)
+            # the spanwise segments inside the wake carry no circulation
+            circulation.eliminate_zeros()
+            carrying = np.diff(circulation.indptr) > 0
+            lattice.add_finite(seg_a[carrying, :], seg_b[carrying, :], circulation[carrying, :])
+    return lattice
+
+
+def image_lattice(lattice):
+    """
+    Image of ``lattice`` about the symmetry plane (``symmetry_reflection``), with the same circulations:
+    the segments are reflected and reversed, so that the velocities induced by a lattice and its image are
+    symmetric about the plane.
+    """
+    image = Lattice(lattice.n_gamma)
+    image.finite_a = np.dot(lattice.finite_b, symmetry_reflection)
+    image.finite_b = np.dot(lattice.finite_a, symmetry_reflection)
+    image.finite_gamma = lattice.finite_gamma
+    # the semi-infinite segments cannot be reversed: their circulation changes sign instead
+    image.infinite_a = np.dot(lattice.infinite_a, symmetry_reflection)
+    image.infinite_gamma = -lattice.infinite_gamma
+    image.direction = np.dot(symmetry_reflection, lattice.direction)
+    return image
+
+
+def with_images(lattices, symmetry):
+    """ ``lattices`` followed by their images if ``symmetry`` is set. """
+    if not symmetry:
+        return lattices
+    return lattices + [image_lattice(lattice) for lattice in lattices]
+
+
+def collocation(ts_info):
+    """ Collocation points, normals and external velocities at them, ``[n_gamma, 3]`` each. """
+    centres = []
+    normals = []
+    u_colloc = []
+    for i_surf in range(ts_info.n_surf):
+        ts_info.normals[i_surf][:] = panel_normals(ts_info.zeta[i_surf])
+        centres.append(panel_centres(ts_info.zeta[i_surf]).reshape((3, -1)).T)
+        normals.append(ts_info.normals[i_surf].reshape((3, -1)).T)
+        u_colloc.append(panel_centres(ts_info.u_ext[i_surf]).reshape((3, -1)).T)
+    return np.concatenate(centres), np.concatenate(normals), np.concatenate(u_colloc)
+
+
+def wake_intervals(m_star, dt, u_inf, stretching=1.0, stations=None):
+    """
+    Time intervals between the ``m_star + 1`` rows of the wake (convected with ``u_inf``):
+
+    * ``dt`` for all of them by default, as in the native library.
+    * Growing by a factor ``stretching`` from one row to the next one, starting with ``dt``.
+    * Given by the distances (``[m_star]``) of the rows to the trailing edge, ``stations``, if not empty.
+
+    :return: ``[m_star]`` array
+    """
+    if stations is not None and len(stations):
+        if len(stations) != m_star:
+            raise ValueError('wake_stations has %u values, the wake has %u rows' % (len(stations), m_star))
+        return np.diff(np.concatenate(([0.0], stations)))/np.linalg.norm(u_inf)
+    return dt*stretching**np.arange(m_star)
+
+
+def generate_wake(ts_info, u_inf, dt, stretching=1.0, stations=None):
+    """
+    Straight wake from the trailing edge along the free stream ``u_inf``, with rows separated
+    ``u_inf*dt`` (as generated by the native library), or as given by ``stretching`` and ``stations``
+    (see ``wake_intervals``).
+    """
+    for i_surf in range(ts_info.n_surf):
+        m_star = ts_info.zeta_star[i_surf].shape[1] - 1
+        times = np.concatenate(([0.0], np.cumsum(wake_intervals(m_star, dt, u_inf, stretching, stations))))
+        ts_info.zeta_star[i_surf][:] = (ts_info.zeta[i_surf][:, -1:, :] +
+                                        times[None, :, None]*u_inf[:, None, None])
+
+
+def agglomerate_wake(ts_info, distance):
+    """
+    Merges two consecutive rows of wake panels of every surface into a coarser one, so that a wake
+    of a fixed number of rows covers a longer distance. The merged pair is the shortest one starting further
+    than ``distance`` from the trailing edge whose merged panel is not longer than the next one (the most
+    downstream one if several are), so the panel length keeps growing downstream.
+
+    The circulation of the merged panel is the average of the two weighted with their chordwise lengths,
+    which keeps the total circulation of the trailing vortices and the vortex impulse of every column.
+    The rows downstream of the pair are moved one row upstream, and the freed last row extends the wake
+    with a panel of the length, direction and circulation of the one before it, so that no panel has zero length.
+
+    :return: number of surfaces whose wake has been agglomerated
+    """
+    wake_vertex_fields = [name for name, (n_comp, grid) in ts_info.fields.items() if grid == 'wake_vertices']
+    n_agglomerated = 0
+    for i_surf in range(ts_info.n_surf):
+        zeta_star = ts_info.zeta_star[i_surf]
+        gamma_star = ts_info.gamma_star[i_surf]
+        m_star = gamma_star.shape[0]
+        # chordwise length of the panels (average of both sides) and distance of their start to the trailing edge
+        edges = np.linalg.norm(np.diff(zeta_star, axis=1), axis=0)
+        lengths = 0.5*np.mean(edges[:, :-1] + edges[:, 1:], axis=1)
+        start = np.concatenate(([0.0], np.cumsum(lengths)[:-1]))
+        candidates = np.flatnonzero(start[:-1] >= distance)
+        if not candidates.size:
+            continue
+        # the merged panel cannot be longer than the next one (the last pair always qualifies)
+        pair_lengths = lengths[candidates] + lengths[candidates + 1]
+        next_lengths = np.append(lengths, np.inf)[candidates + 2]
+        valid = pair_lengths <= (1.0 + 1e-9)*next_lengths
+        candidates = candidates[valid]
+        pair_lengths = pair_lengths[valid]
+        # the most downstream of the shortest pairs
+        i_row = candidates[np.flatnonzero(pair_lengths <= (1.0 + 1e-9)*np.min(pair_lengths))[-1]]
+
+        column_lengths = 0.5*(edges[i_row:i_row + 2, :-1] + edges[i_row:i_row + 2, 1:])
+        gamma_star[i_row, :] = (np.sum(gamma_star[i_row:i_row + 2, :]*column_lengths, axis=0) /
+                                np.sum(column_lengths, axis=0))
+        gamma_star[i_row + 1:m_star - 1, :] = gamma_star[i_row + 2:m_star, :].copy()
+        gamma_star[m_star - 1, :] = gamma_star[m_star - 2, :]
+        # the vertex row between the merged panels is removed
+        for name in wake_vertex_fields:
+            field = getattr(ts_info, name)[i_surf]
+            field[:, i_row + 1:m_star, :] = field[:, i_row + 2:m_star + 1, :].copy()
+            field[:, m_star, :] = field[:, m_star - 1, :]
+        zeta_star[:, m_star, :] += zeta_star[:, m_star - 1, :] - zeta_star[:, m_star - 2, :]
+        n_agglomerated += 1
+    return n_agglomerated
+
+
+def steady_wake_circulation(ts_info):
+    for i_surf in range(ts_info.n_surf):
+        ts_info.gamma_star[i_surf][:] = ts_info.gamma[i_surf][-1, :]
+
+
+def kutta_joukowski(bound, lattices, gamma, u_segments, rho, n_vertices, chunk_size=default_chunk_size):
+    """
+    Steady Kutta-Joukowski forces on the loaded segments of the ``bound`` lattice for several sets of
+    circulations at once, lumped at the vertices of the bound grid (half to each vertex of a segment).
+
+    :param gamma: ``[n_gamma, n_cases]`` bound circulations
+    :param u_segments: ``[n_loaded, 3, n_cases]`` external velocities at the middle of the loaded segments
+    :return: ``[3, n_vertices, n_cases]`` array
+    """
+    vertices = bound.vertices[bound.loaded, :]
+    seg_a = bound.finite_a[bound.loaded, :]
+    seg_b = bound.finite_b[bound.loaded, :]
+    circulation = bound.finite_gamma[bound.loaded, :].dot(gamma)
+
+    midpoints = 0.5*(seg_a + seg_b)
+    velocities = u_segments.copy()
+    for lattice in lattices:
+        velocities += lattice.induced_velocity(midpoints, gamma, chunk_size)
+    segment_forces = rho*circulation[:, None, :]*np.cross(velocities, (seg_b - seg_a)[:, :, None], axis=1)
+
+    # index of (vertex, case) in the flattened [n_vertices, n_cases] arrays
+    n_cases = gamma.shape[1]
+    i_flat = [(vertices[:, i_vertex, None]*n_cases + np.arange(n_cases)[None, :]).reshape(-1)
+              for i_vertex in range(2)]
+    vertex_forces = np.zeros((3, n_vertices, n_cases))
+    for i_dim in range(3):
+        weights = 0.5*segment_forces[:, i_dim, :].reshape(-1)
+        vertex_forces[i_dim] = (np.bincount(i_flat[0], weights, minlength=n_vertices*n_cases) +
+                                np.bincount(i_flat[1], weights, minlength=n_vertices*n_cases)).reshape((n_vertices, n_cases))
+    return vertex_forces
+
+
+def forces(ts_info, bound, lattices, rho, chunk_size=default_chunk_size):
+    """
+    Steady Kutta-Joukowski forces on the loaded segments of the ``bound`` lattice,
+    ``rho*gamma*(u x dl)``, with ``u`` the external plus the induced velocity (by ``lattices``)
+    at the middle of the segment. Half of the force of every segment is added to each one of its
+    vertices in ``ts_info.forces``. The trailing edge segments are not loaded: their circulation
+    is cancelled by the first row of the wake.
+    """
+    vertices = bound.vertices[bound.loaded, :]
+    u_ext = ts_info.buffers['u_ext']
+    u_segments = 0.5*(u_ext[:, vertices[:, 0]] + u_ext[:, vertices[:, 1]]).T
+    ts_info.buffers['forces'].fill(0.0)
+    ts_info.buffers['forces'][0:3, :] = kutta_joukowski(bound, lattices,
+                                                        ts_info.buffers['gamma'][:, None],
+                                                        u_segments[:, :, None],
+                                                        rho,
+                                                        u_ext.shape[1],
+                                                        chunk_size)[:, :, 0]
+
+
+def rollup(ts_info, lattices, u_inf, dt, chunk_size=default_chunk_size, theta=0.0,
+           leaf_size=vortextree.default_leaf_size, stretching=1.0, stations=None):
+    """
+    Relaxes the wake along the local streamlines: every row of ``zeta_star`` is placed at the time interval
+    between the rows (``dt``, or see ``wake_intervals``) times the velocity at the previous one, starting
+    from the (fixed) trailing edge. The induced velocities are evaluated with a tree-code for ``theta > 0``
+    (see ``Lattice.induced_velocity``).
+
+    :return: maximum displacement of the wake vertices
+    """
+    gamma = ts_info.buffers['gamma']
+    # the velocities at the points of all the surfaces are evaluated at once
+    points = [ts_info.zeta_star[i_surf][:, :-1, :].reshape((3, -1)).T for i_surf in range(ts_info.n_surf)]
+    offsets = np.concatenate(([0], np.cumsum([surf_points.shape[0] for surf_points in points])))
+    points = np.concatenate(points)
+    velocities = u_inf[None, :] + sum(lattice.induced_velocity(points, gamma, chunk_size, theta, leaf_size)
+                                      for lattice in lattices)
+
+    residual = 0.0
+    for i_surf in range(ts_info.n_surf):
+        zeta_star = ts_info.zeta_star[i_surf]
+        intervals = wake_intervals(zeta_star.shape[1] - 1, dt, u_inf, stretching, stations)
+        steps = intervals[None, :, None]*velocities[offsets[i_surf]:offsets[i_surf + 1], :].T.reshape(
+            (3, zeta_star.shape[1] - 1, zeta_star.shape[2]))
+        new_zeta_star = zeta_star.copy()
+        new_zeta_star[:, 1:, :] = zeta_star[:, 0:1, :] + np.cumsum(steps, axis=1)
+        residual = max(residual, np.max(np.abs(new_zeta_star - zeta_star)))
+        zeta_star[:] = new_zeta_star
+    return residual
+
+
+def vlm_solver(ts_info, options, factorisation=None, bound_cache=None, symmetry=False):
+    """
+    Steady VLM solution of ``ts_info``: computes ``normals``, ``gamma``, ``gamma_star`` and
+    ``forces`` (and ``zeta_star`` if the wake is rolled up) with the same inputs as
+    ``uvlmlib.vlm_solver``.
+
+    ``options`` are the ``StaticUvlm`` settings (``horseshoe``, ``n_rollup``, ``rollup_dt``,
+    ``rollup_aic_refresh``, ``rollup_tolerance``, ``rho``, ``aic_chunk_size``, ``tree_theta``,
+    ``tree_leaf_size``, ``matrix_free``, ``aic_lowrank``, ``aic_lowrank_tolerance``,
+    ``aic_admissibility``, ``wake_stretching`` and ``wake_stations``). The free stream is taken from the first point of
+    ``u_ext``, as in the native library.
+
+    Without ``horseshoe``, the wake is rolled up (``rollup``) at most ``n_rollup`` times. The circulation
+    is updated every ``rollup_aic_refresh`` steps, and the rollup stops when its relative change is
+    below ``rollup_tolerance``.
+
+    If an ``AicFactorisation`` is given, it is reused (and updated) as set by ``aic_reuse`` and
+    ``aic_reuse_tolerance``. If a ``BoundAicCache`` is given and ``aic_rigid_reuse`` is set, the bound on
+    bound part of the AIC is taken from it while the bound grid only moves rigidly, so that only the wake
+    part is assembled. With ``matrix_free``, the AIC is not assembled: the circulation is solved
+    with ``krylov_circulation`` instead. The wake rollup and the matrix-free products use a tree-code
+    for ``tree_theta > 0``. With ``aic_lowrank``, the AIC is assembled with compressed blocks
+    between surfaces (``block_aic``) and the circulation is solved with GMRES.
+
+    With ``symmetry``, ``ts_info`` is half of a model symmetric about the xz plane, whose other half is
+    given by the images of the lattices (``image_lattice``, image method). The free stream has to be
+    symmetric too.
+    """
+    chunk_size = options['aic_chunk_size'].value
+    theta = options['tree_theta'].value
+    leaf_size = options['tree_leaf_size'].value
+    horseshoe = options['horseshoe'].value
+    rho = options['rho'].value
+    u_inf = ts_info.u_ext[0][:, 0, 0].copy()
+    stretching = options['wake_stretching'].value
+    stations = options['wake_stations']
+
+    generate_wake(ts_info, u_inf, options['rollup_dt'].value, stretching, stations)
+    centres, normals, u_colloc = collocation(ts_info)
+    rhs = -np.sum(u_colloc*normals, axis=1)
+
+    bound = bound_lattice(ts_info, symmetry)
+    bound_lattices = with_images([bound], symmetry)
+    bound_zeta = ts_info.buffers['zeta']
+    if symmetry:
+        bound_zeta = np.concatenate((bound_zeta, np.dot(symmetry_reflection, bound_zeta)), axis=1)
+    aic_bound = []
+
+    def assemble_aic():
+        # the bound part does not change during the rollup
+        if not aic_bound and bound_cache is not None and options['aic_rigid_reuse'].value:
+            aic_bound.append(bound_cache.influence(bound_zeta, bound_lattices, centres, normals,
+                                                   options['aic_rigid_tolerance'].value, chunk_size))
+        elif not aic_bound:
+            aic_bound.append(sum(lattice.influence(centres, normals, chunk_size) for lattice in bound_lattices))
+        return aic_bound[0] + sum(lattice.influence(centres, normals, chunk_size) for lattice in wake_lattices)
+
+    def solve(initial_gamma=None):
+        lattices = bound_lattices + wake_lattices
+        if options['matrix_free'].value:
+            return krylov_circulation(centres, normals, lattices, rhs, options, initial_gamma)
+        if options['aic_lowrank'].value:
+            solution, info = block_aic(ts_info, lattices, centres, normals, options).solve(
+                rhs, options['iterative_tol'].value, initial_gamma)
+            if info > 0:
+                cout.cout_wrap('The low-rank AIC VLM solution did not converge in %u iterations' % info, 3)
+            return solution
+        return solve_circulation(ts_info, assemble_aic, rhs, options, factorisation)
+
+    n_rollup = 0 if horseshoe else options['n_rollup'].value
+    aic_refresh = max(1, options['rollup_aic_refresh'].value)
+    gamma = ts_info.buffers['gamma']
+    wake_lattices = with_images([wake_lattice(ts_info, horseshoe, u_inf)], symmetry)
+    gamma[:] = solve()
+    steady_wake_circulation(ts_info)
+    for i_rollup in range(1, n_rollup + 1):
+        rollup(ts_info, bound_lattices + wake_lattices, u_inf, options['rollup_dt'].value, chunk_size, theta,
+               leaf_size, stretching, stations)
+        wake_lattices = with_images([wake_lattice(ts_info, horseshoe, u_inf)], symmetry)
+        if i_rollup % aic_refresh != 0 and i_rollup != n_rollup:
+            continue
+
+        # the wake is relaxed until the circulation converges
+        previous_gamma = gamma.copy()
+        gamma[:] = solve(previous_gamma)
+        steady_wake_circulation(ts_info)
+        if (np.max(np.abs(gamma - previous_gamma)) <
+                options['rollup_tolerance'].value*np.max(np.abs(gamma))):
+            break
+
+    forces(ts_info, bound, bound_lattices + wake_lattices, rho, chunk_size)
+
+
+def vlm_sweep(ts_info, options, u_inf, symmetry=False):
+    """
+    Steady VLM solution of the grid of ``ts_info`` for several uniform free streams: the AIC is assembled
+    and factorised once and the circulations of all of them are obtained with a single multiple
+    right hand side solve.
+
+    The wake is generated (and kept straight) along the free stream of ``ts_info.u_ext``, as in
+    ``vlm_solver``, for all the conditions, so the results only match the ones of ``vlm_solver``
+    for the conditions with that direction. ``ts_info.normals`` and ``ts_info.zeta_star`` are updated.
+    ``symmetry`` is the half model setting of ``vlm_solver``.
+
+    :param options: ``StaticUvlm`` settings (``horseshoe``, ``rollup_dt``, ``wake_stretching``, ``wake_stations``,
+        ``rho`` and ``aic_chunk_size``)
+    :param u_inf: ``[n_cases, 3]`` free stream velocities
+    :return: ``[n_gamma, n_cases]`` bound circulations and ``[n_cases, 3, n_vertices]`` forces at the
+        vertices of the bound grid (ordered as ``ts_info.buffers['forces']``)
+    """
+    chunk_size = options['aic_chunk_size'].value
+    u_inf = np.atleast_2d(u_inf)
+
+    generate_wake(ts_info, ts_info.u_ext[0][:, 0, 0].copy(), options['rollup_dt'].value,
+                  options['wake_stretching'].value, options['wake_stations'])
+    centres, normals, _ = collocation(ts_info)
+    bound = bound_lattice(ts_info, symmetry)
+    lattices = with_images([bound, wake_lattice(ts_info, options['horseshoe'].value, ts_info.u_ext[0][:, 0, 0])],
+                           symmetry)
+
+    lu = scipy.linalg.lu_factor(sum(lattice.influence(centres, normals, chunk_size) for lattice in lattices))
+    gamma = scipy.linalg.lu_solve(lu, -normals.dot(u_inf.T))
+
+    n_loaded = np.count_nonzero(bound.loaded)
+    u_segments = np.repeat(u_inf.T[None, :, :], n_loaded, axis=0)
+    vertex_forces = kutta_joukowski(bound, lattices, gamma, u_segments, options['rho'].value,
+                                    ts_info.buffers['zeta'].shape[1], chunk_size)
+    return gamma, np.moveaxis(vertex_forces, 2, 0)
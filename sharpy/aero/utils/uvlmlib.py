@@ -112,11 +112,12 @@ class FlightConditions(ct.Structure):
 t_2int = ct.POINTER(ct.c_int)*2
 
 
-def vlm_solver(ts_info, options):
+def vlm_solver(ts_info, options, image_method=False):
     run_VLM = UvlmLib.run_VLM
     run_VLM.restype = None
 
     vmopts = VMopts()
+    vmopts.ImageMethod = ct.c_bool(image_method)
     vmopts.Steady = ct.c_bool(True)
     vmopts.NumSurfaces = ct.c_uint(ts_info.n_surf)
     vmopts.horseshoe = ct.c_bool(options['horseshoe'].value)
@@ -146,7 +147,6 @@ def vlm_solver(ts_info, options):
             ts_info.ct_p_gamma_star,
             ts_info.ct_p_normals,
             ts_info.ct_p_forces)
-    ts_info.remove_ctypes_pointers()
 
 
 def uvlm_init(ts_info, struct_ts_info, flightconditions_in, options, inertial2aero):
@@ -195,10 +195,10 @@ def uvlm_init(ts_info, struct_ts_info, flightconditions_in, options, inertial2ae
               ts_info.ct_p_gamma_star,
               ts_info.ct_p_normals,
               ts_info.ct_p_forces)
-    ts_info.remove_ctypes_pointers()
 
 
-def uvlm_solver(i_iter, ts_info, previous_ts_info, struct_ts_info, flightconditions_in, options, inertial2aero):
+def uvlm_solver(i_iter, ts_info, previous_ts_info, struct_ts_info, flightconditions_in, options, inertial2aero,
+                image_method=False):
     run_UVLM = UvlmLib.run_UVLM
     run_UVLM.restype = None
 
@@ -207,7 +207,7 @@ def uvlm_solver(i_iter, ts_info, previous_ts_info, struct_ts_info, flightconditi
     uvmopts.NumCores = ct.c_uint(options["num_cores"])
     uvmopts.NumSurfaces = ct.c_uint(ts_info.n_surf)
     uvmopts.Mstar = ct.c_uint(options['mstar'])
-    uvmopts.ImageMethod = ct.c_bool(False)
+    uvmopts.ImageMethod = ct.c_bool(image_method)
     uvmopts.convection_scheme = ct.c_uint(options["convection_scheme"])
     uvmopts.iterative_solver = ct.c_bool(options['iterative_solver'])
     uvmopts.iterative_tol = ct.c_double(options['iterative_tol'])
@@ -255,6 +255,4 @@ def uvlm_solver(i_iter, ts_info, previous_ts_info, struct_ts_info, flightconditi
             ts_info.ct_p_normals,
             ts_info.ct_p_forces,
             ts_info.ct_p_dynamic_forces)
-    ts_info.remove_ctypes_pointers()
-    previous_ts_info.remove_ctypes_pointers()
 
@@ -0,0 +1,174 @@
+"""
+Tree-code (Barnes-Hut) evaluation of the velocities induced by sets of straight vortex segments.
+
+The segments are sorted in a binary tree (split at the median of the longest side of the bounding
+box of their midpoints), so that every node owns a contiguous range of them. Far from a node (its
+radius is smaller than ``theta`` times the distance to the target), its segments are replaced by the
+first two terms (vortex element and dipole) of the expansion of their velocity about the centre of
+the node. The rest of the interactions are evaluated exactly (``near`` pairs).
+
+The interaction lists only depend on the geometry, so they are computed once (``interactions``) and
+can be used for any number of circulation distributions (``TreeInteractions.velocity``), for
+example as the matrix-vector product of a Krylov solver.
+"""
+import numpy as np
+
+# default maximum number of segments in the leaves of the tree
+default_leaf_size = 32
+
+
+class VortexTree(object):
+    """
+    Binary tree of the vortex segments ``seg_a -> seg_b`` (``[n_segments, 3]`` each).
+
+    ``order`` is the permutation of the segments in the tree: the node ``i_node`` owns the segments
+    ``order[start[i_node]:end[i_node]]``.
+    """
+    def __init__(self, seg_a, seg_b, leaf_size=default_leaf_size):
+        self.n_segments = seg_a.shape[0]
+        self.leaf_size = max(1, leaf_size)
+        self.midpoints = 0.5*(seg_a + seg_b)
+        self.dl = seg_b - seg_a
+        self.order = np.arange(self.n_segments)
+
+        self.start = []
+        self.end = []
+        self.children = []
+        self.centre = []
+        self.radius = []
+        if self.n_segments:
+            self.split(seg_a, seg_b, 0, self.n_segments)
+        self.start = np.array(self.start, dtype=int)
+        self.end = np.array(self.end, dtype=int)
+        self.centre = np.array(self.centre).reshape((-1, 3))
+        self.radius = np.array(self.radius)
+
+    @property
+    def n_nodes(self):
+        return len(self.start)
+
+    def split(self, seg_a, seg_b, start, end):
+        i_node = len(self.start)
+        segments = self.order[start:end]
+        centre = np.mean(self.midpoints[segments, :], axis=0)
+        self.start.append(start)
+        self.end.append(end)
+        self.children.append([])
+        self.centre.append(centre)
+        self.radius.append(max(np.max(np.linalg.norm(seg_a[segments, :] - centre, axis=1)),
+                               np.max(np.linalg.norm(seg_b[segments, :] - centre, axis=1))))
+        if end - start <= self.leaf_size:
+            return i_node
+
+        extent = np.ptp(self.midpoints[segments, :], axis=0)
+        i_dim = np.argmax(extent)
+        if extent[i_dim] == 0.0:
+            return i_node
+        half = (end - start)//2
+        partition = np.argpartition(self.midpoints[segments, i_dim], half)
+        self.order[start:end] = segments[partition]
+        self.children[i_node] = [self.split(seg_a, seg_b, start, start + half),
+                                 self.split(seg_a, seg_b, start + half, end)]
+        return i_node
+
+    def interactions(self, targets, theta):
+        """
+        Interaction lists of the ``[n_targets, 3]`` ``targets`` for the accuracy parameter ``theta``
+        (ratio of the radius of a node to its distance to the target under which the expansion is used).
+
+        :return: ``TreeInteractions``
+        """
+        near_targets = []
+        near_segments = []
+        far_targets = []
+        far_nodes = []
+        stack = [(0, np.arange(targets.shape[0]))] if self.n_nodes else []
+        while stack:
+            i_node, i_targets = stack.pop()
+            distance = np.linalg.norm(targets[i_targets, :] - self.centre[i_node, :], axis=1)
+            far = self.radius[i_node] < theta*distance
+            far_targets.append(i_targets[far])
+            far_nodes.append(np.full((np.count_nonzero(far),), i_node, dtype=int))
+
+            i_targets = i_targets[~far]
+            if not i_targets.size:
+                continue
+            if self.children[i_node]:
+                for i_child in self.children[i_node]:
+                    stack.append((i_child, i_targets))
+            else:
+                segments = self.order[self.start[i_node]:self.end[i_node]]
+                near_targets.append(np.repeat(i_targets, segments.size))
+                near_segments.append(np.tile(segments, i_targets.size))
+
+        def concatenate(arrays):
+            return np.concatenate(arrays) if arrays else np.zeros((0,), dtype=int)
+
+        return TreeInteractions(self, targets,
+                                concatenate(near_targets), concatenate(near_segments),
+                                concatenate(far_targets), concatenate(far_nodes))
+
+    def moments(self, circulation):
+        """
+        Vortex element (``[n_nodes, 3]``) and dipole (``[n_nodes, 3, 3]``, ``sum(alpha_k*d_m)``) moments of
+        the nodes about their centres, for the ``[n_segments]`` ``circulation`` of the segments.
+        """
+        alpha = (circulation[:, None]*self.dl)[self.order, :]
+        dipole = (alpha[:, :, None]*self.midpoints[self.order, None, :]).reshape((-1, 9))
+
+        # the segments of every node are contiguous in the tree order
+        def node_sum(values):
+            cumulative = np.concatenate((np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)))
+            return cumulative[self.end, :] - cumulative[self.start, :]
+
+        element = node_sum(alpha)
+        dipole = node_sum(dipole).reshape((-1, 3, 3)) - element[:, :, None]*self.centre[:, None, :]
+        return element, dipole
+
+
+class TreeInteractions(object):
+    """
+    Interactions between a ``VortexTree`` and a set of targets: ``near_targets`` and ``near_segments``
+    are the pairs evaluated exactly and ``far_targets`` and ``far_nodes`` the ones evaluated with the
+    expansion of the node, whose kernel (``r/|r|^3`` and its gradient, with ``r`` from the centre of
+    the node to the target) is computed here.
+    """
+    def __init__(self, tree, targets, near_targets, near_segments, far_targets, far_nodes):
+        self.tree = tree
+        self.n_targets = targets.shape[0]
+        self.near_targets = near_targets
+        self.near_segments = near_segments
+        self.far_targets = far_targets
+        self.far_nodes = far_nodes
+
+        r = targets[far_targets, :] - tree.centre[far_nodes, :]
+        r_norm = np.linalg.norm(r, axis=1)
+        self.kernel = r/r_norm[:, None]**3
+        self.kernel_gradient = (np.eye(3)[None, :, :]/r_norm[:, None, None]**3 -
+                                3.0*r[:, :, None]*r[:, None, :]/r_norm[:, None, None]**5)
+
+    @property
+    def n_near(self):
+        return self.near_targets.size
+
+    @property
+    def n_far(self):
+        return self.far_targets.size
+
+    def far_velocity(self, circulation):
+        """
+        Velocities induced at the targets by the far nodes, ``[n_targets, 3]``.
+        """
+        element, dipole = self.tree.moments(circulation)
+        velocity = np.cross(element[self.far_nodes, :], self.kernel)
+        # - sum(alpha x (J d)), with J the kernel gradient
+        product = np.einsum('pkm,plm->pkl', dipole[self.far_nodes, :, :], self.kernel_gradient)
+        velocity[:, 0] -= product[:, 1, 2] - product[:, 2, 1]
+        velocity[:, 1] -= product[:, 2, 0] - product[:, 0, 2]
+        velocity[:, 2] -= product[:, 0, 1] - product[:, 1, 0]
+        velocity /= 4.0*np.pi
+
+        induced = np.zeros((self.n_targets, 3))
+        for i_dim in range(3):
+            induced[:, i_dim] = np.bincount(self.far_targets, velocity[:, i_dim], minlength=self.n_targets)
+        return induced
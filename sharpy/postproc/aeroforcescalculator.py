@@ -7,6 +7,7 @@ from sharpy.utils.settings import str2bool
 from sharpy.utils.solver_interface import solver, BaseSolver
 import sharpy.utils.settings as settings
 import sharpy.utils.algebra as algebra
+import sharpy.aero.utils.pyvlm as pyvlm
 
 
 class ForcesContainer(object):
@@ -76,7 +77,7 @@ class AeroForcesCalculator(BaseSolver):
 
     def calculate_forces(self):
         for self.ts in range(self.ts_max):
-            rot = algebra.quat2rot(self.data.structure.timestep_info[self.ts].quat).transpose()
+            rot = self.data.structure.timestep_info[self.ts].cga().transpose()
 
             force = self.data.aero.timestep_info[self.ts].forces
             unsteady_force = self.data.aero.timestep_info[self.ts].dynamic_forces
@@ -89,6 +90,10 @@ class AeroForcesCalculator(BaseSolver):
                     for i_n in range(n_cols):
                         total_steady_force += force[i_surf][0:3, i_m, i_n]
                         total_unsteady_force += unsteady_force[i_surf][0:3, i_m, i_n]
+                if self.data.aero.symmetry:
+                    # the image half of the model
+                    total_steady_force += np.dot(pyvlm.symmetry_reflection, total_steady_force)
+                    total_unsteady_force += np.dot(pyvlm.symmetry_reflection, total_unsteady_force)
                 self.data.aero.timestep_info[self.ts].inertial_steady_forces[i_surf, 0:3] = total_steady_force
                 self.data.aero.timestep_info[self.ts].inertial_unsteady_forces[i_surf, 0:3] = total_unsteady_force
                 self.data.aero.timestep_info[self.ts].body_steady_forces[i_surf, 0:3] = np.dot(rot.T, total_steady_force)
@@ -97,7 +97,7 @@ class AerogridPlot(BaseSolver):
             point_unsteady_cf = np.zeros((point_data_dim, 3))
             counter = -1
 
-            rotation_mat = algebra.quat2rot(self.data.structure.timestep_info[self.ts].quat).transpose()
+            rotation_mat = self.data.structure.timestep_info[self.ts].cga().transpose()
             # coordinates of corners
             for i_n in range(dims[1]+1):
                 for i_m in range(dims[0]+1):
@@ -107,14 +107,15 @@ class AerogridPlot(BaseSolver):
                         coords[counter, :] = np.dot(rotation_mat, self.data.aero.timestep_info[self.ts].zeta[i_surf][:, i_m, i_n])
                         coords[counter, :] += self.data.structure.timestep_info[self.ts].for_pos[0:3]
 
+            # structural node of every point (i_m runs faster than i_n)
+            point_struct_id[:] = np.repeat(self.data.aero.aero2struct_mapping[i_surf], dims[0] + 1)
+
             counter = -1
             node_counter = -1
             for i_n in range(dims[1] + 1):
-                global_counter = self.data.aero.aero2struct_mapping[i_surf][i_n]
                 for i_m in range(dims[0] + 1):
                     node_counter += 1
                     # point data
-                    point_struct_id[node_counter] = global_counter
                     point_cf[node_counter, :] = self.data.aero.timestep_info[self.ts].forces[i_surf][0:3, i_m, i_n]
                     try:
                         point_unsteady_cf[node_counter, :] = self.data.aero.timestep_info[self.ts].dynamic_forces[i_surf][0:3, i_m, i_n]
@@ -162,7 +163,7 @@ class AerogridPlot(BaseSolver):
                         '%02u_' % i_surf +
                         '%06u' % self.ts)
 
-            dims_star = self.data.aero.timestep_info[self.ts].dimensions_star[i_surf, :]
+            dims_star = self.data.aero.timestep_info[self.ts].dimensions_star[i_surf, :].copy()
             dims_star[0] -= self.settings['minus_m_star']
 
             point_data_dim = (dims_star[0]+1)*(dims_star[1]+1)
@@ -174,7 +175,7 @@ class AerogridPlot(BaseSolver):
             panel_surf_id = np.zeros((panel_data_dim,), dtype=int)
             panel_gamma = np.zeros((panel_data_dim,))
             counter = -1
-            rotation_mat = algebra.quat2rot(self.data.structure.timestep_info[self.ts].quat).transpose()
+            rotation_mat = self.data.structure.timestep_info[self.ts].cga().transpose()
             # coordinates of corners
             for i_n in range(dims_star[1]+1):
                 for i_m in range(dims_star[0]+1):
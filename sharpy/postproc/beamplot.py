@@ -98,7 +98,7 @@ class BeamPlot(BaseSolver):
             unsteady_app_forces = np.zeros((num_nodes, 3))
 
             # aero2inertial rotation
-            aero2inertial = algebra.quat2rot(self.data.structure.timestep_info[it].quat).transpose()
+            aero2inertial = self.data.structure.timestep_info[it].cga().transpose()
 
             # coordinates of corners
             # for i_node in range(num_nodes):
@@ -108,38 +108,27 @@ class BeamPlot(BaseSolver):
             #         coords[i_node, :] += self.data.structure.timestep_info[it].for_pos[0:3]
             coords = self.data.structure.timestep_info[it].glob_pos(include_rbm=self.settings['include_rbm'])
 
-            for i_node in range(num_nodes):
-                i_elem = self.data.structure.node_master_elem[i_node, 0]
-                i_local_node = self.data.structure.node_master_elem[i_node, 1]
-                node_id[i_node] = i_node
-
-                # v1, v2, v3 = self.data.structure.elements[i_elem].deformed_triad(
-                #     self.data.structure.timestep_info[it].psi[i_elem, :, :]
-                # )
-                # local_x[i_node, :] = np.dot(aero2inertial, v1[i_local_node, :])
-                # local_y[i_node, :] = np.dot(aero2inertial, v2[i_local_node, :])
-                # local_z[i_node, :] = np.dot(aero2inertial, v3[i_local_node, :])
-                v1 = np.array([1., 0, 0])
-                v2 = np.array([0., 1, 0])
-                v3 = np.array([0., 0, 1])
-                cab = algebra.crv2rot(
-                    self.data.structure.timestep_info[it].psi[i_elem, i_local_node, :])
-                local_x[i_node, :] = np.dot(aero2inertial, np.dot(cab, v1))
-                local_y[i_node, :] = np.dot(aero2inertial, np.dot(cab, v2))
-                local_z[i_node, :] = np.dot(aero2inertial, np.dot(cab, v3))
-
-                # applied forces
-                cab = algebra.crv2rot(self.data.structure.timestep_info[it].psi[i_elem, i_local_node, :])
-                app_forces[i_node, :] = np.dot(aero2inertial,
-                                               np.dot(cab,
-                                                      self.data.structure.timestep_info[it].steady_applied_forces[i_node, 0:3]))
-                if not it == 0:
-                    try:
-                        unsteady_app_forces[i_node, :] = np.dot(aero2inertial,
-                                                                np.dot(cab,
-                                                                       self.data.structure.dynamic_input[it - 1]['dynamic_forces'][i_node, 0:3]))
-                    except IndexError:
-                        pass
+            node_id[:] = np.arange(num_nodes)
+            i_elem = self.data.structure.node_master_elem[:, 0]
+            i_local_node = self.data.structure.node_master_elem[:, 1]
+            # local frame of every node in one go: columns of aero2inertial*Cab
+            cab = self.data.structure.timestep_info[it].cab()[i_elem, i_local_node, :, :]
+            cgb = np.matmul(aero2inertial, cab)
+            local_x[:] = cgb[:, :, 0]
+            local_y[:] = cgb[:, :, 1]
+            local_z[:] = cgb[:, :, 2]
+
+            # applied forces
+            app_forces[:] = np.einsum('nij,nj->ni',
+                                      cgb,
+                                      self.data.structure.timestep_info[it].steady_applied_forces[:, 0:3])
+            if not it == 0:
+                try:
+                    unsteady_app_forces[:] = np.einsum('nij,nj->ni',
+                                                       cgb,
+                                                       self.data.structure.dynamic_input[it - 1]['dynamic_forces'][:, 0:3])
+                except IndexError:
+                    pass
 
             for i_elem in range(num_elem):
                 conn[i_elem, :] = self.data.structure.elements[i_elem].reordered_global_connectivities
@@ -44,6 +44,12 @@ def main(args):
         solver.initialise(data)
         data = solver.run()
 
+    # flush the aero timesteps stored in disk, if any
+    try:
+        data.aero.close_history()
+    except AttributeError:
+        pass
+
     elapsed_time = time.process_time() - t
     cout.cout_wrap('FINISHED - Elapsed time = %f6 seconds' % elapsed_time, 2)
     finish_writer()
@@ -1,3 +1,5 @@
+import os
+
 import h5py as h5
 import numpy as np
 
@@ -28,6 +30,33 @@ class AerogridLoader(BaseSolver):
         self.settings_types['mstar'] = 'int'
         self.settings_default['mstar'] = 10
 
+        # the model is half of a model symmetric about the xz plane of the G frame, the
+        # other half is given by its image (image method in the aerodynamic solvers)
+        self.settings_types['symmetry'] = 'bool'
+        self.settings_default['symmetry'] = False
+
+        # only the strips whose node has moved/rotated more than these are regenerated
+        self.settings_types['regeneration_pos_tolerance'] = 'float'
+        self.settings_default['regeneration_pos_tolerance'] = 0.0
+
+        self.settings_types['regeneration_psi_tolerance'] = 'float'
+        self.settings_default['regeneration_psi_tolerance'] = 0.0
+
+        # HDF5 file to keep the airfoil camber lines between runs, none if empty
+        self.settings_types['camber_cache_file'] = 'str'
+        self.settings_default['camber_cache_file'] = ''
+
+        # 'all' keeps every timestep in memory, 'spill' and 'discard' only the
+        # last history_length ones, see datastructures.AeroTimeStepHistory
+        self.settings_types['history_policy'] = 'str'
+        self.settings_default['history_policy'] = 'all'
+
+        self.settings_types['history_length'] = 'int'
+        self.settings_default['history_length'] = 10
+
+        self.settings_types['history_folder'] = 'str'
+        self.settings_default['history_folder'] = './output'
+
         self.data = None
         self.settings = None
         self.aero_file_name = ''
@@ -66,4 +95,14 @@ class AerogridLoader(BaseSolver):
     def run(self):
         self.data.aero = aerogrid.Aerogrid()
         self.data.aero.generate(self.aero_data_dict, self.data.structure, self.settings, self.data.ts)
+
+        history_file_name = None
+        if self.settings['history_policy'] == 'spill':
+            folder = self.settings['history_folder'] + '/' + self.data.case_name + '/aero/'
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            history_file_name = folder + self.data.case_name + '_history.h5'
+        self.data.aero.set_history_policy(self.settings['history_policy'],
+                                          self.settings['history_length'].value,
+                                          history_file_name)
         return self.data
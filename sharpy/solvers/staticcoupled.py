@@ -51,6 +51,8 @@ class StaticCoupled(BaseSolver):
         self.aero_solver = None
 
         self.previous_force = None
+        self.force_operator = None
+        self.force_operator_geometry = None
 
     def initialise(self, data):
         self.data = data
@@ -92,15 +94,9 @@ class StaticCoupled(BaseSolver):
                 print(self.data.structure.timestep_info[self.data.ts].pos[20, :])
 
                 # map force
-                struct_forces = mapping.aero2struct_force_mapping(
-                    self.data.aero.timestep_info[self.data.ts].forces,
-                    self.data.aero.struct2aero_mapping,
-                    self.data.aero.timestep_info[self.data.ts].zeta,
-                    self.data.structure.timestep_info[self.data.ts].pos,
-                    self.data.structure.timestep_info[self.data.ts].psi,
-                    self.data.structure.node_master_elem,
-                    self.data.structure.master,
-                    algebra.quat2rot(self.data.structure.timestep_info[self.data.ts].quat).T)
+                struct_forces = self.force_operator_update().dot(
+                    self.data.aero.timestep_info[self.data.ts].buffers['forces'].reshape(-1)).reshape(
+                    (self.data.structure.num_node, 6))
 
                 if not self.settings['relaxation_factor'].value == 0.:
                     if i_iter == 0:
@@ -168,6 +164,28 @@ class StaticCoupled(BaseSolver):
         cout.cout_wrap('...Finished', 1)
         return self.data
 
+    def force_operator_update(self):
+        """
+        Returns the aero to structure force operator, which is only assembled again
+        when the grid, the beam or its orientation have changed since the last call.
+        """
+        aero_tstep = self.data.aero.timestep_info[self.data.ts]
+        struct_tstep = self.data.structure.timestep_info[self.data.ts]
+        geometry = (aero_tstep.buffers['zeta'], struct_tstep.pos, struct_tstep.psi, struct_tstep.quat)
+        if (self.force_operator is None or
+                not all(np.array_equal(new, old) for new, old in zip(geometry, self.force_operator_geometry))):
+            self.force_operator = mapping.aero2struct_force_operator(
+                self.data.aero.struct2aero_mapping,
+                aero_tstep.zeta,
+                struct_tstep.pos,
+                struct_tstep.psi,
+                self.data.structure.node_master_elem,
+                self.data.structure.master,
+                struct_tstep.cga().T,
+                cab=struct_tstep.cab())
+            self.force_operator_geometry = tuple(array.copy() for array in geometry)
+        return self.force_operator
+
     def convergence(self, i_iter, i_step):
         if i_iter == self.settings['max_iter'].value - 1:
             cout.cout_wrap('StaticCoupled did not converge!', 0)
@@ -4,7 +4,9 @@ import numpy as np
 # import sharpy.aero.models.aerogrid as aerogrid
 # import sharpy.aero.utils.mapping as mapping
 import sharpy.utils.algebra as algebra
+import sharpy.aero.utils.pyvlm as pyvlm
 import sharpy.aero.utils.uvlmlib as uvlmlib
+import sharpy.aero.utils.vortextree as vortextree
 import sharpy.utils.cout_utils as cout
 import sharpy.utils.settings as settings
 from sharpy.utils.solver_interface import solver, BaseSolver
@@ -22,6 +24,52 @@ class StaticUvlm(BaseSolver):
         self.settings_types['print_info'] = 'bool'
         self.settings_default['print_info'] = True
 
+        # 'uvlmlib' (native library) or 'python' (pyvlm)
+        self.settings_types['backend'] = 'str'
+        self.settings_default['backend'] = 'uvlmlib'
+
+        # maximum number of (target, vortex segment) pairs evaluated at once by the python backend
+        self.settings_types['aic_chunk_size'] = 'int'
+        self.settings_default['aic_chunk_size'] = pyvlm.default_chunk_size
+
+        # reuse of the factorised AIC between runs (python backend), see pyvlm.AicFactorisation
+        self.settings_types['aic_reuse'] = 'str'
+        self.settings_default['aic_reuse'] = 'none'
+
+        self.settings_types['aic_reuse_tolerance'] = 'float'
+        self.settings_default['aic_reuse_tolerance'] = 1e-4
+
+        # bound on bound AIC reused while the grid moves as a rigid body (python backend),
+        # see pyvlm.BoundAicCache
+        self.settings_types['aic_rigid_reuse'] = 'bool'
+        self.settings_default['aic_rigid_reuse'] = False
+
+        self.settings_types['aic_rigid_tolerance'] = 'float'
+        self.settings_default['aic_rigid_tolerance'] = 1e-6
+
+        # tree-code accuracy of the induced velocities of the python backend (0: direct evaluation),
+        # see pyvlm.TreeVelocity
+        self.settings_types['tree_theta'] = 'float'
+        self.settings_default['tree_theta'] = 0.0
+
+        self.settings_types['tree_leaf_size'] = 'int'
+        self.settings_default['tree_leaf_size'] = vortextree.default_leaf_size
+
+        # GMRES solution of the circulation without assembling the AIC (python backend)
+        self.settings_types['matrix_free'] = 'bool'
+        self.settings_default['matrix_free'] = False
+
+        # AIC blocks between well separated surfaces compressed to low rank (python backend),
+        # see pyvlm.block_aic
+        self.settings_types['aic_lowrank'] = 'bool'
+        self.settings_default['aic_lowrank'] = False
+
+        self.settings_types['aic_lowrank_tolerance'] = 'float'
+        self.settings_default['aic_lowrank_tolerance'] = 1e-6
+
+        self.settings_types['aic_admissibility'] = 'float'
+        self.settings_default['aic_admissibility'] = 1.0
+
         self.settings_types['horseshoe'] = 'bool'
         self.settings_default['horseshoe'] = False
 
@@ -34,6 +82,32 @@ class StaticUvlm(BaseSolver):
         self.settings_types['rollup_dt'] = 'float'
         self.settings_default['rollup_dt'] = 0.1
 
+        # growth ratio of the length of the wake panels (python backend), see pyvlm.wake_intervals
+        self.settings_types['wake_stretching'] = 'float'
+        self.settings_default['wake_stretching'] = 1.0
+
+        # distances of the wake rows to the trailing edge (python backend), uniform if empty
+        self.settings_types['wake_stations'] = 'list(float)'
+        self.settings_default['wake_stations'] = np.array([])
+
+        # wake length chosen by convergence of the total force, see adapt_wake
+        self.settings_types['adaptive_wake'] = 'bool'
+        self.settings_default['adaptive_wake'] = False
+
+        self.settings_types['adaptive_wake_initial'] = 'int'
+        self.settings_default['adaptive_wake_initial'] = 4
+
+        self.settings_types['adaptive_wake_growth'] = 'float'
+        self.settings_default['adaptive_wake_growth'] = 2.0
+
+        self.settings_types['adaptive_wake_tolerance'] = 'float'
+        self.settings_default['adaptive_wake_tolerance'] = 1e-3
+
+        # bound grid updated with the displacement transfer linearised around the first grid
+        # of every timestep, instead of regenerated, see Aerogrid.linearise_zeta
+        self.settings_types['linear_grid_update'] = 'bool'
+        self.settings_default['linear_grid_update'] = False
+
         self.settings_types['rollup_aic_refresh'] = 'int'
         self.settings_default['rollup_aic_refresh'] = 1
 
@@ -70,6 +144,11 @@ class StaticUvlm(BaseSolver):
         self.data = None
         self.settings = None
         self.velocity_generator = None
+        self.aic_factorisation = None
+        self.bound_aic_cache = None
+        self.max_m_star = 0
+        self.adapted_m_star = None
+        self.linearisation_ts = None
 
     def initialise(self, data, custom_settings=None):
         self.data = data
@@ -78,6 +157,23 @@ class StaticUvlm(BaseSolver):
         else:
             self.settings = custom_settings
         settings.to_custom_types(self.settings, self.settings_types, self.settings_default)
+        if self.settings['backend'] not in ['uvlmlib', 'python']:
+            raise NotImplementedError('StaticUvlm backend ' + self.settings['backend'] + ' is not supported')
+        if self.settings['aic_reuse'] not in ['none', 'direct', 'preconditioner']:
+            raise NotImplementedError('StaticUvlm aic_reuse ' + self.settings['aic_reuse'] + ' is not supported')
+        if self.settings['backend'] == 'uvlmlib' and (self.settings['wake_stretching'].value != 1.0 or
+                                                      len(self.settings['wake_stations'])):
+            raise NotImplementedError('Non uniform wakes are only supported by the python backend of StaticUvlm')
+        if len(self.settings['wake_stations']) and (self.settings['wake_stations'][0] <= 0.0 or
+                                                    np.any(np.diff(self.settings['wake_stations']) <= 0.0)):
+            raise ValueError('StaticUvlm wake_stations have to be positive and strictly increasing')
+        if self.settings['adaptive_wake'].value and len(self.settings['wake_stations']):
+            raise NotImplementedError('StaticUvlm adaptive_wake cannot be used with wake_stations')
+        self.aic_factorisation = pyvlm.AicFactorisation()
+        self.bound_aic_cache = pyvlm.BoundAicCache()
+        self.max_m_star = self.data.aero.aero_dimensions_star[0, 0]
+        self.adapted_m_star = None
+        self.linearisation_ts = None
 
         # update beam orientation
         # beam orientation is used as the parametrisation of the aero orientation
@@ -98,26 +194,76 @@ class StaticUvlm(BaseSolver):
         self.velocity_generator.initialise(self.settings['velocity_field_input'])
 
     def run(self):
+        if (self.settings['adaptive_wake'].value and not self.settings['horseshoe'].value and
+                self.adapted_m_star is None):
+            self.adapt_wake()
+        else:
+            self.solve()
+        return self.data
+
+    def adapt_wake(self):
+        """
+        Solves with a wake of ``adaptive_wake_initial`` rows, growing it by a factor ``adaptive_wake_growth``
+        until the total force changes less than ``adaptive_wake_tolerance`` (relative to its norm) or the
+        ``mstar`` of ``AerogridLoader`` is reached. The wake length is kept for the following runs.
+        """
+        tolerance = self.settings['adaptive_wake_tolerance'].value
+        m_star = min(self.settings['adaptive_wake_initial'].value, self.max_m_star)
+        previous_force = None
+        while True:
+            self.data.aero.resize_wake(m_star, self.data.ts)
+            self.solve()
+            force = np.sum(self.data.aero.timestep_info[self.data.ts].buffers['forces'][0:3, :], axis=1)
+            if (previous_force is not None and
+                    np.linalg.norm(force - previous_force) <= tolerance*np.linalg.norm(force)):
+                break
+            if m_star >= self.max_m_star:
+                cout.cout_wrap('The total force has not converged with the wake length, mstar = %u' % m_star, 3)
+                break
+            previous_force = force
+            m_star = min(self.max_m_star,
+                         max(m_star + 1, int(np.ceil(m_star*self.settings['adaptive_wake_growth'].value))))
+
+        self.adapted_m_star = m_star
+        cout.cout_wrap('Adaptive wake length: mstar = %u' % m_star, 1)
+
+    def solve(self):
         # generate uext
         self.velocity_generator.generate({'zeta': self.data.aero.timestep_info[self.data.ts].zeta,
                                           'override': True},
                                          self.data.aero.timestep_info[self.data.ts].u_ext)
         # grid orientation
-        uvlmlib.vlm_solver(self.data.aero.timestep_info[self.data.ts],
-                           self.settings)
-
-        return self.data
+        if self.settings['backend'] == 'python':
+            pyvlm.vlm_solver(self.data.aero.timestep_info[self.data.ts],
+                             self.settings,
+                             self.aic_factorisation,
+                             self.bound_aic_cache,
+                             symmetry=self.data.aero.symmetry)
+        else:
+            uvlmlib.vlm_solver(self.data.aero.timestep_info[self.data.ts],
+                               self.settings,
+                               image_method=self.data.aero.symmetry)
 
     def next_step(self):
         """ Updates de aerogrid based on the info of the step, and increases
         the self.ts counter """
-        self.data.aero.add_timestep()
+        # zeta and u_ext are regenerated in update_step and run
+        self.data.aero.add_timestep(fields=['zeta_star', 'gamma', 'gamma_star'])
         self.update_step()
 
     def update_step(self):
-        self.data.aero.generate_zeta(self.data.structure,
-                                     self.data.aero.aero_settings,
-                                     self.data.ts)
+        if self.settings['linear_grid_update'].value and self.linearisation_ts == self.data.ts:
+            self.data.aero.generate_zeta_linear(self.data.structure, self.data.ts)
+        else:
+            n_regenerated = self.data.aero.generate_zeta(self.data.structure,
+                                                         self.data.aero.aero_settings,
+                                                         self.data.ts)
+            n_strips = len(self.data.aero.struct2aero_mapping['i_node'])
+            if self.settings['print_info'].value and n_regenerated < n_strips:
+                cout.cout_wrap('Regenerated %u of %u aero strips' % (n_regenerated, n_strips), 2)
+            if self.settings['linear_grid_update'].value:
+                self.data.aero.linearise_zeta(self.data.structure, self.data.ts)
+                self.linearisation_ts = self.data.ts
         # for i_surf in range(self.data.aero.timestep_info[self.ts].n_surf):
         #     self.data.aero.timestep_info[self.ts].forces[i_surf].fill(0.0)
         #     self.data.aero.timestep_info[self.ts].dynamic_forces[i_surf].fill(0.0)
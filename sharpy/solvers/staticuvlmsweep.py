@@ -0,0 +1,109 @@
+import numpy as np
+import os
+
+import sharpy.utils.algebra as algebra
+import sharpy.aero.utils.pyvlm as pyvlm
+import sharpy.utils.cout_utils as cout
+from sharpy.utils.solver_interface import solver
+from sharpy.solvers.staticuvlm import StaticUvlm
+
+
+@solver
+class StaticUvlmSweep(StaticUvlm):
+    """
+    Steady aerodynamic loads of the grid of ``StaticUvlm`` for a sweep of flight conditions
+    (free stream velocity, angle of attack and sideslip), solved with ``pyvlm.vlm_sweep``: the AIC is
+    assembled and factorised once, and all the conditions are solved at once.
+
+    Every condition is equivalent to a rotation of the free stream with respect to the grid
+    generated with the ``alpha``, ``beta`` and ``roll`` settings. The wake stays aligned with the
+    free stream of that reference condition, so the conditions are not exact for large variations
+    of the flow angles. For half models (``symmetry`` in ``AerogridLoader``) the sideslip has to be zero,
+    and the image half is included in the totals. ``sweep_u_inf``, ``sweep_alpha`` and ``sweep_beta`` are either empty (the
+    reference value is used), of length one, or of the number of conditions.
+
+    The total forces and moments (about the origin of the ``G`` frame of every condition) are stored
+    in ``data.aero.polar``, with the columns
+    ``u_inf, alpha, beta, fx_G, fy_G, fz_G, mx_G, my_G, mz_G``.
+    """
+    solver_id = 'StaticUvlmSweep'
+
+    def __init__(self):
+        super().__init__()
+
+        self.settings_types['sweep_u_inf'] = 'list(float)'
+        self.settings_default['sweep_u_inf'] = np.array([])
+
+        self.settings_types['sweep_alpha'] = 'list(float)'
+        self.settings_default['sweep_alpha'] = np.array([])
+
+        self.settings_types['sweep_beta'] = 'list(float)'
+        self.settings_default['sweep_beta'] = np.array([])
+
+        self.settings_types['folder'] = 'str'
+        self.settings_default['folder'] = './output'
+
+        self.settings_types['write_polar'] = 'bool'
+        self.settings_default['write_polar'] = False
+
+        self.folder = ''
+
+    def run(self):
+        ts_info = self.data.aero.timestep_info[self.data.ts]
+        self.velocity_generator.generate({'zeta': ts_info.zeta,
+                                          'override': True},
+                                         ts_info.u_ext)
+        u_ref = ts_info.u_ext[0][:, 0, 0].copy()
+        u_inf_ref = np.linalg.norm(u_ref)
+        u_inf, alpha, beta = np.broadcast_arrays(self.sweep_values('sweep_u_inf', u_inf_ref),
+                                                 self.sweep_values('sweep_alpha', self.settings['alpha'].value),
+                                                 self.sweep_values('sweep_beta', self.settings['beta'].value))
+        if self.data.aero.symmetry and np.any(beta != 0.0):
+            raise NotImplementedError('StaticUvlmSweep does not support sideslip with symmetry in AerogridLoader')
+
+        # rotation from the G frame of every condition to the one of the grid
+        cga_ref = self.cga(self.settings['alpha'].value, self.settings['beta'].value)
+        rotations = [np.dot(cga_ref, self.cga(alpha[i_cond], beta[i_cond]).T) for i_cond in range(len(u_inf))]
+        u_cond = np.array([u_inf[i_cond]/u_inf_ref*np.dot(rotations[i_cond], u_ref) for i_cond in range(len(u_inf))])
+
+        gamma, forces = pyvlm.vlm_sweep(ts_info, self.settings, u_cond, symmetry=self.data.aero.symmetry)
+
+        zeta = ts_info.buffers['zeta']
+        polar = np.zeros((len(u_inf), 9))
+        polar[:, 0] = u_inf
+        polar[:, 1] = alpha
+        polar[:, 2] = beta
+        for i_cond in range(len(u_inf)):
+            total_force = np.sum(forces[i_cond], axis=1)
+            total_moment = np.sum(np.cross(zeta, forces[i_cond], axis=0), axis=1)
+            if self.data.aero.symmetry:
+                # the moment is a pseudovector: its image changes sign
+                total_force += np.dot(pyvlm.symmetry_reflection, total_force)
+                total_moment -= np.dot(pyvlm.symmetry_reflection, total_moment)
+            polar[i_cond, 3:6] = np.dot(rotations[i_cond].T, total_force)
+            polar[i_cond, 6:9] = np.dot(rotations[i_cond].T, total_moment)
+        self.data.aero.polar = polar
+
+        if self.settings['print_info'].value:
+            cout.cout_wrap('Solved %u flight conditions' % len(u_inf), 2)
+        if self.settings['write_polar'].value:
+            self.folder = (self.settings['folder'] + '/' +
+                           self.data.settings['SHARPy']['case'] + '/' +
+                           'forces/')
+            if not os.path.exists(self.folder):
+                os.makedirs(self.folder)
+            np.savetxt(self.folder + 'polar.csv',
+                       polar,
+                       fmt='%10e' + ', %10e'*8,
+                       delimiter=',',
+                       header='u_inf, alpha, beta, fx_G, fy_G, fz_G, mx_G, my_G, mz_G',
+                       comments='#')
+        return self.data
+
+    def sweep_values(self, name, reference):
+        if len(self.settings[name]) == 0:
+            return np.array([reference])
+        return self.settings[name]
+
+    def cga(self, alpha, beta):
+        return algebra.euler2rot(np.array([self.settings['roll'].value, alpha, beta])).T
@@ -4,7 +4,7 @@ import numpy as np
 from sharpy.structure.basestructure import BaseStructure
 import sharpy.structure.models.beamstructures as beamstructures
 import sharpy.utils.algebra as algebra
-from sharpy.utils.datastructures import StructTimeStepInfo
+from sharpy.utils.datastructures import StructTimeStepInfo, StructTimeStepHistory, TimeStepInfoPool
 
 
 class Beam(BaseStructure):
@@ -16,6 +16,8 @@ class Beam(BaseStructure):
         self.num_elem = -1
 
         self.timestep_info = []
+        self.history = None
+        self.timestep_pool = TimeStepInfoPool(StructTimeStepInfo)
         self.ini_info = None
         self.dynamic_input = []
 
@@ -102,6 +104,10 @@ class Beam(BaseStructure):
         except KeyError:
             pass
 
+        # tangent vectors of all the elements at once
+        elem_tangent, _ = algebra.tangent_vector_vec(self.ini_info.pos[self.connectivities, :],
+                                                     beamstructures.Element.ordering)
+
         # generate the Element array
         for ielem in range(self.num_elem):
             self.elements.append(
@@ -114,7 +120,8 @@ class Beam(BaseStructure):
                     self.structural_twist[self.connectivities[ielem, :]],
                     self.beam_number[ielem],
                     self.elem_stiffness[ielem],
-                    self.elem_mass[ielem]))
+                    self.elem_mass[ielem],
+                    tangent=elem_tangent[ielem, :, :]))
         # now we need to add the attributes like mass and stiffness index
         for ielem in range(self.num_elem):
             dictionary = dict()
@@ -159,21 +166,19 @@ class Beam(BaseStructure):
             self.ini_info.psi[elem.ielem, :, :] = elem.psi_ini
 
     def add_unsteady_information(self, dyn_dict, num_steps):
-        # data storage for time dependant output
-        for it in range(num_steps):
-            self.add_timestep(self.timestep_info)
-        self.timestep_info[0] = self.ini_info.copy()
+        # data storage for time dependant output: the timesteps are views of the
+        # history arrays, initialised as copies of the initial state
+        self.history = StructTimeStepHistory(self.num_node, self.num_elem, self.num_node_elem, num_steps + 1)
+        self.timestep_info = self.history.timestep_info()
+        for ts_info in self.timestep_info:
+            self.ini_info.copy(out=ts_info)
 
         # data storage for time dependant input
-        for it in range(num_steps):
-            self.dynamic_input.append(dict())
-
         try:
-            for it in range(num_steps):
-                self.dynamic_input[it]['dynamic_forces'] = dyn_dict['dynamic_forces'][it, :, :]
+            self.history.dynamic_forces[:, :, 0:num_steps] = dyn_dict['dynamic_forces'][0:num_steps, :, :].transpose((1, 2, 0))
         except KeyError:
-            for it in range(num_steps):
-                self.dynamic_input[it]['dynamic_forces'] = np.zeros((self.num_node, 6), dtype=ct.c_double, order='F')
+            pass
+        self.dynamic_input = [{'dynamic_forces': self.history.dynamic_forces[:, :, it]} for it in range(num_steps)]
 
     def generate_dof_arrays(self):
         self.vdof = np.zeros((self.num_node,), dtype=ct.c_int, order='F') - 1
@@ -236,15 +241,24 @@ class Beam(BaseStructure):
         self.generate_node_master_elem()
 
     def add_timestep(self, timestep_info):
-        timestep_info.append(StructTimeStepInfo(self.num_node,
-                                                self.num_elem,
-                                                self.num_node_elem))
-        if len(timestep_info) > 1:
-            timestep_info[-1] = timestep_info[-2].copy()
+        if len(timestep_info) == 0:
+            timestep_info.append(StructTimeStepInfo(self.num_node,
+                                                    self.num_elem,
+                                                    self.num_node_elem))
+        else:
+            timestep_info.append(timestep_info[-1].copy(
+                out=self.timestep_pool.get(*timestep_info[-1].constructor_args())))
 
         timestep_info[-1].steady_applied_forces = self.ini_info.steady_applied_forces.astype(dtype=ct.c_double,
                                                                                              order='F')
 
+    def release_timestep(self, ts_info):
+        """
+        Returns a timestep that is not referenced anymore to the pool, to be recycled
+        by ``add_timestep``.
+        """
+        self.timestep_pool.release(ts_info)
+
     def next_step(self):
         self.add_timestep(self.timestep_info)
 
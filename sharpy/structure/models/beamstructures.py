@@ -21,7 +21,8 @@ class Element(object):
                  structural_twist,
                  num_mem,
                  stiff_index,
-                 mass_index):
+                 mass_index,
+                 tangent=None):
         # store info in instance
         # global element number
         self.ielem = ielem
@@ -47,9 +48,9 @@ class Element(object):
         # placeholder for RBMass
         self.rbmass = None  # np.zeros((self.max_nodes_elem, 6, 6))
 
-        self.update(self.coordinates_def)
+        self.update(self.coordinates_def, tangent=tangent)
 
-    def update(self, coordinates_def, psi_def=None):
+    def update(self, coordinates_def, psi_def=None, tangent=None):
         self.coordinates_def = coordinates_def.copy()
 
         if psi_def is not None:
@@ -61,7 +62,7 @@ class Element(object):
 
         if psi_def is None:  # ini conditions, initial crv has to be calculated
             # we need to define the FoR z direction for every beam element
-            v1, v2, v3 = self.get_triad()
+            v1, v2, v3 = self.get_triad(tangent)
             self.psi_ini = algebra.triad2crv_vec(v1, v2, v3)
             self.psi_def = self.psi_ini.copy()
 
@@ -85,28 +86,27 @@ class Element(object):
     def generate_curve(self, n_elem_curve, defor=False):
         curve = np.zeros((n_elem_curve, 3))
         t_vec = np.linspace(0, 2, n_elem_curve)
-        for i in range(n_elem_curve):
-            t = t_vec[i]
-            for idim in range(3):
-                if defor:
-                    polyfit, _, _ = algebra.get_polyfit(self.coordinates_def, self.ordering)
-                else:
-                    polyfit, _, _ = algebra.get_polyfit(self.coordinates_ini, self.ordering)
-                polyf = np.poly1d(polyfit[idim])
-                curve[i, idim] = (polyf(t))
+        if defor:
+            polyfit, _, _ = algebra.get_polyfit(self.coordinates_def, self.ordering)
+        else:
+            polyfit, _, _ = algebra.get_polyfit(self.coordinates_ini, self.ordering)
+        for idim in range(3):
+            curve[:, idim] = np.polyval(polyfit[idim], t_vec)
         return curve
 
-    def get_triad(self):
+    def get_triad(self, tangent=None):
         """
         Generates two unit vectors in body FoR that define the local FoR for
         a beam element. These vectors are calculated using `frame_of_reference_delta`
+        :param tangent: precomputed tangent vectors of the element nodes
+            (see ``algebra.tangent_vector_vec``). Calculated here if ``None``
         :return:
         """
-        # now, calculate tangent vector (and coefficients of the polynomial
-        # fit just in case)
-        tangent, polyfit = algebra.tangent_vector(
-            self.coordinates_def,
-            Element.ordering)
+        # now, calculate tangent vector
+        if tangent is None:
+            tangent, _ = algebra.tangent_vector(
+                self.coordinates_def,
+                Element.ordering)
         normal = np.zeros_like(tangent)
         binormal = np.zeros_like(tangent)
 
@@ -3,7 +3,6 @@ import numpy as np
 import scipy as sc
 import scipy.integrate
 
-import sharpy.utils.algebra as algebra
 import sharpy.utils.ctypes_utils as ct_utils
 from sharpy.utils.sharpydir import SharpyDir
 from sharpy.utils.datastructures import StructTimeStepInfo
@@ -304,10 +303,18 @@ def xbeam_solv_couplednlndyn(beam, settings):
     for i in range(n_tsteps):
         time[i] = i*dt
 
-    # deformation history matrices
-    for_vel = np.zeros((n_tsteps + 1, 6), order='F')
-    for_acc = np.zeros((n_tsteps + 1, 6), order='F')
-    quat_history = np.zeros((n_tsteps, 4), order='F')
+    # deformation history matrices, copied back to the history of the beam (its timesteps are views of it)
+    history = beam.history
+    if history is None or not history.n_steps == n_tsteps + 1:
+        raise ValueError('The structural history has not been allocated for %u steps '
+                         '(see Beam.add_unsteady_information)' % n_tsteps)
+    for_vel = history.solver_history('for_vel', n_tsteps + 1)
+    for_acc = history.solver_history('for_acc', n_tsteps + 1)
+    pos_def_history = history.solver_history('pos', n_tsteps)
+    psi_def_history = history.solver_history('psi', n_tsteps)
+    pos_dot_def_history = history.solver_history('pos_dot', n_tsteps)
+    psi_dot_def_history = history.solver_history('psi_dot', n_tsteps)
+    quat_history = history.solver_history('quat', n_tsteps)
 
     dt = ct.c_double(dt)
     n_tsteps = ct.c_int(n_tsteps)
@@ -328,15 +335,6 @@ def xbeam_solv_couplednlndyn(beam, settings):
     xbopts.gravity_dir_y = ct.c_double(settings['gravity_dir'][1])
     xbopts.gravity_dir_z = ct.c_double(settings['gravity_dir'][2])
 
-    pos_def_history = np.zeros((n_tsteps.value, beam.num_node, 3), order='F', dtype=ct.c_double)
-    pos_dot_def_history = np.zeros((n_tsteps.value, beam.num_node, 3), order='F', dtype=ct.c_double)
-    psi_def_history = np.zeros((n_tsteps.value, beam.num_elem, 3, 3), order='F', dtype=ct.c_double)
-    psi_dot_def_history = np.zeros((n_tsteps.value, beam.num_elem, 3, 3), order='F', dtype=ct.c_double)
-
-    dynamic_force = np.zeros((n_nodes.value, 6, n_tsteps.value), dtype=ct.c_double, order='F')
-    for it in range(n_tsteps.value):
-        dynamic_force[:, :, it] = beam.dynamic_input[it]['dynamic_forces']
-
     # status flag
     success = ct.c_bool(True)
 
@@ -368,8 +366,8 @@ def xbeam_solv_couplednlndyn(beam, settings):
                                ct.byref(xbopts),
                                beam.ini_info.pos.ctypes.data_as(doubleP),
                                beam.ini_info.psi.ctypes.data_as(doubleP),
-                               beam.timestep_info[0].steady_applied_forces.ctypes.data_as(doubleP),
-                               dynamic_force.ctypes.data_as(doubleP),
+                               beam.ini_info.steady_applied_forces.ctypes.data_as(doubleP),
+                               history.dynamic_forces.ctypes.data_as(doubleP),
                                for_vel.ctypes.data_as(doubleP),
                                for_acc.ctypes.data_as(doubleP),
                                pos_def_history.ctypes.data_as(doubleP),
@@ -382,26 +380,18 @@ def xbeam_solv_couplednlndyn(beam, settings):
     if not success:
         raise Exception('couplednlndyn did not converge')
 
-    for_pos = np.zeros_like(for_vel)
-    for_pos[:, 0] = sc.integrate.cumtrapz(for_vel[:, 0], dx=dt.value, initial=0)
-    for_pos[:, 1] = sc.integrate.cumtrapz(for_vel[:, 1], dx=dt.value, initial=0)
-    for_pos[:, 2] = sc.integrate.cumtrapz(for_vel[:, 2], dx=dt.value, initial=0)
-
-    glob_pos_def = np.zeros_like(pos_def_history)
-    for it in range(n_tsteps.value):
-        rot = algebra.quat2rot(quat_history[it, :]).transpose()
-        for inode in range(beam.num_node):
-            glob_pos_def[it, inode, :] = np.dot(rot.T, pos_def_history[it, inode, :])
-
-    for i in range(n_tsteps.value - 1):
-        beam.timestep_info[i + 1].pos[:] = pos_def_history[i+1, :]
-        beam.timestep_info[i + 1].psi[:] = psi_def_history[i+1, :]
-        beam.timestep_info[i + 1].pos_dot[:] = pos_dot_def_history[i+1, :]
-        beam.timestep_info[i + 1].psi_dot[:] = psi_dot_def_history[i+1, :]
-
-        beam.timestep_info[i + 1].quat[:] = quat_history[i+1, :]
-        beam.timestep_info[i + 1].for_pos[:] = for_pos[i+1, :]
-        beam.timestep_info[i + 1].for_vel[:] = for_vel[i+1, :]
+    history.set_solver_history('for_vel', for_vel)
+    history.set_solver_history('for_acc', for_acc)
+    history.set_solver_history('pos', pos_def_history)
+    history.set_solver_history('psi', psi_def_history)
+    history.set_solver_history('pos_dot', pos_dot_def_history)
+    history.set_solver_history('psi_dot', psi_dot_def_history)
+    history.set_solver_history('quat', quat_history)
+    for i_dim in range(3):
+        history.for_pos[i_dim, :] = sc.integrate.cumtrapz(history.for_vel[i_dim, :], dx=dt.value, initial=0)
+
+    # the first step is the initial state
+    beam.ini_info.copy(out=beam.timestep_info[0])
 
 
 f_cbeam3_solv_update_static = xbeamlib.cbeam3_solv_update_static_python
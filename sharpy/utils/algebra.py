@@ -16,8 +16,28 @@ def tangent_vector(in_coord, ordering=None):
         Dimensions are treated independent from each other, interpolating polynomials are computed
         individually.
 
+        This is a single element wrapper around ``tangent_vector_vec``.
+
     """
-    n_nodes, ndim = in_coord.shape
+    tangent, polyfit = tangent_vector_vec(in_coord[None, :, :], ordering)
+    return tangent[0, :, :], [polyfit[0, idim, :] for idim in range(polyfit.shape[1])]
+
+
+def tangent_vector_vec(in_coord, ordering=None):
+    """ Tangent vector calculation for a batch of 2 or 3 noded elements.
+
+    Closed form equivalent of fitting a ``(n_nodes - 1)`` degree polynomial to every
+    dimension of every element and differentiating it at the (ordered) nodes.
+
+    Args:
+        in_coord (np.ndarray): array of coordinates of the nodes. Dimensions = ``[n_elem, n_nodes, ndim]``
+        ordering (list): ordering of the nodes along the element (``[0, 2, 1]`` for 3-noded elements)
+
+    Returns:
+        tuple: ``tangent``, ``[n_elem, n_nodes, ndim]`` unit tangent vectors, and ``polyfit``,
+            ``[n_elem, ndim, n_nodes]`` polynomial coefficients (highest degree first, as in ``np.polyfit``)
+    """
+    n_elem, n_nodes, ndim = in_coord.shape
 
     if ordering is None:
         if n_nodes == 2:
@@ -27,65 +47,75 @@ def tangent_vector(in_coord, ordering=None):
         else:
             raise NotImplementedError('Elements with more than 3 nodes are not supported')
 
-    polyfit_vec, polyfit_der_vec, coord = get_polyfit(in_coord, ordering)
+    polyfit, coord = get_polyfit_vec(in_coord, ordering)
 
     # tangent vector calculation
     # \vec{t} = \frac{fx'i + fy'j + fz'k}/mod(...)
-    tangent = np.zeros_like(coord)
-    for inode in range(n_nodes):
-        vector = []
-        for idim in range(ndim):
-            vector.append((polyfit_der_vec[idim])(inode))
-        # vector = np.array([polyfit_der_vec[0](inode),
-        # DEBUG
-        vector = np.array(vector)
-        if (np.linalg.norm(vector)) == 0.0:
-            print(vector)
-        vector /= np.linalg.norm(vector)
-        tangent[inode, :] = vector
+    # derivatives evaluated at the node parameters t = 0, 1, (2)
+    if n_nodes == 2:
+        tangent = np.repeat(polyfit[:, None, :, 0], n_nodes, axis=1)
+    else:
+        t = np.arange(n_nodes, dtype=float)
+        tangent = (2.0*polyfit[:, None, :, 0]*t[None, :, None] +
+                   polyfit[:, None, :, 1])
+    tangent /= np.linalg.norm(tangent, axis=2)[:, :, None]
 
     # check orientation of tangent vector
+    # the last node uses the previous vector
     fake_tangent = np.zeros_like(tangent)
-    for inode in range(n_nodes):
-        if inode == n_nodes - 1:
-            # use previous vector
-            fake_tangent[inode, :] = fake_tangent[inode - 1, :]
-            continue
-        fake_tangent[inode, :] = coord[inode+1, :] - coord[inode, :]
+    fake_tangent[:, :-1, :] = coord[:, 1:, :] - coord[:, :-1, :]
+    fake_tangent[:, -1, :] = fake_tangent[:, -2, :]
+
+    inverted_tangent = np.any(np.sum(tangent*fake_tangent, axis=2) < 0, axis=1)
+    tangent[inverted_tangent, :, :] *= -1
 
-    inverted_tangent = False
-    for inode in range(n_nodes):
-        if np.dot(tangent[inode, :], fake_tangent[inode, :]) < 0:
-            inverted_tangent = True
-            break
+    return tangent, polyfit
 
-    if inverted_tangent:
-        tangent *= -1
 
-    return tangent, polyfit_vec
+def get_polyfit_vec(in_coord, ordering):
+    """ Closed form polynomial fit of a batch of 2 or 3 noded elements.
+
+    The polynomial is parametrised with the node indices (``[0, 1, 2]`` for a 3-node element) after
+    applying ``ordering``.
+
+    Args:
+        in_coord (np.ndarray): array of coordinates of the nodes. Dimensions = ``[n_elem, n_nodes, ndim]``
+        ordering (list): ordering of the nodes along the element
+
+    Returns:
+        tuple: ``polyfit``, ``[n_elem, ndim, n_nodes]`` coefficients (highest degree first), and
+            ``coord``, the reordered coordinates
+    """
+    coord = in_coord[:, ordering, :]
+    n_elem, n_nodes, ndim = coord.shape
+
+    polyfit = np.zeros((n_elem, ndim, n_nodes))
+    if n_nodes == 2:
+        polyfit[:, :, 0] = coord[:, 1, :] - coord[:, 0, :]
+        polyfit[:, :, 1] = coord[:, 0, :]
+    elif n_nodes == 3:
+        polyfit[:, :, 0] = 0.5*(coord[:, 0, :] - 2.0*coord[:, 1, :] + coord[:, 2, :])
+        polyfit[:, :, 1] = 0.5*(-3.0*coord[:, 0, :] + 4.0*coord[:, 1, :] - coord[:, 2, :])
+        polyfit[:, :, 2] = coord[:, 0, :]
+    else:
+        raise NotImplementedError('Elements with more than 3 nodes are not supported')
+
+    return polyfit, coord
 
 
 def get_polyfit(in_coord, ordering):
-    coord = in_coord.copy()
-    n_nodes, ndim = coord.shape
-    for index in range(n_nodes):
-        order = ordering[index]
-        coord[index, :] = in_coord[order, :]
-
-    polynomial_degree = n_nodes - 1
-    # first, the polynomial fit.
-    # we are going to differentiate wrt the indices ([0, 1, 2] for a 3-node)
-    polyfit_vec = []  # we are going to store here the coefficients of the polyfit
-    for idim in range(ndim):
-        polyfit_vec.append(np.polyfit(range(n_nodes), coord[:, idim],
-                                      polynomial_degree))
+    polyfit, coord = get_polyfit_vec(in_coord[None, :, :], ordering)
+    n_nodes, ndim = in_coord.shape
+
+    # we are going to store here the coefficients of the polyfit
+    polyfit_vec = [polyfit[0, idim, :] for idim in range(ndim)]
 
     # differentiation
     polyfit_der_vec = []
     for idim in range(ndim):
         polyfit_der_vec.append(np.poly1d(np.polyder(polyfit_vec[idim])))
 
-    return polyfit_vec, polyfit_der_vec, coord
+    return polyfit_vec, polyfit_der_vec, coord[0, :, :]
 
 
 def unit_vector(vector):
@@ -293,27 +323,224 @@ def crv2tan(psi):
         k1 = np.sin(norm_psi*0.5)/(norm_psi*0.5)
         k2 = (1.0 - np.sin(norm_psi)/norm_psi)/(norm_psi*norm_psi)
 
-    T = np.eye(3) - (0.5*k1*k1)*psi_skew + k2*psi_skew*psi_skew
+    T = np.eye(3) - (0.5*k1*k1)*psi_skew + k2*np.dot(psi_skew, psi_skew)
+    return T
+
+
+def crv2tan_vec(psi):
+    """ Vectorised version of ``crv2tan``.
+
+    The tangent operator relates a variation of the CRV to the rotation it adds in the local frame:
+    ``crv2rot(psi + delta) ~= crv2rot(psi).dot(I + skew(crv2tan(psi).dot(delta)))``.
+
+    Args:
+        psi (np.ndarray): ``[n, 3]`` array of CRVs
+
+    Returns:
+        np.ndarray: ``[n, 3, 3]`` tangent operators
+    """
+    psi = np.asarray(psi, dtype=float)
+    norm_psi = np.linalg.norm(psi, axis=1)
+    psi_skew = rot_skew_vec(psi)
+
+    small = norm_psi < 1e-5
+    safe_norm = np.where(small, 1.0, norm_psi)
+    k1 = np.where(small, 1.0, np.sin(safe_norm*0.5)/(safe_norm*0.5))
+    k2 = np.where(small, 1.0/6.0, (1.0 - np.sin(safe_norm)/safe_norm)/(safe_norm*safe_norm))
+
+    T = np.zeros((psi.shape[0], 3, 3))
+    T[:, :, :] = np.eye(3)
+    T -= (0.5*k1*k1)[:, None, None]*psi_skew
+    T += k2[:, None, None]*np.matmul(psi_skew, psi_skew)
     return T
 
 
 def triad2crv_vec(v1, v2, v3):
-    n_nodes, _ = v1.shape
-    crv_vec = np.zeros((n_nodes, 3))
-    for inode in range(n_nodes):
-        crv_vec[inode, :] = triad2crv(v1[inode, :], v2[inode, :], v3[inode, :])
+    """ Vectorised version of ``triad2crv``.
 
-    return crv_vec
+    Args:
+        v1 (np.ndarray): ``[n_nodes, 3]`` stack of ``xb`` vectors
+        v2 (np.ndarray): ``[n_nodes, 3]`` stack of ``yb`` vectors
+        v3 (np.ndarray): ``[n_nodes, 3]`` stack of ``zb`` vectors
+
+    Returns:
+        np.ndarray: ``[n_nodes, 3]`` CRV of every triad
+    """
+    return rot2crv_vec(np.stack((v1, v2, v3), axis=1))
 
 
 def crv2triad_vec(crv_vec):
-    n_nodes, _ = crv_vec.shape
-    v1 = np.zeros((n_nodes, 3))
-    v2 = np.zeros((n_nodes, 3))
-    v3 = np.zeros((n_nodes, 3))
-    for inode in range(n_nodes):
-        v1[inode, :], v2[inode, :], v3[inode, :] = crv2triad(crv_vec[inode, :])
-    return v1, v2, v3
+    """ Vectorised version of ``crv2triad``.
+
+    Args:
+        crv_vec (np.ndarray): ``[n_nodes, 3]`` stack of CRVs
+
+    Returns:
+        tuple: ``v1, v2, v3``, the ``[n_nodes, 3]`` stacks of triad vectors
+    """
+    rot = crv2rot_vec(crv_vec)
+    return rot[:, :, 0].copy(), rot[:, :, 1].copy(), rot[:, :, 2].copy()
+
+
+def rot_skew_vec(vec):
+    """ Vectorised version of ``rot_skew``: ``[n, 3]`` vectors to ``[n, 3, 3]`` skew matrices. """
+    n = vec.shape[0]
+    matrix = np.zeros((n, 3, 3))
+    matrix[:, 0, 1] = -vec[:, 2]
+    matrix[:, 0, 2] = vec[:, 1]
+    matrix[:, 1, 0] = vec[:, 2]
+    matrix[:, 1, 2] = -vec[:, 0]
+    matrix[:, 2, 0] = -vec[:, 1]
+    matrix[:, 2, 1] = vec[:, 0]
+    return matrix
+
+
+def crv2rot_vec(psi):
+    """ Vectorised version of ``crv2rot``.
+
+    Args:
+        psi (np.ndarray): ``[..., 3]`` array of CRVs. Any number of leading dimensions is accepted,
+            so the full ``psi[num_elem, num_node_elem, 3]`` array of a beam can be passed directly.
+
+    Returns:
+        np.ndarray: ``[..., 3, 3]`` rotation matrices
+    """
+    psi = np.asarray(psi, dtype=float)
+    in_shape = psi.shape[:-1]
+    psi = psi.reshape((-1, 3))
+
+    norm_psi = np.linalg.norm(psi, axis=1)
+    small = norm_psi < 1e-15
+    # the small rotation branch uses psi itself, the general branch the unit vector
+    safe_norm = np.where(small, 1.0, norm_psi)
+    skew_vec = rot_skew_vec(np.where(small[:, None], psi, psi/safe_norm[:, None]))
+    skew_sq = np.matmul(skew_vec, skew_vec)
+
+    coeff_1 = np.where(small, 1.0, np.sin(norm_psi))
+    coeff_2 = np.where(small, 0.5, 1.0 - np.cos(norm_psi))
+    rot_matrix = (np.eye(3) +
+                  coeff_1[:, None, None]*skew_vec +
+                  coeff_2[:, None, None]*skew_sq)
+    return rot_matrix.reshape(in_shape + (3, 3))
+
+
+def quat2rot_vec(quat):
+    """ Vectorised version of ``quat2rot``.
+
+    Args:
+        quat (np.ndarray): ``[n, 4]`` stack of quaternions
+
+    Returns:
+        np.ndarray: ``[n, 3, 3]`` stack of rotation matrices (``Cag`` for every quaternion)
+    """
+    q = np.asarray(quat, dtype=float)
+    q = q/np.linalg.norm(q, axis=1)[:, None]
+    q0, q1, q2, q3 = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+
+    rot_mat = np.zeros((q.shape[0], 3, 3))
+    rot_mat[:, 0, 0] = q0**2 + q1**2 - q2**2 - q3**2
+    rot_mat[:, 1, 1] = q0**2 - q1**2 + q2**2 - q3**2
+    rot_mat[:, 2, 2] = q0**2 - q1**2 - q2**2 + q3**2
+
+    rot_mat[:, 0, 1] = 2.*(q1*q2 + q0*q3)
+    rot_mat[:, 1, 0] = 2.*(q1*q2 - q0*q3)
+
+    rot_mat[:, 0, 2] = 2.*(q1*q3 - q0*q2)
+    rot_mat[:, 2, 0] = 2.*(q1*q3 + q0*q2)
+
+    rot_mat[:, 1, 2] = 2.*(q2*q3 + q0*q1)
+    rot_mat[:, 2, 1] = 2.*(q2*q3 - q0*q1)
+    return rot_mat
+
+
+def mat2quat_vec(mat):
+    """ Vectorised version of ``mat2quat``.
+
+    Args:
+        mat (np.ndarray): ``[n, 3, 3]`` stack of rotation matrices
+
+    Returns:
+        np.ndarray: ``[n, 4]`` stack of quaternions
+    """
+    matT = np.swapaxes(np.asarray(mat, dtype=float), 1, 2)
+    n = matT.shape[0]
+
+    s = np.zeros((n, 4, 4))
+    s[:, 0, 0] = 1.0 + np.trace(matT, axis1=1, axis2=2)
+    s[:, 0, 1] = matT[:, 2, 1] - matT[:, 1, 2]
+    s[:, 0, 2] = matT[:, 0, 2] - matT[:, 2, 0]
+    s[:, 0, 3] = matT[:, 1, 0] - matT[:, 0, 1]
+
+    s[:, 1, 0] = matT[:, 2, 1] - matT[:, 1, 2]
+    s[:, 1, 1] = 1.0 + matT[:, 0, 0] - matT[:, 1, 1] - matT[:, 2, 2]
+    s[:, 1, 2] = matT[:, 0, 1] + matT[:, 1, 0]
+    s[:, 1, 3] = matT[:, 0, 2] + matT[:, 2, 0]
+
+    s[:, 2, 0] = matT[:, 0, 2] - matT[:, 2, 0]
+    s[:, 2, 1] = matT[:, 1, 0] + matT[:, 0, 1]
+    s[:, 2, 2] = 1.0 - matT[:, 0, 0] + matT[:, 1, 1] - matT[:, 2, 2]
+    s[:, 2, 3] = matT[:, 1, 2] + matT[:, 2, 1]
+
+    s[:, 3, 0] = matT[:, 1, 0] - matT[:, 0, 1]
+    s[:, 3, 1] = matT[:, 0, 2] + matT[:, 2, 0]
+    s[:, 3, 2] = matT[:, 1, 2] + matT[:, 2, 1]
+    s[:, 3, 3] = 1.0 - matT[:, 0, 0] - matT[:, 1, 1] + matT[:, 2, 2]
+
+    diag = np.diagonal(s, axis1=1, axis2=2)
+    ismax = np.argmax(diag, axis=1)
+    rows = np.arange(n)
+    q_max = 0.5*np.sqrt(diag[rows, ismax])
+
+    # compute quaternion angles
+    quat = 0.25*s[rows, ismax, :]/q_max[:, None]
+    quat[rows, ismax] = q_max
+    return quat
+
+
+def quat2crv_vec(quat):
+    """ Vectorised version of ``quat2crv``: ``[n, 4]`` quaternions to ``[n, 3]`` CRVs. """
+    crv_norm = 2.0*np.arccos(np.clip(quat[:, 0], -1.0, 1.0))
+    small = np.abs(crv_norm) < 1e-15
+    factor = np.zeros_like(crv_norm)
+    factor[~small] = crv_norm[~small]/np.sin(crv_norm[~small]*0.5)
+    return factor[:, None]*quat[:, 1:4]
+
+
+def crv_bounds_vec(crv_ini):
+    """ Vectorised version of ``crv_bounds``: forces the norm of every ``[n, 3]`` CRV to be in ``[-pi, pi]``. """
+    norm_ini = np.linalg.norm(crv_ini, axis=1)
+    norm = norm_ini - 2.0*np.pi*np.trunc(norm_ini/(2*np.pi))
+    norm = np.where(norm > np.pi, norm - 2.0*np.pi, norm)
+    norm = np.where(norm < -np.pi, norm + 2.0*np.pi, norm)
+
+    zero = norm == 0.0
+    factor = np.zeros_like(norm)
+    factor[~zero] = norm[~zero]/norm_ini[~zero]
+    return crv_ini*factor[:, None]
+
+
+def rot2crv_vec(rot):
+    """ Vectorised version of ``rot2crv``.
+
+    Args:
+        rot (np.ndarray): ``[n, 3, 3]`` stack of rotation matrices
+
+    Returns:
+        np.ndarray: ``[n, 3]`` CRVs
+    """
+    rot = np.asarray(rot, dtype=float)
+    if np.any(np.linalg.norm(rot, axis=(1, 2)) < 1e-6):
+        raise AttributeError('Element Vector V is not orthogonal to reference line (51105)')
+
+    crv = quat2crv_vec(mat2quat_vec(rot))
+
+    null = np.linalg.norm(crv, axis=1) < 1.0e-15
+    if np.any(null):
+        crv[null, 0] = rot[null, 1, 2]
+        crv[null, 1] = rot[null, 2, 0]
+        crv[null, 2] = rot[null, 0, 1]
+
+    return crv_bounds_vec(crv)
 
 
 def quat2rot(q1):
@@ -390,6 +617,40 @@ def rotation3d_z(angle):
     return mat
 
 
+def rotation3d_x_vec(angle):
+    """ Vectorised version of ``rotation3d_x``: ``[n]`` angles to ``[n, 3, 3]`` matrices. """
+    c = np.cos(angle)
+    s = np.sin(angle)
+    mat = np.zeros((len(angle), 3, 3))
+    mat[:, 0, 0] = 1.0
+    mat[:, 1, 1] = c
+    mat[:, 1, 2] = -s
+    mat[:, 2, 1] = s
+    mat[:, 2, 2] = c
+    return mat
+
+
+def rotation3d_z_vec(angle):
+    """ Vectorised version of ``rotation3d_z``: ``[n]`` angles to ``[n, 3, 3]`` matrices. """
+    c = np.cos(angle)
+    s = np.sin(angle)
+    mat = np.zeros((len(angle), 3, 3))
+    mat[:, 0, 0] = c
+    mat[:, 0, 1] = -s
+    mat[:, 1, 0] = s
+    mat[:, 1, 1] = c
+    mat[:, 2, 2] = 1.0
+    return mat
+
+
+def angle_between_vectors_sign_vec(vec_a, vec_b, plane_normal=np.array([0, 0, 1])):
+    """ Vectorised version of ``angle_between_vectors_sign`` for ``[n, 3]`` arrays of vectors
+    (``vec_a`` can also be a single vector). """
+    cross = np.cross(vec_a, vec_b)
+    angle = np.arctan2(np.linalg.norm(cross, axis=-1), np.sum(vec_a*vec_b, axis=-1))
+    return np.where(np.dot(cross, plane_normal) < 0, -angle, angle)
+
+
 def rotate_crv(crv_in, axis, angle):
     crv = np.zeros_like(crv_in)
     C = crv2rot(crv_in).T
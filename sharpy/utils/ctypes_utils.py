@@ -2,7 +2,52 @@ import ctypes as ct
 import platform
 
 
+class MissingFunction(object):
+    """
+    Placeholder for a function of a library that could not be loaded.
+
+    Its attributes (``restype``, ``argtypes``...) can be set as in a ``ctypes`` function,
+    so that the wrappers can be declared at import time, but calling it raises an ``OSError``.
+    """
+    def __init__(self, lib_path, name, error):
+        self.lib_path = lib_path
+        self.name = name
+        self.error = error
+
+    def __call__(self, *args, **kwargs):
+        raise OSError('Function ' + self.name + ' cannot be called: the library ' + self.lib_path +
+                      ' could not be loaded (' + str(self.error) + ')')
+
+
+class MissingLibrary(object):
+    """
+    Placeholder for a ``ctypes`` library that could not be loaded. Every function
+    looked up in it is a ``MissingFunction``.
+    """
+    def __init__(self, lib_path, error):
+        self.lib_path = lib_path
+        self.error = error
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        function = MissingFunction(self.lib_path, name, self.error)
+        setattr(self, name, function)
+        return function
+
+
+def is_loaded(library):
+    return not isinstance(library, MissingLibrary)
+
+
 def import_ctypes_lib(route, libname):
+    """
+    Loads the shared library ``route + libname`` (with the platform extension).
+
+    If it cannot be loaded, a ``MissingLibrary`` is returned instead, so that the modules
+    wrapping it can still be imported (and the solvers not depending on it used). The error
+    is raised when one of its functions is called.
+    """
     lib_path = route + libname
     if platform.system() == 'Darwin':
         ext = '.dylib'
@@ -14,9 +59,6 @@ def import_ctypes_lib(route, libname):
     lib_path += ext
     try:
         library = ct.CDLL(lib_path, mode=ct.RTLD_GLOBAL)
-    except:
-        import traceback
-        import sys
-        traceback.print_exc(file=sys.stderr)
-        sys.exit(1)
+    except OSError as error:
+        library = MissingLibrary(lib_path, error)
     return library
@@ -1,289 +1,330 @@
 import ctypes as ct
+import h5py as h5
 import numpy as np
-import copy
 
 import sharpy.utils.algebra as algebra
 
 
 class AeroTimeStepInfo(object):
+    """
+    Aerodynamic grid and solution storage for one timestep.
+
+    Every field (``zeta``, ``gamma``, ``forces``...) is backed by a single contiguous
+    buffer for all the surfaces, stored in ``self.buffers[name]``, with shape
+    ``[n_components, n_total]`` (or ``[n_total]`` for ``gamma`` and ``gamma_star``).
+    ``n_total`` is the number of grid points (or panels) of all the surfaces together.
+    The usual per-surface arrays (``self.zeta[i_surf]`` with shape ``[3, M + 1, N + 1]``, ...)
+    are views of these buffers, so the indexing is the same as with independent
+    arrays and the buffers give flat, global views for free (for example,
+    ``self.buffers['gamma']`` is the vector of all the bound circulations).
+
+    The first element of ``self.offsets[grid]`` of surface ``i_surf`` is ``self.offsets[grid][i_surf]``,
+    ``grid`` being one of the keys of ``AeroTimeStepInfo.grids``.
+    """
+    # per-surface shape of every grid, as a function of the surface dimensions
+    grids = {'bound_vertices': lambda m, n: (m + 1, n + 1),
+             'bound_panels': lambda m, n: (m, n),
+             'wake_vertices': lambda m, n: (m + 1, n + 1),
+             'wake_panels': lambda m, n: (m, n)}
+    # field name: (number of components or None for scalar fields, grid)
+    fields = {'zeta': (3, 'bound_vertices'),
+              'zeta_dot': (3, 'bound_vertices'),
+              'normals': (3, 'bound_panels'),
+              'forces': (6, 'bound_vertices'),
+              'dynamic_forces': (6, 'bound_vertices'),
+              'zeta_star': (3, 'wake_vertices'),
+              'zeta_star_dot': (3, 'wake_vertices'),
+              'u_ext': (3, 'bound_vertices'),
+              'u_ext_star': (3, 'wake_vertices'),
+              'gamma': (None, 'bound_panels'),
+              'gamma_star': (None, 'wake_panels')}
+    # total forces per surface, [n_surf, 6] arrays
+    total_forces_names = ['inertial_total_forces', 'body_total_forces',
+                          'inertial_steady_forces', 'body_steady_forces',
+                          'inertial_unsteady_forces', 'body_unsteady_forces']
+
     def __init__(self, dimensions, dimensions_star):
         self.ct_dimensions = None
         self.ct_dimensions_star = None
+        self.ct_pointers_generated = False
 
-        self.dimensions = dimensions
-        self.dimensions_star = dimensions_star
+        self.dimensions = dimensions.copy()
+        self.dimensions_star = dimensions_star.copy()
         self.n_surf = dimensions.shape[0]
-        # generate placeholder for aero grid zeta coordinates
-        self.zeta = []
-        for i_surf in range(self.n_surf):
-            self.zeta.append(np.zeros((3,
-                                       dimensions[i_surf, 0] + 1,
-                                       dimensions[i_surf, 1] + 1),
-                                      dtype=ct.c_double))
-        self.zeta_dot = []
-        for i_surf in range(self.n_surf):
-            self.zeta_dot.append(np.zeros((3,
-                                           dimensions[i_surf, 0] + 1,
-                                           dimensions[i_surf, 1] + 1),
-                                          dtype=ct.c_double))
-
-        # panel normals
-        self.normals = []
-        for i_surf in range(self.n_surf):
-            self.normals.append(np.zeros((3,
-                                          dimensions[i_surf, 0],
-                                          dimensions[i_surf, 1]),
-                                         dtype=ct.c_double))
-
-        # panel forces
-        self.forces = []
-        for i_surf in range(self.n_surf):
-            self.forces.append(np.zeros((6,
-                                         dimensions[i_surf, 0] + 1,
-                                         dimensions[i_surf, 1] + 1),
-                                        dtype=ct.c_double))
-        # panel forces
-        self.dynamic_forces = []
-        for i_surf in range(self.n_surf):
-            self.dynamic_forces.append(np.zeros((6,
-                                                 dimensions[i_surf, 0] + 1,
-                                                 dimensions[i_surf, 1] + 1),
-                                                dtype=ct.c_double))
-
-        # generate placeholder for aero grid zeta_star coordinates
-        self.zeta_star = []
-        for i_surf in range(self.n_surf):
-            self.zeta_star.append(np.zeros((3,
-                                            dimensions_star[i_surf, 0] + 1,
-                                            dimensions_star[i_surf, 1] + 1),
-                                           dtype=ct.c_double))
-
-        self.zeta_star_dot = []
-        for i_surf in range(self.n_surf):
-            self.zeta_star_dot.append(np.zeros((3,
-                                                dimensions_star[i_surf, 0] + 1,
-                                                dimensions_star[i_surf, 1] + 1),
-                                               dtype=ct.c_double))
-        # placeholder for external velocity
-        self.u_ext = []
-        for i_surf in range(self.n_surf):
-            self.u_ext.append(np.zeros((3,
-                                        dimensions[i_surf, 0] + 1,
-                                        dimensions[i_surf, 1] + 1),
-                                       dtype=ct.c_double))
-
-        self.u_ext_star = []
-        for i_surf in range(self.n_surf):
-            self.u_ext_star.append(np.zeros((3,
-                                             dimensions_star[i_surf, 0] + 1,
-                                             dimensions_star[i_surf, 1] + 1),
-                                            dtype=ct.c_double))
-
-        # allocate gamma and gamma star matrices
-        self.gamma = []
-        for i_surf in range(self.n_surf):
-            self.gamma.append(np.zeros((dimensions[i_surf, 0],
-                                        dimensions[i_surf, 1]),
-                                       dtype=ct.c_double))
-
-        self.gamma_star = []
-        for i_surf in range(self.n_surf):
-            self.gamma_star.append(np.zeros((dimensions_star[i_surf, 0],
-                                             dimensions_star[i_surf, 1]),
-                                            dtype=ct.c_double))
+
+        self.offsets = dict()
+        self.buffers = dict()
+        self.allocate(list(self.fields.keys()))
 
         # total forces
-        self.inertial_total_forces = np.zeros((self.n_surf, 6))
-        self.body_total_forces = np.zeros((self.n_surf, 6))
-        self.inertial_steady_forces = np.zeros((self.n_surf, 6))
-        self.body_steady_forces = np.zeros((self.n_surf, 6))
-        self.inertial_unsteady_forces = np.zeros((self.n_surf, 6))
-        self.body_unsteady_forces = np.zeros((self.n_surf, 6))
+        for name in self.total_forces_names:
+            setattr(self, name, np.zeros((self.n_surf, 6)))
+
+    def constructor_args(self):
+        return self.dimensions, self.dimensions_star
+
+    def grid_shapes(self, grid):
+        if grid.startswith('bound'):
+            dimensions = self.dimensions
+        else:
+            dimensions = self.dimensions_star
+        return [self.grids[grid](dimensions[i_surf, 0], dimensions[i_surf, 1]) for i_surf in range(self.n_surf)]
+
+    def allocate(self, names):
+        """
+        Allocates the buffers of the fields in ``names`` (zero filled) and
+        generates the per-surface views.
+
+        The ctypes pointer tables are invalidated, as they point to the old buffers.
+        """
+        self.remove_ctypes_pointers()
+        for grid in self.grids:
+            sizes = [shape[0]*shape[1] for shape in self.grid_shapes(grid)]
+            self.offsets[grid] = np.concatenate(([0], np.cumsum(sizes))).astype(dtype=int)
+
+        for name in names:
+            n_comp, grid = self.fields[name]
+            offsets = self.offsets[grid]
+            shapes = self.grid_shapes(grid)
+            if n_comp is None:
+                buffer = np.zeros((offsets[-1],), dtype=ct.c_double)
+                views = [buffer[offsets[i_surf]:offsets[i_surf + 1]].reshape(shapes[i_surf])
+                         for i_surf in range(self.n_surf)]
+            else:
+                buffer = np.zeros((n_comp, offsets[-1]), dtype=ct.c_double)
+                views = [buffer[:, offsets[i_surf]:offsets[i_surf + 1]].reshape((n_comp,) + shapes[i_surf])
+                         for i_surf in range(self.n_surf)]
+            self.buffers[name] = buffer
+            setattr(self, name, views)
+
+    def resize_wake(self, m_star):
+        """
+        Changes the number of chordwise wake panels of all the surfaces to ``m_star``.
+        The wake fields are reallocated (zero filled), the bound ones are kept.
+        """
+        self.dimensions_star = self.dimensions_star.copy()
+        self.dimensions_star[:, 0] = m_star
+        self.allocate([name for name, (n_comp, grid) in self.fields.items() if grid.startswith('wake')])
+
+    def pointer_table(self, name):
+        """
+        Returns a ctypes array of ``double*``, one per surface and component (surface major),
+        pointing to the contiguous ``[M, N]`` blocks of the field in its buffer.
+        """
+        n_comp, grid = self.fields[name]
+        buffer = self.buffers[name]
+        offsets = self.offsets[grid][:-1]
+        if n_comp is None:
+            element_offsets = offsets
+        else:
+            element_offsets = (offsets[:, None] + buffer.shape[1]*np.arange(n_comp)[None, :]).reshape(-1)
+        addresses = (buffer.ctypes.data + buffer.itemsize*element_offsets).astype(dtype=np.uintp)
+        table = (ct.POINTER(ct.c_double)*len(addresses)).from_buffer(addresses)
+        return table
 
     def generate_ctypes_pointers(self):
+        """
+        Generates the ``ct_p_*`` pointer tables for the UVLM library.
+
+        The tables are kept for the lifetime of the buffers, so calling this again is
+        free unless the buffers have been reallocated (see ``allocate``) or the
+        tables removed with ``remove_ctypes_pointers``.
+        """
+        if self.ct_pointers_generated:
+            return
+
         self.ct_dimensions = self.dimensions.astype(dtype=ct.c_uint)
         self.ct_dimensions_star = self.dimensions_star.astype(dtype=ct.c_uint)
 
         n_surf = len(self.dimensions)
 
-        from sharpy.utils.constants import NDIM
-
-        self.ct_zeta_list = []
-        for i_surf in range(self.n_surf):
-            for i_dim in range(NDIM):
-                self.ct_zeta_list.append(self.zeta[i_surf][i_dim, :, :].reshape(-1))
-
-        self.ct_zeta_dot_list = []
-        for i_surf in range(self.n_surf):
-            for i_dim in range(NDIM):
-                self.ct_zeta_dot_list.append(self.zeta_dot[i_surf][i_dim, :, :].reshape(-1))
-
-        self.ct_zeta_star_list = []
-        for i_surf in range(self.n_surf):
-            for i_dim in range(NDIM):
-                self.ct_zeta_star_list.append(self.zeta_star[i_surf][i_dim, :, :].reshape(-1))
-
-        self.ct_zeta_star_dot_list = []
-        for i_surf in range(self.n_surf):
-            for i_dim in range(NDIM):
-                self.ct_zeta_star_dot_list.append(self.zeta_star_dot[i_surf][i_dim, :, :].reshape(-1))
-
-        self.ct_u_ext_list = []
-        for i_surf in range(self.n_surf):
-            for i_dim in range(NDIM):
-                self.ct_u_ext_list.append(self.u_ext[i_surf][i_dim, :, :].reshape(-1))
-
-        self.ct_u_ext_star_list = []
-        for i_surf in range(self.n_surf):
-            for i_dim in range(NDIM):
-                self.ct_u_ext_star_list.append(self.u_ext_star[i_surf][i_dim, :, :].reshape(-1))
-
-        self.ct_gamma_list = []
-        for i_surf in range(self.n_surf):
-            self.ct_gamma_list.append(self.gamma[i_surf][:, :].reshape(-1))
-
-        self.ct_gamma_star_list = []
-        for i_surf in range(self.n_surf):
-            self.ct_gamma_star_list.append(self.gamma_star[i_surf][:, :].reshape(-1))
-
-        self.ct_normals_list = []
-        for i_surf in range(self.n_surf):
-            for i_dim in range(NDIM):
-                self.ct_normals_list.append(self.normals[i_surf][i_dim, :, :].reshape(-1))
-
-        self.ct_forces_list = []
-        for i_surf in range(self.n_surf):
-            for i_dim in range(NDIM*2):
-                self.ct_forces_list.append(self.forces[i_surf][i_dim, :, :].reshape(-1))
-
-        self.ct_dynamic_forces_list = []
-        for i_surf in range(self.n_surf):
-            for i_dim in range(NDIM*2):
-                self.ct_dynamic_forces_list.append(self.dynamic_forces[i_surf][i_dim, :, :].reshape(-1))
-
         self.ct_p_dimensions = ((ct.POINTER(ct.c_uint)*n_surf)
                                 (* np.ctypeslib.as_ctypes(self.ct_dimensions)))
         self.ct_p_dimensions_star = ((ct.POINTER(ct.c_uint)*n_surf)
                                      (* np.ctypeslib.as_ctypes(self.ct_dimensions_star)))
-        self.ct_p_zeta = ((ct.POINTER(ct.c_double)*len(self.ct_zeta_list))
-                          (* [np.ctypeslib.as_ctypes(array) for array in self.ct_zeta_list]))
-        self.ct_p_zeta_dot = ((ct.POINTER(ct.c_double)*len(self.ct_zeta_dot_list))
-                          (* [np.ctypeslib.as_ctypes(array) for array in self.ct_zeta_dot_list]))
-        self.ct_p_zeta_star = ((ct.POINTER(ct.c_double)*len(self.ct_zeta_star_list))
-                               (* [np.ctypeslib.as_ctypes(array) for array in self.ct_zeta_star_list]))
-        self.ct_p_zeta_star_dot = ((ct.POINTER(ct.c_double)*len(self.ct_zeta_star_dot_list))
-                               (* [np.ctypeslib.as_ctypes(array) for array in self.ct_zeta_star_dot_list]))
-        self.ct_p_u_ext = ((ct.POINTER(ct.c_double)*len(self.ct_u_ext_list))
-                           (* [np.ctypeslib.as_ctypes(array) for array in self.ct_u_ext_list]))
-        self.ct_p_u_ext_star = ((ct.POINTER(ct.c_double)*len(self.ct_u_ext_star_list))
-                           (* [np.ctypeslib.as_ctypes(array) for array in self.ct_u_ext_star_list]))
-        self.ct_p_gamma = ((ct.POINTER(ct.c_double)*len(self.ct_gamma_list))
-                           (* [np.ctypeslib.as_ctypes(array) for array in self.ct_gamma_list]))
-        self.ct_p_gamma_star = ((ct.POINTER(ct.c_double)*len(self.ct_gamma_star_list))
-                                (* [np.ctypeslib.as_ctypes(array) for array in self.ct_gamma_star_list]))
-        self.ct_p_normals = ((ct.POINTER(ct.c_double)*len(self.ct_normals_list))
-                             (* [np.ctypeslib.as_ctypes(array) for array in self.ct_normals_list]))
-        self.ct_p_forces = ((ct.POINTER(ct.c_double)*len(self.ct_forces_list))
-                            (* [np.ctypeslib.as_ctypes(array) for array in self.ct_forces_list]))
-        self.ct_p_dynamic_forces = ((ct.POINTER(ct.c_double)*len(self.ct_dynamic_forces_list))
-                            (* [np.ctypeslib.as_ctypes(array) for array in self.ct_dynamic_forces_list]))
+        self.ct_p_zeta = self.pointer_table('zeta')
+        self.ct_p_zeta_dot = self.pointer_table('zeta_dot')
+        self.ct_p_zeta_star = self.pointer_table('zeta_star')
+        self.ct_p_zeta_star_dot = self.pointer_table('zeta_star_dot')
+        self.ct_p_u_ext = self.pointer_table('u_ext')
+        self.ct_p_u_ext_star = self.pointer_table('u_ext_star')
+        self.ct_p_gamma = self.pointer_table('gamma')
+        self.ct_p_gamma_star = self.pointer_table('gamma_star')
+        self.ct_p_normals = self.pointer_table('normals')
+        self.ct_p_forces = self.pointer_table('forces')
+        self.ct_p_dynamic_forces = self.pointer_table('dynamic_forces')
+        self.ct_pointers_generated = True
 
     def remove_ctypes_pointers(self):
-        try:
-            del self.ct_p_zeta, self.ct_zeta_list
-        except AttributeError:
-            pass
-        try:
-            del self.ct_p_zeta_star, self.ct_zeta_star_list
-        except AttributeError:
-            pass
-        try:
-            del self.ct_p_u_ext, self.ct_u_ext_list
-        except AttributeError:
-            pass
-        try:
-            del self.ct_p_u_ext_star, self.ct_u_ext_star_list
-        except AttributeError:
-            pass
-        try:
-            del self.ct_p_gamma, self.ct_gamma_list
-        except AttributeError:
-            pass
-        try:
-            del self.ct_p_gamma_star, self.ct_gamma_star_list
-        except AttributeError:
-            pass
-        try:
-            del self.ct_p_normals, self.ct_normals_list
-        except AttributeError:
-            pass
-        try:
-            del self.ct_p_forces, self.ct_forces_list
-        except AttributeError:
-            pass
-        try:
-            del self.ct_p_dynamic_forces, self.ct_dynamic_forces_list
-        except AttributeError:
-            pass
-        try:
-            del self.ct_p_dimensions
-        except AttributeError:
-            pass
+        for name in ['ct_p_zeta',
+                     'ct_p_zeta_dot',
+                     'ct_p_zeta_star',
+                     'ct_p_zeta_star_dot',
+                     'ct_p_u_ext',
+                     'ct_p_u_ext_star',
+                     'ct_p_gamma',
+                     'ct_p_gamma_star',
+                     'ct_p_normals',
+                     'ct_p_forces',
+                     'ct_p_dynamic_forces',
+                     'ct_p_dimensions',
+                     'ct_p_dimensions_star']:
+            try:
+                delattr(self, name)
+            except AttributeError:
+                pass
+        self.ct_pointers_generated = False
+
+    # fields copied by default by copy
+    copy_fields = ['zeta', 'zeta_star', 'u_ext', 'u_ext_star', 'gamma', 'gamma_star', 'normals', 'forces']
+
+    def copy(self, out=None, fields=None):
+        """
+        Copies the timestep.
 
-    def copy(self):
-        out = AeroTimeStepInfo(self.dimensions, self.dimensions_star)
-        out.zeta = copy.deepcopy(self.zeta)
-        out.zeta_star = copy.deepcopy(self.zeta_star)
-        out.u_ext = copy.deepcopy(self.u_ext)
-        out.u_ext_star = copy.deepcopy(self.u_ext_star)
-        out.gamma = copy.deepcopy(self.gamma)
-        out.gamma_star = copy.deepcopy(self.gamma_star)
-        out.normals = copy.deepcopy(self.normals)
-        out.forces = copy.deepcopy(self.forces)
+        :param out: preallocated ``AeroTimeStepInfo`` with the same dimensions (for example,
+            a recycled one from a ``TimeStepInfoPool``). If ``None``, a new one is allocated.
+        :param fields: names of the fields to copy (``copy_fields`` by default). The rest of the
+            fields (and the total forces) of ``out`` are set to zero.
+        :return: the copy (``out`` if given)
+        """
+        if fields is None:
+            fields = self.copy_fields
+        if out is None:
+            out = AeroTimeStepInfo(self.dimensions, self.dimensions_star)
+        else:
+            if not (np.array_equal(out.dimensions, self.dimensions) and
+                    np.array_equal(out.dimensions_star, self.dimensions_star)):
+                raise ValueError('The output AeroTimeStepInfo has different dimensions')
+            for name in self.fields:
+                if name not in fields:
+                    out.buffers[name].fill(0.0)
+            for name in self.total_forces_names:
+                getattr(out, name).fill(0.0)
+
+        for name in fields:
+            np.copyto(out.buffers[name], self.buffers[name])
         return out
 
-    def update_orientation(self, rot):
-        for i_surf in range(self.n_surf):
-            for i_row in range(self.zeta[i_surf].shape[1]):
-                for i_col in range(self.zeta[i_surf].shape[2]):
-                    self.zeta[i_surf][:, i_row, i_col] = np.dot(rot,
-                                                                self.zeta[i_surf][:, i_row, i_col])
+    def update_orientation(self, rot, fields=('zeta',)):
+        """
+        Rotates the grid (all the surfaces at once, as a single product with the buffer).
+
+        :param rot: rotation matrix
+        :param fields: vector fields to rotate, only ``zeta`` by default
+        """
+        for name in fields:
+            buffer = self.buffers[name]
+            buffer[0:3, :] = np.dot(rot, buffer[0:3, :])
 
 
 class StructTimeStepInfo(object):
-    def __init__(self, num_node, num_elem, num_node_elem=3):
+    """
+    Structural variables of one timestep.
+
+    If ``history`` (a ``StructTimeStepHistory``) is given, the arrays are not allocated,
+    but views of the step ``i_step`` of the history arrays.
+    """
+    def __init__(self, num_node, num_elem, num_node_elem=3, history=None, i_step=0):
         self.num_node = num_node
         self.num_elem = num_elem
         self.num_node_elem = num_node_elem
-        # generate placeholder for node coordinates
-        self.pos = np.zeros((self.num_node, 3), dtype=ct.c_double, order='F')
-        self.pos_dot = np.zeros((self.num_node, 3), dtype=ct.c_double, order='F')
-
-        # placeholder for CRV
-        self.psi = np.zeros((self.num_elem, num_node_elem, 3), dtype=ct.c_double, order='F')
-        self.psi_dot = np.zeros((self.num_elem, num_node_elem, 3), dtype=ct.c_double, order='F')
-
-        # FoR data
-        self.quat = np.array([1, 0, 0, 0], dtype=float)
-        self.for_pos = np.zeros((6,))
-        self.for_vel = np.zeros((6,))
+        if history is None:
+            # generate placeholder for node coordinates
+            self.pos = np.zeros((self.num_node, 3), dtype=ct.c_double, order='F')
+            self.pos_dot = np.zeros((self.num_node, 3), dtype=ct.c_double, order='F')
+
+            # placeholder for CRV
+            self.psi = np.zeros((self.num_elem, num_node_elem, 3), dtype=ct.c_double, order='F')
+            self.psi_dot = np.zeros((self.num_elem, num_node_elem, 3), dtype=ct.c_double, order='F')
+
+            # FoR data
+            self.quat = np.array([1, 0, 0, 0], dtype=float)
+            self.for_pos = np.zeros((6,))
+            self.for_vel = np.zeros((6,))
+
+            self.steady_applied_forces = np.zeros((self.num_node, 6), dtype=ct.c_double, order='F')
+        else:
+            self.pos = history.pos[:, :, i_step]
+            self.pos_dot = history.pos_dot[:, :, i_step]
+            self.psi = history.psi[:, :, :, i_step]
+            self.psi_dot = history.psi_dot[:, :, :, i_step]
+            self.quat = history.quat[:, i_step]
+            self.for_pos = history.for_pos[:, i_step]
+            self.for_vel = history.for_vel[:, i_step]
+            self.steady_applied_forces = history.steady_applied_forces[:, :, i_step]
 
         self.gravity_vector_inertial = np.array([0.0, 0.0, 1.0], dtype=ct.c_double, order='F')
         self.gravity_vector_body = np.array([0.0, 0.0, 1.0], dtype=ct.c_double, order='F')
 
-        self.steady_applied_forces = np.zeros((self.num_node, 6), dtype=ct.c_double, order='F')
+        # rotation matrices cache (see cab and cga)
+        self.cab_cache = None
+        self.cab_cache_psi = None
+        self.cga_cache = None
+        self.cga_cache_quat = None
+
+    # arrays copied by copy
+    copy_fields = ['pos', 'pos_dot', 'psi', 'psi_dot', 'quat', 'for_pos', 'for_vel',
+                   'gravity_vector_inertial', 'gravity_vector_body', 'steady_applied_forces']
 
-    def copy(self):
-        from copy import deepcopy
-        return deepcopy(self)
+    def copy(self, out=None):
+        """
+        Copies the timestep.
+
+        :param out: preallocated ``StructTimeStepInfo`` with the same dimensions (for example,
+            a recycled one from a ``TimeStepInfoPool``). If ``None``, a new one is allocated.
+        :return: the copy (``out`` if given)
+        """
+        if out is None:
+            out = StructTimeStepInfo(self.num_node, self.num_elem, self.num_node_elem)
+        for name in self.copy_fields:
+            value = getattr(self, name)
+            out_value = getattr(out, name)
+            if out_value.shape == value.shape:
+                np.copyto(out_value, value)
+            else:
+                # the attribute has been replaced by an array of a different size
+                setattr(out, name, value.copy(order='A'))
+
+        # the cached rotation matrices are never modified, they can be shared
+        out.cab_cache = self.cab_cache
+        out.cab_cache_psi = self.cab_cache_psi
+        out.cga_cache = self.cga_cache
+        out.cga_cache_quat = self.cga_cache_quat
+        return out
+
+    def constructor_args(self):
+        return self.num_node, self.num_elem, self.num_node_elem
+
+    def cab(self):
+        """
+        Rotation matrices ``Cab`` for every node of every element, shared by all the
+        consumers of the timestep.
+
+        The table is computed lazily and recomputed only when ``psi`` has changed
+        since the last evaluation (this includes in-place writes done by the Fortran solvers).
+        :return: ``[num_elem, num_node_elem, 3, 3]`` array. It must not be modified.
+        """
+        if self.cab_cache is None or not np.array_equal(self.cab_cache_psi, self.psi):
+            self.cab_cache = algebra.crv2rot_vec(self.psi)
+            self.cab_cache_psi = self.psi.copy()
+        return self.cab_cache
+
+    def cga(self):
+        """
+        Rotation matrix obtained from ``quat``, cached until ``quat`` changes.
+        :return: ``algebra.quat2rot(self.quat)``. It must not be modified.
+        """
+        if self.cga_cache is None or not np.array_equal(self.cga_cache_quat, self.quat):
+            self.cga_cache = algebra.quat2rot(self.quat)
+            self.cga_cache_quat = self.quat.copy()
+        return self.cga_cache
 
     def glob_pos(self, include_rbm=True):
-        coords = self.pos.copy()
-        c = algebra.quat2rot(self.quat).transpose()
-        for i_node in range(self.num_node):
-            coords[i_node, :] = np.dot(c, coords[i_node, :])
-            if include_rbm:
-                coords[i_node, :] += self.for_pos[0:3]
+        # np.dot(cga.T, pos[i_node, :]) for every node
+        coords = np.dot(self.pos, self.cga())
+        if include_rbm:
+            coords += self.for_pos[0:3]
         return coords
 
     def update_orientation(self, quat):
@@ -291,14 +332,249 @@ class StructTimeStepInfo(object):
         :param quat: Corresponding to the Cga matrix
         :return:
         """
-        self.quat = quat.copy()
+        # in place, the array can be a view of a StructTimeStepHistory
+        self.quat[:] = quat
         # rotate gravity_vector_inertial to body
         # in fact the gravity vector is the vertical vector
-        rot = algebra.quat2rot(self.quat)
+        rot = self.cga()
         self.gravity_vector_body = np.dot(rot.T, self.gravity_vector_inertial)
 
 
+class StructTimeStepHistory(object):
+    """
+    Structural variables of ``n_steps`` timesteps stored in single arrays (Fortran order,
+    step as the last index), so that the variables of every step are a contiguous slice:
+
+        * ``pos``, ``pos_dot``: ``[num_node, 3, n_steps]``
+        * ``psi``, ``psi_dot``: ``[num_elem, num_node_elem, 3, n_steps]``
+        * ``quat``: ``[4, n_steps]``
+        * ``for_pos``, ``for_vel``, ``for_acc``: ``[6, n_steps]``
+        * ``steady_applied_forces``, ``dynamic_forces``: ``[num_node, 6, n_steps]``
+
+    ``timestep_info()`` returns the list of ``StructTimeStepInfo`` of every step, whose
+    arrays are views of these with the same layout as the ones of a standalone
+    ``StructTimeStepInfo``, so they can be passed to the xbeam library as they are.
+    ``solver_history`` gives the history arrays with the layout of the xbeam dynamic solvers.
+    """
+    def __init__(self, num_node, num_elem, num_node_elem, n_steps):
+        self.num_node = num_node
+        self.num_elem = num_elem
+        self.num_node_elem = num_node_elem
+        self.n_steps = n_steps
+
+        self.pos = np.zeros((num_node, 3, n_steps), dtype=ct.c_double, order='F')
+        self.pos_dot = np.zeros((num_node, 3, n_steps), dtype=ct.c_double, order='F')
+        self.psi = np.zeros((num_elem, num_node_elem, 3, n_steps), dtype=ct.c_double, order='F')
+        self.psi_dot = np.zeros((num_elem, num_node_elem, 3, n_steps), dtype=ct.c_double, order='F')
+
+        self.quat = np.zeros((4, n_steps), dtype=ct.c_double, order='F')
+        self.for_pos = np.zeros((6, n_steps), dtype=ct.c_double, order='F')
+        self.for_vel = np.zeros((6, n_steps), dtype=ct.c_double, order='F')
+        self.for_acc = np.zeros((6, n_steps), dtype=ct.c_double, order='F')
+
+        self.steady_applied_forces = np.zeros((num_node, 6, n_steps), dtype=ct.c_double, order='F')
+        self.dynamic_forces = np.zeros((num_node, 6, n_steps), dtype=ct.c_double, order='F')
+
+    def timestep_info(self):
+        return [StructTimeStepInfo(self.num_node,
+                                   self.num_elem,
+                                   self.num_node_elem,
+                                   history=self,
+                                   i_step=i_step) for i_step in range(self.n_steps)]
+
+    def solver_history(self, name, n_steps):
+        """
+        Copy of the first ``n_steps`` steps of the history array ``name`` with the step as the
+        first index (Fortran order), the layout of the history arrays of the xbeam dynamic solvers.
+        Written back with ``set_solver_history``.
+        """
+        history = getattr(self, name)[..., 0:n_steps]
+        return np.asfortranarray(np.moveaxis(history, -1, 0), dtype=ct.c_double)
+
+    def set_solver_history(self, name, values):
+        """
+        Writes back the steps of ``values`` (as given by ``solver_history``) to the history array ``name``.
+        """
+        getattr(self, name)[..., 0:values.shape[0]] = np.moveaxis(values, 0, -1)
 
 
+class TimeStepInfoPool(object):
+    """
+    Free list of discarded timestep infos (``AeroTimeStepInfo`` or ``StructTimeStepInfo``).
 
+    ``get`` returns a recycled instance built with the same arguments if there is one
+    available, or a new one. Recycled instances keep the values of their previous
+    use, so they are meant to be passed as ``out`` to ``copy``.
 
+    :param cls: ``AeroTimeStepInfo`` or ``StructTimeStepInfo``
+    :param max_size: maximum number of instances kept for every set of arguments
+    """
+    def __init__(self, cls, max_size=4):
+        self.cls = cls
+        self.max_size = max_size
+        self.free = dict()
+
+    @staticmethod
+    def key(args):
+        return tuple((np.shape(arg), np.asarray(arg).tobytes()) for arg in args)
+
+    def get(self, *args):
+        try:
+            return self.free[self.key(args)].pop()
+        except (KeyError, IndexError):
+            return self.cls(*args)
+
+    def release(self, ts_info):
+        """
+        Adds ``ts_info`` to the pool. The caller must not keep any other reference to it.
+        """
+        free = self.free.setdefault(self.key(ts_info.constructor_args()), [])
+        if len(free) < self.max_size:
+            free.append(ts_info)
+
+
+class AeroTimeStepHistory(object):
+    """
+    Bounded replacement of the ``Aerogrid.timestep_info`` list.
+
+    Only the last ``length`` timesteps are kept in memory. Older ones are, depending on
+    ``policy``:
+
+        * ``'spill'``: written to the HDF5 file ``file_name`` (one group per timestep, chunked
+          datasets) and transparently read back when accessed. Changes done to a timestep read back
+          from the file (for example, the total forces computed by ``AeroForcesCalculator``) are written
+          back to it when another old timestep is accessed, or in ``close``.
+        * ``'discard'``: dropped. Accessing them raises an ``IndexError``.
+
+    :param policy: ``'spill'`` or ``'discard'``
+    :param length: number of timesteps kept in memory (at least 2, the solvers use the current and the previous one)
+    :param file_name: HDF5 file for ``'spill'``
+    :param release: function called with the timesteps evicted from memory, once they are not needed
+        anymore (``Aerogrid.release_timestep`` to recycle them)
+    """
+    policies = ['spill', 'discard']
+
+    def __init__(self, policy, length, file_name=None, release=None):
+        if policy not in self.policies:
+            raise ValueError('Unknown aero history policy %s, options are %s' % (policy, self.policies))
+        if length < 2:
+            raise ValueError('At least 2 aero timesteps have to be kept in memory')
+        if policy == 'spill' and not file_name:
+            raise ValueError('An HDF5 file is necessary for the spill aero history policy')
+        self.policy = policy
+        self.length = length
+        self.file_name = file_name
+        self.release = release
+
+        self.n_steps = 0
+        self.in_memory = dict()
+        self.file = None
+        self.file_created = False
+        # last timestep read back from the file
+        self.loaded_index = None
+        self.loaded = None
+
+    def __len__(self):
+        return self.n_steps
+
+    def __iter__(self):
+        for i_step in range(self.n_steps):
+            yield self[i_step]
+
+    def index(self, i_step):
+        if i_step < 0:
+            i_step += self.n_steps
+        if i_step < 0 or i_step >= self.n_steps:
+            raise IndexError('Aero timestep %d out of range' % i_step)
+        return i_step
+
+    def append(self, ts_info):
+        self.in_memory[self.n_steps] = ts_info
+        self.n_steps += 1
+        while len(self.in_memory) > self.length:
+            self.evict(min(self.in_memory.keys()))
+
+    def __getitem__(self, i_step):
+        i_step = self.index(i_step)
+        try:
+            return self.in_memory[i_step]
+        except KeyError:
+            pass
+        if self.policy == 'discard':
+            raise IndexError('Aero timestep %u has been discarded (history_policy = discard)' % i_step)
+        return self.load(i_step)
+
+    def __setitem__(self, i_step, ts_info):
+        i_step = self.index(i_step)
+        if i_step in self.in_memory:
+            self.in_memory[i_step] = ts_info
+        elif self.policy == 'discard':
+            raise IndexError('Aero timestep %u has been discarded (history_policy = discard)' % i_step)
+        else:
+            if self.loaded_index == i_step:
+                self.loaded = ts_info
+            else:
+                self.write(i_step, ts_info)
+
+    def evict(self, i_step):
+        ts_info = self.in_memory.pop(i_step)
+        if self.policy == 'spill':
+            self.write(i_step, ts_info)
+        if self.release is not None:
+            self.release(ts_info)
+
+    def open(self):
+        if self.file is None:
+            if self.file_created:
+                self.file = h5.File(self.file_name, 'r+')
+            else:
+                self.file = h5.File(self.file_name, 'w')
+                self.file_created = True
+
+    def write(self, i_step, ts_info):
+        self.open()
+        group = self.file.require_group('%06u' % i_step)
+        arrays = dict(ts_info.buffers)
+        arrays['dimensions'] = ts_info.dimensions
+        arrays['dimensions_star'] = ts_info.dimensions_star
+        for name in ts_info.total_forces_names:
+            arrays[name] = getattr(ts_info, name)
+        for name, array in arrays.items():
+            if name in group and group[name].shape == array.shape:
+                group[name][...] = array
+            else:
+                if name in group:
+                    del group[name]
+                group.create_dataset(name, data=array, chunks=True)
+
+    def load(self, i_step):
+        if self.loaded_index == i_step:
+            return self.loaded
+        self.write_back()
+
+        self.open()
+        group = self.file['%06u' % i_step]
+        ts_info = AeroTimeStepInfo(group['dimensions'][()], group['dimensions_star'][()])
+        for name in ts_info.buffers:
+            group[name].read_direct(ts_info.buffers[name])
+        for name in ts_info.total_forces_names:
+            group[name].read_direct(getattr(ts_info, name))
+
+        self.loaded_index = i_step
+        self.loaded = ts_info
+        return ts_info
+
+    def write_back(self):
+        if self.loaded is not None:
+            self.write(self.loaded_index, self.loaded)
+            self.loaded_index = None
+            self.loaded = None
+
+    def close(self):
+        """
+        Writes back the timestep read from the file (if any) and closes the file.
+        """
+        if self.file is not None:
+            self.write_back()
+            self.file.close()
+            self.file = None
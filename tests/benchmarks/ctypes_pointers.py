@@ -0,0 +1,49 @@
+"""
+Benchmark of the marshalling overhead of the UVLM library calls.
+
+Measures the time spent in ``AeroTimeStepInfo.generate_ctypes_pointers`` per
+solver call, when the pointer tables are rebuilt every call (as it was done before
+caching them) and when they are reused.
+
+Run with::
+
+    python -m tests.benchmarks.ctypes_pointers
+"""
+import timeit
+
+import numpy as np
+
+from sharpy.utils.datastructures import AeroTimeStepInfo
+
+
+def aero_ts_info(n_surf, m, n, m_star):
+    dimensions = np.zeros((n_surf, 2), dtype=int)
+    dimensions[:, 0] = m
+    dimensions[:, 1] = n
+    dimensions_star = dimensions.copy()
+    dimensions_star[:, 0] = m_star
+    return AeroTimeStepInfo(dimensions, dimensions_star)
+
+
+def rebuild(ts_info):
+    ts_info.remove_ctypes_pointers()
+    ts_info.generate_ctypes_pointers()
+
+
+def reuse(ts_info):
+    ts_info.generate_ctypes_pointers()
+
+
+def run(n_calls=2000, repeat=5):
+    print('%8s %8s %16s %16s' % ('n_surf', 'panels', 'rebuild [us]', 'reuse [us]'))
+    for n_surf in [1, 4, 12]:
+        ts_info = aero_ts_info(n_surf, 8, 16, 80)
+        times = []
+        for function in [rebuild, reuse]:
+            time = min(timeit.repeat(lambda: function(ts_info), number=n_calls, repeat=repeat))
+            times.append(time/n_calls*1e6)
+        print('%8u %8u %16.2f %16.2f' % (n_surf, np.sum(ts_info.dimensions.prod(axis=1)), times[0], times[1]))
+
+
+if __name__ == '__main__':
+    run()
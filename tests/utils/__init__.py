@@ -1,2 +1,3 @@
 from tests.utils.settings_test import *
 from tests.utils.algebra_test import *
+from tests.utils.datastructures_test import *
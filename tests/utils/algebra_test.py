@@ -52,3 +52,122 @@ class TestAlgebra(unittest.TestCase):
 
 
 
+
+    def test_rotation_vec(self):
+        """
+        Tests the vectorised rotation routines against the single-node ones
+        :return:
+        """
+        np.random.seed(0)
+        psi = 2.0*np.random.randn(50, 3)
+        psi[0, :] = 0.0
+        psi[1, :] = np.array([1e-17, 0, 0])
+
+        rot = algebra.crv2rot_vec(psi)
+        for i in range(psi.shape[0]):
+            self.assertTrue(np.allclose(rot[i, :, :], algebra.crv2rot(psi[i, :])))
+
+        # leading dimensions are preserved
+        self.assertEqual(algebra.crv2rot_vec(psi.reshape((10, 5, 3))).shape, (10, 5, 3, 3))
+
+        crv = algebra.rot2crv_vec(rot)
+        quat = algebra.mat2quat_vec(rot)
+        for i in range(psi.shape[0]):
+            self.assertTrue(np.allclose(crv[i, :], algebra.rot2crv(rot[i, :, :])))
+            self.assertTrue(np.allclose(quat[i, :], algebra.mat2quat(rot[i, :, :])))
+
+        rot_quat = algebra.quat2rot_vec(quat)
+        for i in range(psi.shape[0]):
+            self.assertTrue(np.allclose(rot_quat[i, :, :], algebra.quat2rot(quat[i, :])))
+
+        v1, v2, v3 = algebra.crv2triad_vec(psi)
+        crv_triad = algebra.triad2crv_vec(v1, v2, v3)
+        for i in range(psi.shape[0]):
+            self.assertTrue(np.allclose(v1[i, :], algebra.crv2triad(psi[i, :])[0]))
+            self.assertTrue(np.allclose(crv_triad[i, :], algebra.triad2crv(v1[i, :], v2[i, :], v3[i, :])))
+
+        angle = np.random.randn(10)
+        vec = np.random.randn(10, 3)
+        rot_x = algebra.rotation3d_x_vec(angle)
+        rot_z = algebra.rotation3d_z_vec(angle)
+        angle_sign = algebra.angle_between_vectors_sign_vec(np.array([1, 0, 0]), vec)
+        for i in range(angle.shape[0]):
+            self.assertTrue(np.allclose(rot_x[i, :, :], algebra.rotation3d_x(angle[i])))
+            self.assertTrue(np.allclose(rot_z[i, :, :], algebra.rotation3d_z(angle[i])))
+            self.assertAlmostEqual(angle_sign[i], algebra.angle_between_vectors_sign(np.array([1, 0, 0]), vec[i, :]))
+
+    def test_tangent_vector_vec(self):
+        """
+        Tests the closed form tangent vectors against a polynomial fit
+        :return:
+        """
+        np.random.seed(1)
+        coords = np.random.randn(20, 3, 3)
+        ordering = [0, 2, 1]
+        tangent, polyfit = algebra.tangent_vector_vec(coords, ordering)
+        for i_elem in range(coords.shape[0]):
+            ordered_coords = coords[i_elem, ordering, :]
+            for i_dim in range(3):
+                ref_polyfit = np.polyfit(range(3), ordered_coords[:, i_dim], 2)
+                self.assertTrue(np.allclose(polyfit[i_elem, i_dim, :], ref_polyfit))
+
+            # reference tangent: derivative of the fitted polynomial at the (ordered) nodes
+            ref_tangent = np.zeros((3, 3))
+            for i_dim in range(3):
+                ref_der = np.polyder(np.polyfit(range(3), ordered_coords[:, i_dim], 2))
+                ref_tangent[:, i_dim] = np.polyval(ref_der, range(3))
+            ref_tangent /= np.linalg.norm(ref_tangent, axis=1)[:, None]
+
+            # oriented along the ordered nodes, the last node uses the previous chord
+            chord = np.diff(ordered_coords, axis=0)
+            chord = np.vstack((chord, chord[-1, :]))
+            if np.any(np.sum(ref_tangent*chord, axis=1) < 0):
+                ref_tangent *= -1
+
+            self.assertTrue(np.allclose(tangent[i_elem, :, :], ref_tangent))
+
+        # straight element along -y
+        coords = np.zeros((1, 3, 3))
+        coords[0, :, 1] = [0.0, -2.0, -1.0]
+        tangent, _ = algebra.tangent_vector_vec(coords, ordering)
+        for i_node in range(3):
+            self.assertTrue(np.allclose(tangent[0, i_node, :], [0.0, -1.0, 0.0]))
+
+    def test_crv2tan(self):
+        """
+        Tests the tangent operator against finite differences of ``crv2rot``
+        :return:
+        """
+        np.random.seed(3)
+        psi = np.random.randn(10, 3)
+        psi[0, :] = 0.0
+        psi[1, :] *= 1e-6
+        delta = 1e-7
+        for i in range(psi.shape[0]):
+            tan = algebra.crv2tan(psi[i, :])
+            rot = algebra.crv2rot(psi[i, :])
+            for i_dim in range(3):
+                delta_psi = np.zeros((3,))
+                delta_psi[i_dim] = delta
+                delta_rot = np.dot(rot.T, algebra.crv2rot(psi[i, :] + delta_psi)) - np.eye(3)
+                rotation = np.array([delta_rot[2, 1], delta_rot[0, 2], delta_rot[1, 0]])/delta
+                self.assertTrue(np.allclose(rotation, tan[:, i_dim], atol=1e-6))
+
+    def test_crv2tan_vec(self):
+        """
+        Tests the vectorised tangent operator against finite differences of ``crv2rot``
+        :return:
+        """
+        np.random.seed(2)
+        psi = np.random.randn(10, 3)
+        psi[0, :] = 0.0
+        tan = algebra.crv2tan_vec(psi)
+        delta = 1e-7
+        for i in range(psi.shape[0]):
+            rot = algebra.crv2rot(psi[i, :])
+            for i_dim in range(3):
+                delta_psi = np.zeros((3,))
+                delta_psi[i_dim] = delta
+                delta_rot = np.dot(rot.T, algebra.crv2rot(psi[i, :] + delta_psi)) - np.eye(3)
+                rotation = np.array([delta_rot[2, 1], delta_rot[0, 2], delta_rot[1, 0]])/delta
+                self.assertTrue(np.allclose(rotation, tan[i, :, i_dim], atol=1e-6))
@@ -0,0 +1,244 @@
+import sharpy.utils.algebra as algebra
+from sharpy.utils.datastructures import (StructTimeStepInfo, StructTimeStepHistory, AeroTimeStepInfo,
+                                         AeroTimeStepHistory, TimeStepInfoPool)
+import ctypes as ct
+import os
+import tempfile
+import numpy as np
+import unittest
+
+
+class TestStructTimeStepInfo(unittest.TestCase):
+    """
+    Tests the structural timestep storage
+    """
+
+    def test_rotation_cache(self):
+        ts_info = StructTimeStepInfo(5, 2, 3)
+        np.random.seed(0)
+        ts_info.psi[:] = np.random.randn(2, 3, 3)
+
+        cab = ts_info.cab()
+        self.assertEqual(cab.shape, (2, 3, 3, 3))
+        self.assertTrue(np.allclose(cab[1, 2, :, :], algebra.crv2rot(ts_info.psi[1, 2, :])))
+        # no changes, same table
+        self.assertIs(ts_info.cab(), cab)
+
+        # in-place writes invalidate the table
+        ts_info.psi[1, 2, :] = np.array([0.1, -0.2, 0.3])
+        self.assertTrue(np.allclose(ts_info.cab()[1, 2, :, :], algebra.crv2rot(np.array([0.1, -0.2, 0.3]))))
+
+        quat = algebra.euler2quat(np.array([0.1, 0.2, 0.3]))
+        ts_info.update_orientation(quat)
+        self.assertTrue(np.allclose(ts_info.cga(), algebra.quat2rot(quat)))
+
+    def test_copy(self):
+        ts_info = StructTimeStepInfo(5, 2, 3)
+        np.random.seed(1)
+        ts_info.pos[:] = np.random.randn(5, 3)
+        ts_info.psi[:] = np.random.randn(2, 3, 3)
+        ts_info.update_orientation(algebra.euler2quat(np.array([0.1, 0.2, 0.3])))
+
+        pool = TimeStepInfoPool(StructTimeStepInfo)
+        pool.release(StructTimeStepInfo(5, 2, 3))
+        recycled = pool.get(5, 2, 3)
+        copied = ts_info.copy(out=recycled)
+        self.assertIs(copied, recycled)
+        self.assertIsNot(copied.pos, ts_info.pos)
+        self.assertTrue(np.array_equal(copied.pos, ts_info.pos))
+        self.assertTrue(np.array_equal(copied.quat, ts_info.quat))
+        self.assertTrue(np.array_equal(copied.cab(), ts_info.cab()))
+        self.assertTrue(copied.pos.flags.f_contiguous)
+        # different dimensions, not recycled
+        self.assertEqual(pool.get(6, 2, 3).num_node, 6)
+
+    def test_history_views(self):
+        history = StructTimeStepHistory(5, 2, 3, 4)
+        timestep_info = history.timestep_info()
+        self.assertEqual(len(timestep_info), 4)
+
+        # every step is a contiguous slice, as a standalone timestep
+        for name in ['pos', 'pos_dot', 'psi', 'psi_dot', 'quat', 'for_pos', 'for_vel', 'steady_applied_forces']:
+            self.assertTrue(getattr(timestep_info[2], name).flags.f_contiguous)
+        self.assertEqual(timestep_info[2].pos.shape, (5, 3))
+        self.assertEqual(timestep_info[2].psi.shape, (2, 3, 3))
+
+        # writes in the history arrays are seen by the timesteps
+        history.pos[3, 1, 2] = 1.0
+        history.psi[1, 2, 0, 1] = 0.5
+        self.assertEqual(timestep_info[2].pos[3, 1], 1.0)
+        self.assertTrue(np.allclose(timestep_info[1].cab()[1, 2, :, :],
+                                    algebra.crv2rot(np.array([0.5, 0.0, 0.0]))))
+
+        # and the other way round
+        quat = algebra.euler2quat(np.array([0.1, 0.2, 0.3]))
+        timestep_info[3].update_orientation(quat)
+        self.assertTrue(np.array_equal(history.quat[:, 3], quat))
+
+        # layout of the xbeam dynamic solver, step first
+        pos_history = history.solver_history('pos', 3)
+        self.assertEqual(pos_history.shape, (3, 5, 3))
+        self.assertTrue(pos_history.flags.f_contiguous)
+        self.assertEqual(pos_history[2, 3, 1], 1.0)
+        pos_history[1, 4, 2] = 2.0
+        history.set_solver_history('pos', pos_history)
+        self.assertEqual(timestep_info[1].pos[4, 2], 2.0)
+        self.assertTrue(np.all(timestep_info[3].pos == 0.0))
+
+        copied = timestep_info[2].copy()
+        self.assertFalse(np.shares_memory(copied.pos, history.pos))
+        self.assertTrue(np.array_equal(copied.pos, timestep_info[2].pos))
+
+
+class TestAeroTimeStepInfo(unittest.TestCase):
+    """
+    Tests the aerodynamic timestep storage
+    """
+
+    def test_contiguous_storage(self):
+        dimensions = np.array([[4, 6], [3, 2]], dtype=int)
+        dimensions_star = np.array([[10, 6], [10, 2]], dtype=int)
+        ts_info = AeroTimeStepInfo(dimensions, dimensions_star)
+
+        self.assertEqual(ts_info.zeta[1].shape, (3, 4, 3))
+        self.assertEqual(ts_info.gamma_star[0].shape, (10, 6))
+        self.assertEqual(ts_info.buffers['zeta'].shape, (3, 5*7 + 4*3))
+
+        # the surfaces are views of the same buffer
+        ts_info.zeta[1][2, 3, 1] = 1.0
+        ts_info.gamma[0][:] = 2.0
+        self.assertEqual(ts_info.buffers['zeta'][2, 5*7 + 3*3 + 1], 1.0)
+        self.assertEqual(np.sum(ts_info.buffers['gamma']), 2.0*4*6)
+
+        # the pointers of the native interface point to the views
+        ts_info.generate_ctypes_pointers()
+        for i_surf in range(2):
+            for i_dim in range(6):
+                self.assertEqual(ct.addressof(ts_info.ct_p_forces[i_surf*6 + i_dim].contents),
+                                 ts_info.forces[i_surf][i_dim, :, :].ctypes.data)
+            self.assertEqual(ct.addressof(ts_info.ct_p_gamma_star[i_surf].contents),
+                             ts_info.gamma_star[i_surf].ctypes.data)
+        ts_info.remove_ctypes_pointers()
+
+        copied = ts_info.copy()
+        self.assertTrue(np.array_equal(copied.buffers['zeta'], ts_info.buffers['zeta']))
+        copied.zeta[1][2, 3, 1] = 0.0
+        self.assertEqual(ts_info.zeta[1][2, 3, 1], 1.0)
+
+    def test_resize_wake(self):
+        dimensions = np.array([[4, 6], [3, 2]], dtype=int)
+        dimensions_star = np.array([[10, 6], [10, 2]], dtype=int)
+        ts_info = AeroTimeStepInfo(dimensions, dimensions_star)
+        ts_info.buffers['zeta'][:] = 1.0
+        ts_info.buffers['gamma_star'][:] = 1.0
+
+        ts_info.resize_wake(3)
+        self.assertEqual(ts_info.zeta_star[1].shape, (3, 4, 3))
+        self.assertEqual(ts_info.gamma_star[0].shape, (3, 6))
+        self.assertEqual(ts_info.buffers['u_ext_star'].shape, (3, 4*7 + 4*3))
+        self.assertTrue(np.all(ts_info.buffers['gamma_star'] == 0.0))
+        self.assertTrue(np.all(ts_info.buffers['zeta'] == 1.0))
+        # the dimensions given to the constructor are not modified
+        self.assertEqual(dimensions_star[0, 0], 10)
+
+    def test_update_orientation(self):
+        dimensions = np.array([[4, 6], [3, 2]], dtype=int)
+        ts_info = AeroTimeStepInfo(dimensions, dimensions)
+        np.random.seed(2)
+        ts_info.buffers['zeta'][:] = np.random.randn(*ts_info.buffers['zeta'].shape)
+        zeta = [zeta_surf.copy() for zeta_surf in ts_info.zeta]
+
+        rot = algebra.quat2rot(algebra.euler2quat(np.array([0.1, 0.2, 0.3])))
+        ts_info.update_orientation(rot)
+        for i_surf in range(2):
+            self.assertTrue(np.allclose(ts_info.zeta[i_surf][:, 2, 1], np.dot(rot, zeta[i_surf][:, 2, 1])))
+            self.assertTrue(np.allclose(ts_info.zeta[i_surf], np.einsum('ij,jmn->imn', rot, zeta[i_surf])))
+
+    def test_selective_copy(self):
+        dimensions = np.array([[4, 6], [3, 2]], dtype=int)
+        dimensions_star = np.array([[10, 6], [10, 2]], dtype=int)
+        ts_info = AeroTimeStepInfo(dimensions, dimensions_star)
+        for name in ts_info.buffers:
+            ts_info.buffers[name][:] = 1.0
+
+        pool = TimeStepInfoPool(AeroTimeStepInfo)
+        pool.release(ts_info.copy(fields=list(AeroTimeStepInfo.fields.keys())))
+        recycled = pool.get(dimensions, dimensions_star)
+        ts_info.gamma[1][:] = 3.0
+        copied = ts_info.copy(out=recycled, fields=['gamma', 'zeta'])
+        self.assertIs(copied, recycled)
+        self.assertTrue(np.all(copied.gamma[1] == 3.0))
+        self.assertTrue(np.all(copied.buffers['zeta'] == 1.0))
+        # the rest of the recycled fields are reset
+        self.assertTrue(np.all(copied.buffers['gamma_star'] == 0.0))
+        self.assertTrue(np.all(copied.buffers['forces'] == 0.0))
+
+        with self.assertRaises(ValueError):
+            ts_info.copy(out=AeroTimeStepInfo(dimensions, dimensions))
+
+    def test_pointer_tables_reuse(self):
+        dimensions = np.array([[4, 6], [3, 2]], dtype=int)
+        dimensions_star = np.array([[10, 6], [10, 2]], dtype=int)
+        ts_info = AeroTimeStepInfo(dimensions, dimensions_star)
+
+        ts_info.generate_ctypes_pointers()
+        p_gamma_star = ts_info.ct_p_gamma_star
+        ts_info.generate_ctypes_pointers()
+        self.assertIs(ts_info.ct_p_gamma_star, p_gamma_star)
+
+        # reallocating the buffers rebuilds the tables
+        ts_info.dimensions_star[:, 0] = 20
+        ts_info.allocate(['zeta_star', 'zeta_star_dot', 'u_ext_star', 'gamma_star'])
+        ts_info.generate_ctypes_pointers()
+        self.assertIsNot(ts_info.ct_p_gamma_star, p_gamma_star)
+        self.assertEqual(ts_info.gamma_star[1].shape, (20, 2))
+        self.assertEqual(ct.addressof(ts_info.ct_p_gamma_star[1].contents),
+                         ts_info.gamma_star[1].ctypes.data)
+
+
+class TestAeroTimeStepHistory(unittest.TestCase):
+    """
+    Tests the bounded aerodynamic history
+    """
+
+    @staticmethod
+    def fill_history(history, n_steps):
+        dimensions = np.array([[4, 6], [3, 2]], dtype=int)
+        dimensions_star = np.array([[10, 6], [10, 2]], dtype=int)
+        for i_step in range(n_steps):
+            ts_info = AeroTimeStepInfo(dimensions, dimensions_star)
+            ts_info.buffers['gamma_star'][:] = i_step
+            ts_info.zeta[1][2, 3, 1] = -i_step
+            history.append(ts_info)
+
+    def test_spill(self):
+        released = []
+        with tempfile.TemporaryDirectory() as folder:
+            history = AeroTimeStepHistory('spill', 3, os.path.join(folder, 'history.h5'), release=released.append)
+            self.fill_history(history, 8)
+            self.assertEqual(len(history), 8)
+            self.assertEqual(len(history.in_memory), 3)
+            self.assertEqual(len(released), 5)
+
+            # read back from the file
+            for i_step, ts_info in enumerate(history):
+                self.assertTrue(np.all(ts_info.gamma_star[1] == i_step))
+                self.assertEqual(ts_info.zeta[1][2, 3, 1], -i_step)
+            self.assertEqual(history[-1].zeta[1][2, 3, 1], -7)
+
+            # changes in the timesteps read back are kept
+            history[2].inertial_steady_forces[1, 2] = 5.0
+            history[1].inertial_steady_forces[0, 0] = 1.0
+            self.assertEqual(history[2].inertial_steady_forces[1, 2], 5.0)
+            history.close()
+            self.assertEqual(history[1].inertial_steady_forces[0, 0], 1.0)
+            history.close()
+
+    def test_discard(self):
+        history = AeroTimeStepHistory('discard', 2)
+        self.fill_history(history, 4)
+        self.assertEqual(history[2].zeta[1][2, 3, 1], -2)
+        with self.assertRaises(IndexError):
+            history[1]
+        with self.assertRaises(IndexError):
+            history[4]
@@ -1 +1,4 @@
-from tests.uvlm.uvlm_test import *
\ No newline at end of file
+from tests.uvlm.uvlm_test import *
+from tests.uvlm.pyvlm_test import *
+from tests.uvlm.aerogrid_test import *
+from tests.uvlm.staticuvlm_test import *
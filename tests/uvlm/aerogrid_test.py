@@ -0,0 +1,348 @@
+import h5py as h5
+import numpy as np
+import os
+import scipy.interpolate
+import tempfile
+import unittest
+
+import sharpy.aero.models.aerogrid as aerogrid
+import sharpy.aero.utils.mapping as mapping
+import sharpy.utils.algebra as algebra
+from sharpy.solvers.staticcoupled import StaticCoupled
+from tests.uvlm.wing_model import ModelData, naca_camber, wing_model
+
+
+def list_struct2aero_mapping(aero, structure):
+    """
+    List of dictionaries mapping, as generated by ``Aerogrid.generate_mapping`` before the integer arrays
+    """
+    struct2aero_mapping = [[] for i_node in range(aero.n_node)]
+    nodes_in_surface = [[] for i_surf in range(aero.n_surf)]
+    surf_n_counter = np.zeros((aero.n_surf,), dtype=int)
+    for i_elem in range(aero.n_elem):
+        i_surf = aero.aero_dict['surface_distribution'][i_elem]
+        if i_surf == -1:
+            continue
+        for i_global_node in structure.elements[i_elem].reordered_global_connectivities:
+            if not aero.aero_dict['aero_node'][i_global_node]:
+                continue
+            if i_global_node in nodes_in_surface[i_surf]:
+                continue
+            nodes_in_surface[i_surf].append(i_global_node)
+            surf_n_counter[i_surf] += 1
+            struct2aero_mapping[i_global_node].append({'i_surf': i_surf,
+                                                       'i_n': surf_n_counter[i_surf] - 1})
+    return struct2aero_mapping
+
+
+def list_force_mapping(aero_forces, struct2aero_mapping, zeta, pos_def, psi_def, master, master_elem, cag):
+    """
+    Node by node ``mapping.aero2struct_force_mapping``, with the list of dictionaries mapping
+    """
+    n_node, _ = pos_def.shape
+    struct_forces = np.zeros((n_node, 6))
+    for i_global_node in range(n_node):
+        for entry in struct2aero_mapping[i_global_node]:
+            i_surf = entry['i_surf']
+            i_n = entry['i_n']
+            _, n_m, _ = aero_forces[i_surf].shape
+
+            i_elem, i_local_node = master[i_global_node, :]
+            i_master_elem, master_elem_local_node = master_elem[i_elem, i_local_node, :].astype(dtype=int)
+            if i_master_elem == -1:
+                i_master_elem = i_elem
+                master_elem_local_node = i_local_node
+            cbg = np.dot(algebra.crv2rot(psi_def[i_master_elem, master_elem_local_node, :]).T, cag)
+
+            for i_m in range(n_m):
+                chi_g = zeta[i_surf][:, i_m, i_n] - np.dot(cag.T, pos_def[i_global_node, :])
+                struct_forces[i_global_node, 0:3] += np.dot(cbg, aero_forces[i_surf][0:3, i_m, i_n])
+                struct_forces[i_global_node, 3:6] += np.dot(cbg, aero_forces[i_surf][3:6, i_m, i_n])
+                struct_forces[i_global_node, 3:6] += np.dot(cbg, np.cross(chi_g, aero_forces[i_surf][0:3, i_m, i_n]))
+    return struct_forces
+
+
+def deform(structure, seed):
+    """
+    Random perturbation of the positions and CRVs of the first structural timestep
+    """
+    np.random.seed(seed)
+    ts_info = structure.timestep_info[0]
+    ts_info.pos[:] += 0.05*np.random.randn(*ts_info.pos.shape)
+    ts_info.psi[:] += 0.05*np.random.randn(*ts_info.psi.shape)
+
+
+class TestAerogrid(unittest.TestCase):
+    """
+    Tests the aerodynamic grid generation
+    """
+
+    def test_generate_strips(self):
+        """
+        Tests the batched strip generation against the reference ``generate_strip``
+        :return:
+        """
+        structure, aero = wing_model()
+        np.random.seed(0)
+        n_strips = 6
+        strips_info = dict()
+        strips_info['chord'] = 0.5 + np.random.rand(n_strips)
+        strips_info['eaxis'] = np.random.rand(n_strips)
+        strips_info['twist'] = 0.2*np.random.randn(n_strips)
+        strips_info['twist'][0] = 0.0
+        # cambered and flat airfoils
+        strips_info['airfoil'] = np.array([1, 0, 1, 1, 0, 1])
+        strips_info['beam_coord'] = np.random.randn(n_strips, 3)
+        strips_info['cab'] = algebra.crv2rot_vec(0.5*np.random.randn(n_strips, 3))
+
+        for m_distribution in ['uniform', '1-cos']:
+            for aligned_grid in [True, False]:
+                for orientation in [np.array([1.0, 0.0, 0.0]), np.array([0.8, 0.6, 0.0])]:
+                    strips_info['M'] = 5
+                    strips_info['M_distribution'] = m_distribution
+                    strips = aerogrid.generate_strips(strips_info,
+                                                      aero.airfoil_db,
+                                                      aligned_grid,
+                                                      orientation_in=orientation,
+                                                      camber_cache=aero.camber_cache)
+                    for i_strip in range(n_strips):
+                        node_info = {name: value[i_strip] for name, value in strips_info.items()
+                                     if name not in ['M', 'M_distribution']}
+                        node_info['M'] = strips_info['M']
+                        node_info['M_distribution'] = m_distribution
+                        strip = aerogrid.generate_strip(node_info,
+                                                        aero.airfoil_db,
+                                                        aligned_grid,
+                                                        orientation_in=orientation)
+                        self.assertTrue(np.allclose(strips[:, :, i_strip], strip, rtol=0.0, atol=1e-12))
+
+    def test_mapping(self):
+        """
+        Tests the integer struct to aero mapping against the list of dictionaries one
+        :return:
+        """
+        structure, aero = wing_model()
+        struct2aero_mapping = list_struct2aero_mapping(aero, structure)
+        indptr = aero.struct2aero_mapping['indptr']
+        self.assertEqual(len(indptr), aero.n_node + 1)
+        # the root node is shared by both surfaces
+        self.assertEqual(indptr[1] - indptr[0], 2)
+        for i_node in range(aero.n_node):
+            entries = range(indptr[i_node], indptr[i_node + 1])
+            self.assertEqual([(aero.struct2aero_mapping['i_surf'][i], aero.struct2aero_mapping['i_n'][i])
+                              for i in entries],
+                             [(entry['i_surf'], entry['i_n']) for entry in struct2aero_mapping[i_node]])
+            self.assertTrue(np.all(aero.struct2aero_mapping['i_node'][entries] == i_node))
+
+            # master element of the strips: first appearance of the node, in local ordering
+            first = [(i_elem, i_local_node) for i_elem in range(aero.n_elem)
+                     for i_local_node in structure.elements[i_elem].ordering
+                     if structure.elements[i_elem].global_connectivities[i_local_node] == i_node][0]
+            master_elem, master_elem_node = structure.master[first[0], first[1], :].astype(dtype=int)
+            if master_elem < 0:
+                master_elem, master_elem_node = first
+            self.assertTrue(np.all(aero.struct2aero_mapping['master_elem'][entries] == master_elem))
+            self.assertTrue(np.all(aero.struct2aero_mapping['master_elem_node'][entries] == master_elem_node))
+
+        for i_surf in range(aero.n_surf):
+            for i_n, i_node in enumerate(aero.aero2struct_mapping[i_surf]):
+                self.assertIn({'i_surf': i_surf, 'i_n': i_n}, struct2aero_mapping[i_node])
+
+        # mapped forces on a deformed wing
+        deform(structure, 1)
+        aero.generate_zeta(structure, aero.aero_settings, 0)
+        ts_info = aero.timestep_info[0]
+        ts_info.buffers['forces'][:] = np.random.randn(*ts_info.buffers['forces'].shape)
+        cag = algebra.euler2rot(np.array([0.1, 0.2, -0.3]))
+        struct_forces = mapping.aero2struct_force_mapping(ts_info.forces,
+                                                          aero.struct2aero_mapping,
+                                                          ts_info.zeta,
+                                                          structure.timestep_info[0].pos,
+                                                          structure.timestep_info[0].psi,
+                                                          structure.node_master_elem,
+                                                          structure.master,
+                                                          cag)
+        reference = list_force_mapping(ts_info.forces,
+                                       struct2aero_mapping,
+                                       ts_info.zeta,
+                                       structure.timestep_info[0].pos,
+                                       structure.timestep_info[0].psi,
+                                       structure.node_master_elem,
+                                       structure.master,
+                                       cag)
+        self.assertTrue(np.allclose(struct_forces, reference))
+
+    def test_force_operator(self):
+        """
+        Tests the sparse force operator against the direct force mapping
+        :return:
+        """
+        structure, aero = wing_model()
+        deform(structure, 2)
+        aero.generate_zeta(structure, aero.aero_settings, 0)
+        ts_info = aero.timestep_info[0]
+        struct_tstep = structure.timestep_info[0]
+        cag = algebra.euler2rot(np.array([-0.2, 0.1, 0.3]))
+        operator = mapping.aero2struct_force_operator(aero.struct2aero_mapping,
+                                                      ts_info.zeta,
+                                                      struct_tstep.pos,
+                                                      struct_tstep.psi,
+                                                      structure.node_master_elem,
+                                                      structure.master,
+                                                      cag,
+                                                      cab=struct_tstep.cab())
+        self.assertEqual(operator.shape, (6*aero.n_node, ts_info.buffers['forces'].size))
+
+        # the same operator for several sets of forces
+        for i_forces in range(3):
+            ts_info.buffers['forces'][:] = np.random.randn(*ts_info.buffers['forces'].shape)
+            struct_forces = operator.dot(ts_info.buffers['forces'].reshape(-1)).reshape((aero.n_node, 6))
+            reference = mapping.aero2struct_force_mapping(ts_info.forces,
+                                                          aero.struct2aero_mapping,
+                                                          ts_info.zeta,
+                                                          struct_tstep.pos,
+                                                          struct_tstep.psi,
+                                                          structure.node_master_elem,
+                                                          structure.master,
+                                                          cag)
+            self.assertTrue(np.allclose(struct_forces, reference, rtol=1e-12, atol=1e-12))
+
+        # StaticCoupled only assembles it again when the geometry changes
+        coupled = StaticCoupled()
+        coupled.data = ModelData(structure, aero)
+        operator = coupled.force_operator_update()
+        self.assertIs(coupled.force_operator_update(), operator)
+        struct_tstep.quat[:] = algebra.euler2quat(np.array([0.0, 0.1, 0.0]))
+        self.assertIsNot(coupled.force_operator_update(), operator)
+        operator = coupled.force_operator_update()
+        ts_info.buffers['zeta'][2, 0] += 0.01
+        self.assertIsNot(coupled.force_operator_update(), operator)
+
+    def test_displacement_operator(self):
+        """
+        Tests the linearised displacement transfer against the variation of the grid
+        generated by ``generate_zeta`` for small structural perturbations
+        :return:
+        """
+        structure, aero = wing_model()
+        deform(structure, 4)
+        aero.generate_zeta(structure, aero.aero_settings, 0)
+        aero.linearise_zeta(structure, 0)
+        ts_info = structure.timestep_info[0]
+        zeta = aero.timestep_info[0].buffers['zeta']
+        zeta_ref = zeta.copy()
+        pos_ref = ts_info.pos.copy()
+        psi_ref = ts_info.psi.copy()
+        # the operator acts on the CRV of the master element of every node
+        master_elem = aero.struct2aero_mapping['master_elem']
+        master_elem_node = aero.struct2aero_mapping['master_elem_node']
+        i_node = aero.struct2aero_mapping['i_node']
+
+        np.random.seed(5)
+        direction = np.random.randn(aero.n_node, 6)
+        error = []
+        for delta in [1e-3, 1e-4]:
+            ts_info.pos[:] = pos_ref + delta*direction[:, 0:3]
+            ts_info.psi[:] = psi_ref
+            ts_info.psi[master_elem, master_elem_node, :] += delta*direction[i_node, 3:6]
+            aero.generate_zeta(structure, aero.aero_settings, 0)
+            delta_zeta = zeta - zeta_ref
+            linear_delta_zeta = aero.zeta_operator.dot(delta*direction.reshape(-1)).reshape((3, -1))
+            error.append(np.max(np.abs(delta_zeta - linear_delta_zeta)))
+            self.assertLess(error[-1], 1e-2*np.max(np.abs(delta_zeta)))
+
+            # the same update through generate_zeta_linear
+            aero.generate_zeta_linear(structure, 0)
+            self.assertTrue(np.allclose(zeta, zeta_ref + linear_delta_zeta, rtol=0.0, atol=1e-12))
+        # second order error
+        self.assertGreater(error[0]/error[1], 50.0)
+
+    def test_camber_cache(self):
+        """
+        Tests the reuse of the stored camber lines and their invalidation
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, 'camber.h5')
+            structure, aero = wing_model({'camber_cache_file': file_name})
+            with h5.File(file_name, 'r') as file_handle:
+                self.assertEqual(len(file_handle), 2)
+
+            # a second load takes the camber lines from the file, the interpolators are not used
+            airfoils = aero.aero_dict['airfoils']
+            cache = aerogrid.CamberCache(dict(), airfoils, file_name)
+            for airfoil in [0, 1]:
+                self.assertTrue(np.array_equal(cache.get(airfoil, 4, 'uniform'),
+                                               aero.camber_cache.get(airfoil, 4, 'uniform')))
+            self.assertFalse(cache.modified)
+
+            # a modified airfoil is evaluated again
+            airfoils = dict(airfoils)
+            airfoils['1'] = naca_camber(2, 4)
+            airfoil_db = {1: scipy.interpolate.interp1d(airfoils['1'][:, 0], airfoils['1'][:, 1], kind='quadratic')}
+            cache = aerogrid.CamberCache(airfoil_db, airfoils, file_name)
+            camber = cache.get(1, 4, 'uniform')
+            self.assertTrue(cache.modified)
+            self.assertTrue(np.allclose(camber, airfoil_db[1](aerogrid.chordwise_distribution(4, 'uniform'))))
+            self.assertFalse(np.allclose(camber, aero.camber_cache.get(1, 4, 'uniform')))
+            self.assertTrue(np.array_equal(cache.get(0, 4, 'uniform'), aero.camber_cache.get(0, 4, 'uniform')))
+
+            # both versions are kept in the file
+            cache.save()
+            with h5.File(file_name, 'r') as file_handle:
+                self.assertEqual(len(file_handle), 3)
+
+    def test_dirty_regeneration(self):
+        """
+        Tests that only the strips of the nodes that have moved are regenerated
+        :return:
+        """
+        structure, aero = wing_model({'regeneration_pos_tolerance': 1e-3,
+                                      'regeneration_psi_tolerance': 1e-3})
+        n_strips = len(aero.struct2aero_mapping['i_node'])
+        self.assertEqual(aero.n_regenerated_strips, n_strips)
+        ts_info = structure.timestep_info[0]
+        zeta = aero.timestep_info[0].buffers['zeta']
+
+        def full_regeneration():
+            # grid of the current deformation generated from scratch
+            reference_structure, reference_aero = wing_model()
+            reference_structure.timestep_info[0].pos[:] = ts_info.pos
+            reference_structure.timestep_info[0].psi[:] = ts_info.psi
+            reference_aero.generate_zeta(reference_structure, reference_aero.aero_settings, 0)
+            return reference_aero.timestep_info[0].buffers['zeta']
+
+        # nothing has changed
+        self.assertEqual(aero.generate_zeta(structure, aero.aero_settings, 0), 0)
+
+        # a tip node, a single strip
+        i_node = 3
+        i_entry = aero.struct2aero_mapping['indptr'][i_node]
+        i_surf = aero.struct2aero_mapping['i_surf'][i_entry]
+        i_n = aero.struct2aero_mapping['i_n'][i_entry]
+        previous = [zeta_surf.copy() for zeta_surf in aero.timestep_info[0].zeta]
+        ts_info.pos[i_node, :] += np.array([0.0, 0.0, 0.1])
+        self.assertEqual(aero.generate_zeta(structure, aero.aero_settings, 0), 1)
+        changed = np.any(aero.timestep_info[0].zeta[i_surf] != previous[i_surf], axis=(0, 1))
+        self.assertEqual(list(np.flatnonzero(changed)), [i_n])
+        self.assertTrue(np.array_equal(zeta, full_regeneration()))
+
+        # movements below the tolerances are ignored
+        ts_info.pos[i_node, :] += np.array([0.0, 5e-4, 0.0])
+        self.assertEqual(aero.generate_zeta(structure, aero.aero_settings, 0), 0)
+        self.assertFalse(np.allclose(zeta, full_regeneration(), rtol=0.0, atol=1e-5))
+
+        # the root node has a strip in every surface
+        master_elem = aero.struct2aero_mapping['master_elem'][0]
+        master_elem_node = aero.struct2aero_mapping['master_elem_node'][0]
+        previous = [zeta_surf.copy() for zeta_surf in aero.timestep_info[0].zeta]
+        ts_info.psi[master_elem, master_elem_node, :] += np.array([0.0, 0.05, 0.0])
+        self.assertEqual(aero.generate_zeta(structure, aero.aero_settings, 0), 2)
+        self.assertEqual(aero.n_regenerated_strips, 2)
+        changed = [np.flatnonzero(np.any(aero.timestep_info[0].zeta[i_surf] != previous[i_surf], axis=(0, 1)))
+                   for i_surf in range(aero.n_surf)]
+        for i_entry in range(2):
+            self.assertEqual(list(changed[aero.struct2aero_mapping['i_surf'][i_entry]]),
+                             [aero.struct2aero_mapping['i_n'][i_entry]])
+        # the strip of the node moved below the tolerance is kept
+        self.assertFalse(np.allclose(zeta, full_regeneration(), rtol=0.0, atol=1e-5))
@@ -0,0 +1,549 @@
+import numpy as np
+import scipy.sparse
+import unittest
+
+import sharpy.aero.utils.pyvlm as pyvlm
+import sharpy.utils.algebra as algebra
+import sharpy.utils.settings as settings
+from sharpy.solvers.staticuvlm import StaticUvlm
+from sharpy.utils.datastructures import AeroTimeStepInfo
+
+
+def vlm_settings(in_settings=None):
+    """
+    ``StaticUvlm`` settings read by ``pyvlm``, with the defaults of the solver
+    (dense AIC and direct solve) and a horseshoe wake
+    """
+    out_settings = {'horseshoe': True,
+                    'n_rollup': 0,
+                    'velocity_field_input': dict()}
+    out_settings.update(in_settings or {})
+    solver = StaticUvlm()
+    settings.to_custom_types(out_settings, solver.settings_types, solver.settings_default)
+    return out_settings
+
+
+def lifting_surfaces(surfaces, u_inf, m_star=1):
+    """
+    Flat lifting surfaces in a free stream along ``x``
+
+    :param surfaces: ``(m, n, chord, span, alpha, x_le, z_le)`` of every surface
+    :param u_inf: free stream velocity
+    :param m_star: number of wake rows
+    """
+    dimensions = np.array([surface[0:2] for surface in surfaces], dtype=int)
+    dimensions_star = dimensions.copy()
+    dimensions_star[:, 0] = m_star
+    ts_info = AeroTimeStepInfo(dimensions, dimensions_star)
+    for i_surf, (m, n, chord, span, alpha, x_le, z_le) in enumerate(surfaces):
+        x, y = np.meshgrid(np.linspace(0, chord, m + 1), np.linspace(-0.5*span, 0.5*span, n + 1), indexing='ij')
+        ts_info.zeta[i_surf][0, :, :] = x_le + x*np.cos(alpha)
+        ts_info.zeta[i_surf][1, :, :] = y
+        ts_info.zeta[i_surf][2, :, :] = z_le - x*np.sin(alpha)
+        ts_info.u_ext[i_surf][0, :, :] = u_inf
+    return ts_info
+
+
+def dense_solve(ts_info, in_settings=None):
+    """
+    Copy of ``ts_info`` solved with the dense AIC and a direct solve
+    """
+    reference = ts_info.copy()
+    pyvlm.vlm_solver(reference, vlm_settings(in_settings))
+    return reference
+
+
+class TestPyVlmBackend(unittest.TestCase):
+    """
+    Tests the kernels and the dense solution of the python backend of StaticUvlm
+    """
+
+    def setUp(self):
+        self.chord, self.span, self.alpha, self.u_inf = 1.0, 20.0, 5.0*np.pi/180, 10.0
+        self.ts_info = lifting_surfaces([(4, 30, self.chord, self.span, self.alpha, 0.0, 0.0)], self.u_inf)
+
+    def test_biot_savart(self):
+        """
+        Tests the induced velocities of the segments against closed form values
+        :return:
+        """
+        # centre of a square ring of unit circulation: 2*sqrt(2)/(pi*side)
+        side = 2.0
+        corners = np.array([[0, 0, 0], [side, 0, 0], [side, side, 0], [0, side, 0]], dtype=float)
+        velocities = pyvlm.biot_savart_segments(np.array([[0.5*side, 0.5*side, 0]]),
+                                                corners,
+                                                np.roll(corners, -1, axis=0))
+        velocity = np.array([np.sum(velocities[i_dim]) for i_dim in range(3)])
+        self.assertTrue(np.allclose(velocity, [0, 0, 2.0*np.sqrt(2.0)/(np.pi*side)]))
+
+        # semi-infinite segment against a very long one
+        np.random.seed(1)
+        targets = np.random.randn(10, 3)
+        seg_a = np.random.randn(4, 3)
+        direction = np.array([1.0, 0.0, 0.0])
+        semi_infinite = pyvlm.biot_savart_semi_infinite(targets, seg_a, direction)
+        finite = pyvlm.biot_savart_segments(targets, seg_a, seg_a + 1e7*direction)
+        for i_dim in range(3):
+            self.assertTrue(np.allclose(semi_infinite[i_dim], finite[i_dim], atol=1e-10))
+
+    def test_flat_plate(self):
+        """
+        Tests the lift of a high aspect ratio flat plate against lifting line theory
+        :return:
+        """
+        pyvlm.vlm_solver(self.ts_info, vlm_settings())
+
+        # lift close to lifting line theory, no side force, symmetric circulation
+        lift = np.sum(self.ts_info.forces[0][2, :, :])
+        aspect_ratio = self.span/self.chord
+        cl = lift/(0.5*1.225*self.u_inf**2*self.chord*self.span)
+        cl_lifting_line = 2.0*np.pi*self.alpha*aspect_ratio/(aspect_ratio + 2.0)
+        self.assertLess(abs(cl - cl_lifting_line)/cl_lifting_line, 0.05)
+        self.assertAlmostEqual(np.sum(self.ts_info.forces[0][1, :, :]), 0.0)
+        self.assertTrue(np.allclose(self.ts_info.gamma[0], self.ts_info.gamma[0][:, ::-1]))
+        self.assertTrue(np.allclose(self.ts_info.gamma_star[0][0, :], self.ts_info.gamma[0][-1, :]))
+
+    def test_chunked_assembly(self):
+        """
+        Tests that the assembly in chunks of ``aic_chunk_size`` pairs does not change the solution
+        :return:
+        """
+        reference = dense_solve(self.ts_info)
+        pyvlm.vlm_solver(self.ts_info, vlm_settings({'aic_chunk_size': 100}))
+        self.assertTrue(np.allclose(self.ts_info.buffers['gamma'], reference.buffers['gamma'], rtol=1e-12))
+        self.assertTrue(np.allclose(self.ts_info.buffers['forces'], reference.buffers['forces'], rtol=1e-12))
+
+
+class TestAicReuse(unittest.TestCase):
+    """
+    Tests the reuse of the factorised AIC between the iterations of a coupled solution
+    """
+
+    def setUp(self):
+        self.ts_info = lifting_surfaces([(4, 30, 1.0, 20.0, 5.0*np.pi/180, 0.0, 0.0)], 10.0)
+        # bending of the wing between two coupling iterations
+        self.bending = np.zeros_like(self.ts_info.buffers['zeta'])
+        self.bending[2, :] = 5e-4*self.ts_info.buffers['zeta'][1, :]**2
+
+    def test_aic_reuse(self):
+        """
+        Tests the solution with the previous factorisation against the dense direct solve of the bent wing
+        :return:
+        """
+        bent = self.ts_info.copy()
+        bent.buffers['zeta'] += self.bending
+        reference = dense_solve(bent)
+
+        for aic_reuse, tolerance in [('direct', 1e-2), ('preconditioner', 1e-8)]:
+            options = vlm_settings({'aic_reuse': aic_reuse,
+                                    'aic_reuse_tolerance': 0.1,
+                                    'iterative_tol': 1e-10})
+            factorisation = pyvlm.AicFactorisation()
+            ts_info = self.ts_info.copy()
+            pyvlm.vlm_solver(ts_info, options, factorisation)
+            ts_info.buffers['zeta'] += self.bending
+            pyvlm.vlm_solver(ts_info, options, factorisation)
+            self.assertEqual(factorisation.n_factorisations, 1)
+            self.assertEqual(factorisation.n_reuses, 1)
+            if aic_reuse == 'direct':
+                # approximate: the AIC of the previous iteration is used
+                self.assertFalse(np.allclose(ts_info.buffers['gamma'], reference.buffers['gamma'], rtol=1e-6))
+            self.assertTrue(np.allclose(ts_info.buffers['gamma'], reference.buffers['gamma'], rtol=tolerance))
+
+            # displacements over the tolerance refactorise
+            ts_info.buffers['zeta'] += 10.0*self.bending
+            pyvlm.vlm_solver(ts_info, options, factorisation)
+            self.assertEqual(factorisation.n_factorisations, 2)
+            self.assertTrue(np.allclose(ts_info.buffers['gamma'], dense_solve(ts_info).buffers['gamma'], rtol=1e-12))
+
+
+class TestVlmSweep(unittest.TestCase):
+    """
+    Tests the multiple right hand side solution of several flight conditions
+    """
+
+    def setUp(self):
+        self.u_inf = 10.0
+        # wing and tail, with a different incidence
+        self.ts_info = lifting_surfaces([(4, 30, 1.0, 20.0, 5.0*np.pi/180, 0.0, 0.0),
+                                         (3, 10, 0.6, 6.0, -2.0*np.pi/180, 6.0, 0.5)], self.u_inf)
+
+    def test_sweep(self):
+        """
+        Tests the forces of every condition against the dense direct solve of the condition
+        :return:
+        """
+        conditions = [(self.u_inf, 0.0), (2.0*self.u_inf, 0.0), (self.u_inf, 1.0*np.pi/180)]
+        u_sweep = np.array([[speed*np.cos(incidence), 0.0, speed*np.sin(incidence)]
+                            for speed, incidence in conditions])
+        gamma, forces = pyvlm.vlm_sweep(self.ts_info, vlm_settings(), u_sweep)
+
+        for i_cond, (speed, incidence) in enumerate(conditions):
+            ts_info = self.ts_info.copy()
+            ts_info.buffers['u_ext'][:] = u_sweep[i_cond, :, None]
+            reference = dense_solve(ts_info)
+            if incidence == 0.0:
+                # same wake as the sweep
+                self.assertTrue(np.allclose(gamma[:, i_cond], reference.buffers['gamma'], rtol=1e-10))
+                self.assertTrue(np.allclose(forces[i_cond], reference.buffers['forces'][0:3, :],
+                                            rtol=1e-10, atol=1e-10*np.max(np.abs(forces[i_cond]))))
+            else:
+                # the wake of the sweep is not aligned with the free stream
+                lift = np.sum(forces[i_cond][2, :])
+                self.assertLess(abs(lift/np.sum(reference.buffers['forces'][2, :]) - 1.0), 1e-2)
+
+
+class TestTreeVelocity(unittest.TestCase):
+    """
+    Tests the tree-code induced velocities, the matrix-free solution and the rollup that use them
+    """
+
+    def setUp(self):
+        self.u_inf = 10.0
+        # large enough for most of the interactions to be evaluated with the far field expansions
+        self.surfaces = [(8, 120, 1.0, 24.0, 5.0*np.pi/180, 0.0, 0.0)]
+        self.ts_info = lifting_surfaces(self.surfaces, self.u_inf)
+        self.theta = 0.3
+        self.leaf_size = 16
+
+    def test_tree_velocity(self):
+        """
+        Tests the tree-code velocities induced by a wavy sheet of vortex rings against the direct evaluation
+        :return:
+        """
+        m, n = 20, 30
+        x, y = np.meshgrid(np.linspace(0, 10, m + 1), np.linspace(-5, 5, n + 1), indexing='ij')
+        zeta = np.stack((x, y, 0.5*np.sin(x)*np.cos(y)))
+        seg_a, seg_b, circulation, _ = pyvlm.grid_segments(zeta, scipy.sparse.identity(m*n, format='csr'))
+        lattice = pyvlm.Lattice(m*n)
+        lattice.add_finite(seg_a, seg_b, circulation)
+        np.random.seed(2)
+        gamma = 1.0 + np.random.rand(m*n)
+        targets = zeta[:, :-1, :].reshape((3, -1)).T + 0.05
+
+        direct = lattice.induced_velocity(targets, gamma)
+        self.assertTrue(np.allclose(lattice.induced_velocity(targets, gamma, theta=1e-6), direct))
+        error = [np.max(np.abs(lattice.induced_velocity(targets, gamma, theta=theta, leaf_size=self.leaf_size) -
+                               direct))
+                 for theta in [0.2, 0.5]]
+        self.assertLess(error[0], 1e-3*np.max(np.abs(direct)))
+        self.assertLess(error[0], error[1])
+
+    def test_matrix_free(self):
+        """
+        Tests the matrix-free solution against the dense direct solve
+        :return:
+        """
+        reference = dense_solve(self.ts_info)
+
+        # the bound lattice is large enough for the far field to matter
+        centres, normals, _ = pyvlm.collocation(reference)
+        tree = pyvlm.TreeVelocity(pyvlm.bound_lattice(reference), centres, self.theta, self.leaf_size)
+        n_pairs = centres.shape[0]*tree.lattice.finite_a.shape[0]
+        self.assertGreater(tree.interactions.n_far, 0)
+        self.assertLess(tree.interactions.n_near, 0.5*n_pairs)
+
+        # exact without the far field
+        for theta, tolerance in [(0.0, 1e-8), (self.theta, 1e-2)]:
+            ts_info = self.ts_info.copy()
+            pyvlm.vlm_solver(ts_info, vlm_settings({'matrix_free': True,
+                                                    'tree_theta': theta,
+                                                    'tree_leaf_size': self.leaf_size,
+                                                    'iterative_tol': 1e-10}))
+            self.assertTrue(np.allclose(ts_info.buffers['gamma'], reference.buffers['gamma'], rtol=tolerance,
+                                        atol=tolerance*np.max(np.abs(reference.buffers['gamma']))))
+
+    def test_rollup(self):
+        """
+        Tests the wake rollup with the tree-code against the one with the direct evaluation
+        :return:
+        """
+        rollup_settings = {'horseshoe': False,
+                           'n_rollup': 3,
+                           'rollup_dt': 0.1,
+                           'rollup_tolerance': 0.0}
+        ts_info = lifting_surfaces(self.surfaces, self.u_inf, m_star=10)
+        reference = dense_solve(ts_info, rollup_settings)
+        rollup_settings.update({'tree_theta': self.theta,
+                                'tree_leaf_size': self.leaf_size})
+        pyvlm.vlm_solver(ts_info, vlm_settings(rollup_settings))
+
+        self.assertFalse(np.array_equal(ts_info.buffers['zeta_star'], reference.buffers['zeta_star']))
+        self.assertTrue(np.allclose(ts_info.buffers['zeta_star'], reference.buffers['zeta_star'],
+                                    rtol=0.0, atol=1e-2*np.max(np.abs(reference.buffers['zeta_star'][2, :]))))
+        lift = np.sum(ts_info.buffers['forces'][2, :])
+        self.assertLess(abs(lift/np.sum(reference.buffers['forces'][2, :]) - 1.0), 1e-3)
+
+
+class TestLowRankAic(unittest.TestCase):
+    """
+    Tests the AIC with compressed blocks between well separated surfaces
+    """
+
+    def setUp(self):
+        self.u_inf = 10.0
+        self.wing = (4, 60, 1.0, 20.0, 0.05, 0.0, 0.0)
+        # tail far downstream of the wing
+        self.ts_info = lifting_surfaces([self.wing, (4, 20, 0.6, 6.0, 0.05, 8.0, 1.0)], self.u_inf)
+        self.options = vlm_settings({'aic_lowrank': True,
+                                     'aic_lowrank_tolerance': 1e-8,
+                                     'iterative_tol': 1e-10})
+
+    def block_aic(self, ts_info):
+        centres, normals, _ = pyvlm.collocation(ts_info)
+        lattices = [pyvlm.bound_lattice(ts_info), pyvlm.wake_lattice(ts_info, True, np.array([1.0, 0.0, 0.0]))]
+        dense = sum(lattice.influence(centres, normals) for lattice in lattices)
+        return pyvlm.block_aic(ts_info, lattices, centres, normals, self.options), dense
+
+    def test_lowrank(self):
+        """
+        Tests the compressed AIC and its solution against the dense AIC and the dense direct solve
+        :return:
+        """
+        reference = dense_solve(self.ts_info)
+        pyvlm.vlm_solver(self.ts_info, self.options)
+        self.assertTrue(np.allclose(self.ts_info.buffers['gamma'], reference.buffers['gamma'], rtol=1e-6))
+
+        aic, dense = self.block_aic(self.ts_info)
+        self.assertTrue(aic.is_low_rank(0, 1) and aic.is_low_rank(1, 0))
+        self.assertFalse(aic.is_low_rank(0, 0) or aic.is_low_rank(1, 1))
+        self.assertLess(aic.n_entries, aic.shape[0]**2)
+        self.assertTrue(np.allclose(aic.todense(), dense, rtol=0.0, atol=1e-6*np.max(np.abs(dense))))
+
+    def test_admissibility(self):
+        """
+        Tests that the blocks of surfaces that are not well separated are not compressed
+        :return:
+        """
+        # flap right behind the wing
+        ts_info = lifting_surfaces([self.wing, (2, 60, 0.3, 20.0, 0.2, 1.05, -0.05)], self.u_inf)
+        aic, dense = self.block_aic(ts_info)
+        self.assertFalse(aic.is_low_rank(0, 1) or aic.is_low_rank(1, 0))
+        self.assertTrue(np.allclose(aic.todense(), dense, rtol=1e-12, atol=0.0))
+
+        reference = dense_solve(ts_info)
+        pyvlm.vlm_solver(ts_info, self.options)
+        self.assertTrue(np.allclose(ts_info.buffers['gamma'], reference.buffers['gamma'], rtol=1e-6))
+
+
+class TestBoundAicCache(unittest.TestCase):
+    """
+    Tests the reuse of the bound on bound AIC while the grid only moves as a rigid body
+    """
+
+    def setUp(self):
+        # cambered wing with dihedral and a free wake, so that the rigid motion changes the wake part of the AIC
+        self.ts_info = lifting_surfaces([(4, 20, 1.0, 10.0, 0.05, 0.0, 0.0)], 10.0, m_star=8)
+        zeta = self.ts_info.zeta[0]
+        zeta[2, :, :] += 0.05*np.sin(np.pi*zeta[0, :, :]) + 0.1*np.abs(zeta[1, :, :])
+        self.wake_settings = {'horseshoe': False}
+        self.options = vlm_settings({'horseshoe': False,
+                                     'aic_rigid_reuse': True,
+                                     'aic_rigid_tolerance': 1e-6})
+        self.rotation = algebra.rotation3d_y(2.0*np.pi/180).dot(algebra.rotation3d_z(10.0*np.pi/180))
+        self.translation = np.array([[1.0], [-2.0], [0.5]])
+
+    def test_rigid_reuse(self):
+        """
+        Tests the solution of the rigidly moved grid with the cached AIC against the dense direct solve
+        :return:
+        """
+        cache = pyvlm.BoundAicCache()
+        pyvlm.vlm_solver(self.ts_info, self.options, bound_cache=cache)
+
+        # rigid motion of the grid, with the free stream fixed
+        moved = self.ts_info.copy()
+        moved.buffers['zeta'][:] = self.rotation.dot(moved.buffers['zeta']) + self.translation
+        reference = dense_solve(moved, self.wake_settings)
+        pyvlm.vlm_solver(moved, self.options, bound_cache=cache)
+        self.assertEqual(cache.n_assemblies, 1)
+        self.assertEqual(cache.n_reuses, 1)
+        self.assertTrue(np.allclose(moved.buffers['gamma'], reference.buffers['gamma'], rtol=1e-10))
+        self.assertTrue(np.allclose(moved.buffers['forces'], reference.buffers['forces'],
+                                    rtol=1e-10, atol=1e-10*np.max(np.abs(reference.buffers['forces']))))
+
+        # deformations over the tolerance assemble it again
+        moved.buffers['zeta'][2, :] += 1e-3*moved.buffers['zeta'][1, :]**2
+        reference = dense_solve(moved, self.wake_settings)
+        pyvlm.vlm_solver(moved, self.options, bound_cache=cache)
+        self.assertEqual(cache.n_assemblies, 2)
+        self.assertTrue(np.allclose(moved.buffers['gamma'], reference.buffers['gamma'], rtol=1e-10))
+
+    def test_reflection(self):
+        """
+        Tests that a reflected grid is not taken as a rigid motion
+        :return:
+        """
+        cache = pyvlm.BoundAicCache()
+        pyvlm.vlm_solver(self.ts_info, self.options, bound_cache=cache)
+        reflected = self.ts_info.copy()
+        reflected.buffers['zeta'][2, :] *= -1.0
+        self.assertGreater(cache.deformation(reflected.buffers['zeta']), 1e-2)
+        pyvlm.vlm_solver(reflected, self.options, bound_cache=cache)
+        self.assertEqual(cache.n_assemblies, 2)
+        self.assertEqual(cache.n_reuses, 0)
+
+
+class TestSymmetry(unittest.TestCase):
+    """
+    Tests the half models solved with the image method
+    """
+
+    def setUp(self):
+        # swept wing, where the interaction of both halves matters
+        m, self.n = 4, 30
+        self.full = lifting_surfaces([(m, self.n, 1.0, 12.0, 5.0*np.pi/180, 0.0, 0.0)], 10.0)
+        zeta = self.full.zeta[0]
+        zeta[0, :, :] += 0.5*np.abs(zeta[1, :, :])
+        # half (y >= 0) of the wing
+        self.half = AeroTimeStepInfo(np.array([[m, self.n//2]], dtype=int), np.array([[1, self.n//2]], dtype=int))
+        self.half.zeta[0][:] = self.full.zeta[0][:, :, self.n//2:]
+        self.half.u_ext[0][:] = self.full.u_ext[0][:, :, self.n//2:]
+
+    def test_symmetry(self):
+        """
+        Tests the half model against the dense direct solve of the full one
+        :return:
+        """
+        reference = dense_solve(self.full)
+        pyvlm.vlm_solver(self.half, vlm_settings(), symmetry=True)
+        self.assertTrue(np.allclose(self.half.gamma[0], reference.gamma[0][:, self.n//2:], rtol=1e-10))
+        self.assertTrue(np.allclose(2.0*np.sum(self.half.forces[0][[0, 2], :, :], axis=(1, 2)),
+                                    np.sum(reference.forces[0][[0, 2], :, :], axis=(1, 2)), rtol=1e-10))
+
+        # without the image, the half wing is a different (lower aspect ratio) wing
+        alone = dense_solve(self.half)
+        self.assertLess(np.sum(alone.forces[0][2, :, :]), 0.95*np.sum(self.half.forces[0][2, :, :]))
+
+
+class TestWakeSpacing(unittest.TestCase):
+    """
+    Tests the stretched wakes and the ones given by the distances of their rows
+    """
+
+    def setUp(self):
+        self.u_inf = 10.0
+        self.surfaces = [(4, 20, 1.0, 8.0, 5.0*np.pi/180, 0.0, 0.0)]
+        self.rollup_settings = {'horseshoe': False,
+                                'n_rollup': 5,
+                                'rollup_dt': 0.1,
+                                'rollup_tolerance': 1e-6}
+
+    def test_wake_intervals(self):
+        """
+        Tests the distances of the wake rows to the trailing edge
+        :return:
+        """
+        m_star = 6
+        ts_info = lifting_surfaces(self.surfaces, self.u_inf, m_star=m_star)
+        u_inf = np.array([self.u_inf, 0.0, 0.0])
+        trailing_edge = ts_info.zeta[0][0, -1, 0]
+
+        # panel lengths growing geometrically
+        pyvlm.generate_wake(ts_info, u_inf, 0.01, stretching=1.5)
+        lengths = np.diff(ts_info.zeta_star[0][0, :, 0])
+        self.assertTrue(np.allclose(lengths, 0.1*1.5**np.arange(m_star)))
+
+        # rows at the given stations
+        stations = np.array([0.1, 0.3, 0.6, 1.0, 2.0, 4.0])
+        pyvlm.generate_wake(ts_info, u_inf, 0.01, stations=stations)
+        self.assertTrue(np.allclose(ts_info.zeta_star[0][0, 1:, :], trailing_edge + stations[:, None]))
+        with self.assertRaises(ValueError):
+            pyvlm.generate_wake(ts_info, u_inf, 0.01, stations=stations[1:])
+
+    def test_stretched_wake(self):
+        """
+        Tests the rolled up solution with a short stretched wake against the dense direct solve with
+        a long uniform one
+        :return:
+        """
+        reference = dense_solve(lifting_surfaces(self.surfaces, self.u_inf, m_star=60), self.rollup_settings)
+        lift = np.sum(reference.buffers['forces'][2, :])
+
+        # a uniform wake of the same number of rows is too short
+        uniform = dense_solve(lifting_surfaces(self.surfaces, self.u_inf, m_star=10), self.rollup_settings)
+        self.assertGreater(abs(np.sum(uniform.buffers['forces'][2, :])/lift - 1.0), 5e-3)
+
+        stretching = 1.35
+        stations = 0.1*self.u_inf*np.cumsum(stretching**np.arange(10))
+        for wake_settings in [{'wake_stretching': stretching}, {'wake_stations': stations}]:
+            options = dict(self.rollup_settings)
+            options.update(wake_settings)
+            ts_info = lifting_surfaces(self.surfaces, self.u_inf, m_star=10)
+            pyvlm.vlm_solver(ts_info, vlm_settings(options))
+            self.assertLess(abs(np.sum(ts_info.buffers['forces'][2, :])/lift - 1.0), 5e-4)
+
+
+class TestWakeAgglomeration(unittest.TestCase):
+    """
+    Tests the agglomeration of the far wake rows
+    """
+
+    def setUp(self):
+        self.u_inf = 10.0
+        self.surfaces = [(4, 20, 1.0, 8.0, 5.0*np.pi/180, 0.0, 0.0)]
+        self.rollup_settings = {'horseshoe': False,
+                                'n_rollup': 5,
+                                'rollup_dt': 0.1,
+                                'rollup_tolerance': 1e-6}
+
+    @staticmethod
+    def column_impulse(ts_info, n_rows):
+        """ Vortex impulse of every column of the first ``n_rows`` rows of a straight wake. """
+        lengths = np.diff(ts_info.zeta_star[0][0, :, 0])
+        return np.sum(ts_info.gamma_star[0][0:n_rows, :]*lengths[0:n_rows, None], axis=0)
+
+    def test_wake_agglomeration(self):
+        """
+        Tests the rows of a straight wake after the agglomeration
+        :return:
+        """
+        m_star = 12
+        ts_info = lifting_surfaces(self.surfaces, self.u_inf, m_star=m_star)
+        pyvlm.generate_wake(ts_info, np.array([self.u_inf, 0.0, 0.0]), 0.01)
+        ts_info.gamma_star[0][:] = np.random.RandomState(0).rand(m_star, self.surfaces[0][1])
+
+        for i_step in range(8):
+            impulse = self.column_impulse(ts_info, m_star)
+            wake_length = ts_info.zeta_star[0][0, -1, 0] - ts_info.zeta_star[0][0, 0, 0]
+            self.assertEqual(pyvlm.agglomerate_wake(ts_info, 0.3), 1)
+            lengths = np.diff(ts_info.zeta_star[0][0, :, 0])
+            # the merged rows keep the impulse, the last row extends the wake
+            self.assertTrue(np.allclose(self.column_impulse(ts_info, m_star - 1), impulse))
+            self.assertTrue(np.allclose(ts_info.gamma_star[0][-1, :], ts_info.gamma_star[0][-2, :]))
+            self.assertAlmostEqual(np.sum(lengths), wake_length + lengths[-1])
+
+        # the rows closer than 0.3 unchanged, no empty rows and coarser rows downstream
+        self.assertTrue(np.allclose(lengths[0:3], 0.1))
+        self.assertTrue(np.all(lengths > 0.1 - 1e-12))
+        self.assertTrue(np.all(np.diff(lengths) > -1e-12))
+        self.assertGreater(np.sum(lengths), 2.0)
+
+        # nothing to merge beyond the wake
+        self.assertEqual(pyvlm.agglomerate_wake(ts_info, 100.0), 0)
+
+    def test_far_wake(self):
+        """
+        Tests that a rolled up wake agglomerated up to the length of a longer one induces the same
+        velocities on the wing as the longer one
+        :return:
+        """
+        reference = dense_solve(lifting_surfaces(self.surfaces, self.u_inf, m_star=40), self.rollup_settings)
+        short = dense_solve(lifting_surfaces(self.surfaces, self.u_inf, m_star=20), self.rollup_settings)
+        centres, normals, _ = pyvlm.collocation(reference)
+        direction = np.array([1.0, 0.0, 0.0])
+
+        def wake_velocity(ts_info):
+            lattice = pyvlm.wake_lattice(ts_info, False, direction)
+            return np.sum(lattice.induced_velocity(centres, reference.buffers['gamma'])*normals, axis=1)
+
+        def wake_length(ts_info):
+            return ts_info.zeta_star[0][0, -1, 0] - ts_info.zeta_star[0][0, 0, 0]
+
+        velocity = wake_velocity(reference)
+        short_error = np.max(np.abs(wake_velocity(short) - velocity))
+        agglomerated = short.copy()
+        while wake_length(agglomerated) < wake_length(reference) - 1e-6:
+            self.assertEqual(pyvlm.agglomerate_wake(agglomerated, 3.0), 1)
+        self.assertEqual(agglomerated.zeta_star[0].shape, short.zeta_star[0].shape)
+        self.assertLess(np.max(np.abs(wake_velocity(agglomerated) - velocity)), 0.1*short_error)
@@ -0,0 +1,152 @@
+import numpy as np
+import unittest
+
+import sharpy.generators.steadyvelocityfield
+from sharpy.solvers.staticuvlm import StaticUvlm
+from sharpy.solvers.staticuvlmsweep import StaticUvlmSweep
+from tests.uvlm.wing_model import ModelData, wing_model
+
+
+def static_uvlm(structure, aero, in_settings=None, solver_class=StaticUvlm):
+    """
+    ``StaticUvlm`` (python backend), or a solver derived from it, initialised on the model
+    """
+    solver_settings = {'backend': 'python',
+                       'print_info': False,
+                       'velocity_field_generator': 'SteadyVelocityField',
+                       'velocity_field_input': {'u_inf': 10.0, 'u_inf_direction': [1.0, 0.0, 0.0]}}
+    solver_settings.update(in_settings or {})
+    solver = solver_class()
+    solver.initialise(ModelData(structure, aero), solver_settings)
+    return solver
+
+
+class TestStaticUvlm(unittest.TestCase):
+    """
+    Tests the StaticUvlm solver on the two surface wing
+    """
+
+    def test_linear_grid_update(self):
+        """
+        Tests that the grid updates after the first one of the timestep use the linearised displacement transfer
+        :return:
+        """
+        structure, aero = wing_model()
+        solver = static_uvlm(structure, aero, {'linear_grid_update': True})
+        self.assertEqual(solver.linearisation_ts, 0)
+        zeta = aero.timestep_info[0].buffers['zeta']
+
+        np.random.seed(6)
+        ts_info = structure.timestep_info[0]
+        ts_info.pos[:] += 1e-4*np.random.randn(*ts_info.pos.shape)
+        ts_info.psi[:] += 1e-4*np.random.randn(*ts_info.psi.shape)
+        strips = [strip.copy() for strip in aero.strips]
+        solver.update_step()
+        # the grid has not been regenerated
+        for i_surf in range(aero.n_surf):
+            self.assertTrue(np.array_equal(aero.strips[i_surf], strips[i_surf]))
+        linear_zeta = zeta.copy()
+
+        reference_structure, reference_aero = wing_model()
+        reference_structure.timestep_info[0].pos[:] = ts_info.pos
+        reference_structure.timestep_info[0].psi[:] = ts_info.psi
+        static_uvlm(reference_structure, reference_aero)
+        reference_zeta = reference_aero.timestep_info[0].buffers['zeta']
+        self.assertFalse(np.array_equal(linear_zeta, reference_zeta))
+        self.assertTrue(np.allclose(linear_zeta, reference_zeta, rtol=0.0, atol=1e-6))
+
+    def test_sweep(self):
+        """
+        Tests the polar of StaticUvlmSweep against the forces of individual StaticUvlm solutions
+        :return:
+        """
+        u_inf = np.array([10.0, 15.0, 20.0, 10.0])
+        alpha = np.array([0.05, 0.05, 0.05, 0.08])
+        structure, aero = wing_model()
+        sweep = static_uvlm(structure, aero, {'horseshoe': True,
+                                              'alpha': 0.05,
+                                              'sweep_u_inf': u_inf,
+                                              'sweep_alpha': alpha},
+                            solver_class=StaticUvlmSweep)
+        sweep.run()
+        polar = aero.polar
+        self.assertEqual(polar.shape, (len(u_inf), 9))
+
+        for i_cond in range(len(u_inf)):
+            structure, aero = wing_model()
+            solver = static_uvlm(structure, aero, {'horseshoe': True,
+                                                   'alpha': alpha[i_cond],
+                                                   'velocity_field_input': {'u_inf': u_inf[i_cond],
+                                                                            'u_inf_direction': [1.0, 0.0, 0.0]}})
+            solver.run()
+            zeta = aero.timestep_info[0].buffers['zeta']
+            forces = aero.timestep_info[0].buffers['forces'][0:3, :]
+            total = np.concatenate((np.sum(forces, axis=1), np.sum(np.cross(zeta, forces, axis=0), axis=1)))
+            if alpha[i_cond] == 0.05:
+                self.assertTrue(np.allclose(polar[i_cond, 3:9], total,
+                                            rtol=1e-8, atol=1e-8*np.max(np.abs(total))))
+            else:
+                # the wake of the sweep stays aligned with the reference free stream
+                self.assertTrue(np.allclose(polar[i_cond, 3:9], total,
+                                            rtol=0.0, atol=5e-3*np.max(np.abs(total))))
+
+    def test_sweep_symmetry_sideslip(self):
+        """
+        Tests that sideslip sweeps of half models are rejected
+        :return:
+        """
+        structure, aero = wing_model({'symmetry': True})
+        sweep = static_uvlm(structure, aero, {'horseshoe': True,
+                                              'sweep_beta': [0.0, 0.05]},
+                            solver_class=StaticUvlmSweep)
+        with self.assertRaises(NotImplementedError):
+            sweep.run()
+
+    def test_wake_stations(self):
+        """
+        Tests that the wake stations are validated
+        :return:
+        """
+        for stations in [[0.0, 1.0], [-1.0, 1.0], [1.0, 0.5], [1.0, 1.0, 2.0]]:
+            structure, aero = wing_model()
+            with self.assertRaises(ValueError):
+                static_uvlm(structure, aero, {'wake_stations': stations})
+        structure, aero = wing_model()
+        solver = static_uvlm(structure, aero, {'wake_stations': [0.5, 1.0, 2.0]})
+        self.assertTrue(np.array_equal(solver.settings['wake_stations'], [0.5, 1.0, 2.0]))
+
+    def test_adaptive_wake(self):
+        """
+        Tests the forces with the adapted wake length against the solution with a longer wake
+        :return:
+        """
+        wake_settings = {'horseshoe': False, 'n_rollup': 0, 'rollup_dt': 0.1, 'alpha': 0.05}
+        tolerance = 5e-3
+
+        def total_force(m_star, in_settings=None):
+            structure, aero = wing_model({'mstar': m_star})
+            solver_settings = dict(wake_settings)
+            solver_settings.update(in_settings or {})
+            solver = static_uvlm(structure, aero, solver_settings)
+            solver.run()
+            return solver, np.sum(aero.timestep_info[0].buffers['forces'][0:3, :], axis=1)
+
+        _, force = total_force(120)
+        solver, adapted_force = total_force(120, {'adaptive_wake': True,
+                                                  'adaptive_wake_initial': 2,
+                                                  'adaptive_wake_growth': 2.0,
+                                                  'adaptive_wake_tolerance': tolerance})
+        m_star = solver.adapted_m_star
+        self.assertLess(m_star, 120)
+        self.assertEqual(solver.data.aero.timestep_info[0].zeta_star[0].shape[1], m_star + 1)
+        error = np.linalg.norm(adapted_force - force)
+        self.assertLess(error, tolerance*np.linalg.norm(force))
+
+        # a wake of half the length is not converged
+        _, short_force = total_force(m_star//2)
+        self.assertGreater(np.linalg.norm(short_force - force), 2.0*error)
+
+        # the length is kept for the following runs
+        solver.run()
+        self.assertEqual(solver.adapted_m_star, m_star)
+        self.assertEqual(solver.data.aero.timestep_info[0].zeta_star[0].shape[1], m_star + 1)
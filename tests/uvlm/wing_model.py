@@ -0,0 +1,122 @@
+import numpy as np
+
+import sharpy.aero.models.aerogrid as aerogrid
+import sharpy.structure.models.beam as beam
+import sharpy.utils.cout_utils as cout
+import sharpy.utils.settings as settings
+from sharpy.solvers.aerogridloader import AerogridLoader
+from sharpy.solvers.beamloader import BeamLoader
+
+
+def naca_camber(M, P):
+    m = M*1e-2
+    p = P*1e-1
+    x = np.linspace(0, 1, 1000)
+    if m == 0.0:
+        return np.column_stack((x, np.zeros_like(x)))
+    y = np.where(x < p,
+                 m/(p*p)*(2*p*x - x*x),
+                 m/((1 - p)*(1 - p))*(1 - 2*p + 2*p*x - x*x))
+    return np.column_stack((x, y))
+
+
+def fem_dict(num_elem_main=4, span=8.0, sweep=0.1, dihedral=0.05):
+    """
+    Two 3-noded beams (right and left wing) joined at the root node 0, with the
+    connectivities of the planarwing case.
+    """
+    num_node_elem = 3
+    num_elem = 2*num_elem_main
+    num_node_main = num_elem_main*(num_node_elem - 1) + 1
+    num_node = 2*num_node_main - 1
+
+    y = np.zeros((num_node,))
+    y[0:num_node_main] = np.linspace(0.0, span, num_node_main)
+    y[num_node_main:] = np.linspace(-span, 0.0, num_node_main)[:-1]
+    coordinates = np.column_stack((sweep*np.abs(y), y, dihedral*np.abs(y)))
+
+    conn = np.zeros((num_elem, num_node_elem), dtype=int)
+    for i_elem in range(num_elem_main):
+        conn[i_elem, :] = i_elem*(num_node_elem - 1) + np.array([0, 2, 1])
+        conn[num_elem_main + i_elem, :] = (num_elem_main + i_elem)*(num_node_elem - 1) + np.array([0, 2, 1]) + 1
+    conn[num_elem - 1, 1] = 0
+
+    boundary_conditions = np.zeros((num_node,), dtype=int)
+    boundary_conditions[0] = 1
+    boundary_conditions[num_node_main - 1] = -1
+    boundary_conditions[num_node_main] = -1
+
+    frame_of_reference_delta = np.zeros((num_elem, num_node_elem, 3))
+    frame_of_reference_delta[:, :, 0] = -1.0
+    return {'coordinates': coordinates,
+            'connectivities': conn,
+            'num_node_elem': num_node_elem,
+            'num_node': num_node,
+            'num_elem': num_elem,
+            'stiffness_db': np.diag([1e4, 1e4, 1e4, 1e4, 2e4, 5e4])[None, :, :],
+            'elem_stiffness': np.zeros((num_elem,), dtype=int),
+            'mass_db': np.diag([0.75, 0.75, 0.75, 0.1, 0.1, 0.1])[None, :, :],
+            'elem_mass': np.zeros((num_elem,), dtype=int),
+            'frame_of_reference_delta': frame_of_reference_delta,
+            'structural_twist': np.zeros((num_node,)),
+            'boundary_conditions': boundary_conditions,
+            'beam_number': np.repeat([0, 1], num_elem_main),
+            'app_forces': np.zeros((num_node, 6))}
+
+
+def aero_dict(fem, m=4, m_distribution='uniform'):
+    """
+    A surface per beam, the root node belongs to both. Cambered airfoil on the right wing
+    and a flat plate on the left one, with chord and twist varying along the span.
+    """
+    num_node = fem['num_node']
+    num_node_main = (num_node + 1)//2
+    span = np.max(fem['coordinates'][:, 1])
+    eta = np.abs(fem['coordinates'][:, 1])/span
+
+    airfoil_distribution = np.zeros((num_node,), dtype=int)
+    airfoil_distribution[0:num_node_main] = 1
+    return {'airfoils': {'0': naca_camber(0, 0), '1': naca_camber(4, 4)},
+            'chord': 1.0 - 0.4*eta,
+            'twist': 0.05*(1.0 - eta),
+            'elastic_axis': np.zeros((num_node,)) + 0.3,
+            'airfoil_distribution': airfoil_distribution,
+            'surface_distribution': fem['beam_number'].copy(),
+            'surface_m': np.array([m, m], dtype=int),
+            'm_distribution': m_distribution.encode('ascii'),
+            'aero_node': np.ones((num_node,), dtype=bool)}
+
+
+def loader_settings(loader, in_settings):
+    out_settings = dict(in_settings)
+    settings.to_custom_types(out_settings, loader.settings_types, loader.settings_default)
+    return out_settings
+
+
+def wing_model(aero_settings=None, **kwargs):
+    """
+    ``Beam`` and ``Aerogrid`` of the two surface wing, generated as the loaders do.
+
+    :param aero_settings: ``AerogridLoader`` settings
+    :param kwargs: arguments of ``fem_dict``
+    """
+    if cout.cout_wrap is None:
+        # quiet writer, as when sharpy_main runs without screen output
+        cout.start_writer()
+    fem = fem_dict(**kwargs)
+    structure = beam.Beam()
+    structure.generate(fem, loader_settings(BeamLoader(), {}))
+    aero = aerogrid.Aerogrid()
+    aero.generate(aero_dict(fem), structure, loader_settings(AerogridLoader(), aero_settings or {}), 0)
+    return structure, aero
+
+
+class ModelData(object):
+    """
+    Minimal replacement of ``PreSharpy`` holding the model for the solvers
+    """
+    def __init__(self, structure, aero, in_settings=None):
+        self.structure = structure
+        self.aero = aero
+        self.ts = 0
+        self.settings = in_settings or dict()